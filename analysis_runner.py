@@ -0,0 +1,714 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from anonymization import AnonymizationPool
+from batch_files import BatchFileWriter
+from batch_registry import REGISTRY_PATH, BatchRegistry, download_results, poll_jobs, submit_run
+from compact_prompt import (
+    COMPACT_TITLE, compact_columns, compact_rows, compact_system_prompt, messages_tokens, token_report
+)
+from dedup import DEFAULT_THRESHOLD, cluster_tickets, format_cluster
+from incremental import WatermarkStore, plan_update, update_title
+from instrumentation import add_instrumentation_arguments, company_scope, count, instrumented_run, measure
+from json_report import RESPONSE_FORMAT, SECTION_MAX_TOKENS, ReportRepair
+from llm_cache import ResponseCache
+from map_reduce import summarize_hierarchical
+from preflight import TokenBudget, add_preflight_arguments
+from routing import (
+    RoutePlan, add_routing_arguments, choose_route, predict_sync_seconds, report_actual, report_route
+)
+from scheduler import add_scheduler_arguments, configure, is_transient
+from streaming import StreamSink, request_options, stream_complete, stream_complete_async
+from token_estimation import estimate_tokens
+
+
+# 🧩 Description d'une analyse : construction du prompt et enregistrement du résultat
+@dataclass
+class AnalysisSpec:
+    build_header: Callable  # (company, tickets_list) -> str : statistiques et consignes
+    format_ticket: Callable  # ticket -> str
+    save_summary: Callable  # (company, final_summary) -> bool (True si le résumé a été enregistré)
+    name: str = "analysis"  # identifiant de l'analyse (état incrémental)
+    tickets_title: str = "📂 **Tickets à analyser** :\n\n"
+    footer: str = ""
+    json_output: bool = False  # réponse attendue en JSON (vérifiée au fil de l'eau avec --stream)
+    # Schéma du rapport JSON : mode JSON de l'API, réparation locale et relance des sections invalides
+    json_schema: dict = None
+    # Mode --compact : consignes statiques en message système, statistiques seules côté utilisateur
+    system_prompt: str = ""
+    build_stats: Callable = None  # (company, tickets_list) -> str
+    build_analytics: Callable = None  # (company, tickets_list) -> str : tableaux calculés localement
+
+    def analytics(self, company, tickets_list):
+        return self.build_analytics(company, tickets_list) if self.build_analytics is not None else ""
+
+    def is_compact(self, compact):
+        return compact and self.build_stats is not None
+
+    def ticket_blocks(self, tickets_list, compact=False, clusters=None):
+        """Un bloc de texte par ticket au format du prompt ; avec ``clusters`` (--dedup), un par groupe."""
+        if self.is_compact(compact):
+            return compact_rows(tickets_list, clusters)
+        if clusters is None:
+            return [self.format_ticket(ticket) for ticket in tickets_list]
+        return [format_cluster(self.format_ticket, cluster) for cluster in clusters]
+
+    def tickets_section(self, blocks, compact=False, grouped=False):
+        """Blocs de tickets prêts à insérer, précédés en mode compact de l'en-tête du tableau."""
+        return (compact_columns(grouped) if self.is_compact(compact) else "") + "".join(blocks)
+
+    def compose_messages(self, company, tickets_list, title, body, compact=False, grouped=False):
+        """Messages d'une entreprise : contexte (statistiques, tableaux locaux), puis ``title`` et ``body``.
+
+        Utilisé pour le prompt complet comme pour les mises à jour incrémentales et la fusion des lots :
+        le contexte reste calculé sur tous les tickets et suit le mode --compact.
+        """
+        compact = self.is_compact(compact)
+        # Statistiques : dates de création analysées et comptages
+        with measure("stats"):
+            context = (self.build_stats if compact else self.build_header)(company, tickets_list)
+        with measure("analytics"):
+            analytics = self.analytics(company, tickets_list)
+        with measure("concat"):
+            if compact:
+                return [
+                    {"role": "system", "content": compact_system_prompt(self, grouped)},
+                    {"role": "user", "content": context + analytics + title + body},
+                ]
+            return _messages(context + analytics + title + body + self.footer)
+
+    def build_messages(self, company, tickets_list, compact=False, clusters=None, title=None, shown=None):
+        """Prompt d'une entreprise. ``shown`` : tickets envoyés s'ils diffèrent de ceux des statistiques
+        (nouveaux tickets d'une mise à jour) ; ``clusters`` regroupe alors ``shown``."""
+        with measure("format"):
+            # --dedup : un bloc par groupe de tickets quasi identiques, statistiques sur tous les tickets
+            blocks = self.ticket_blocks(tickets_list if shown is None else shown, compact, clusters)
+            body = self.tickets_section(blocks, compact, clusters is not None)
+        if title is None:
+            title = COMPACT_TITLE if self.is_compact(compact) else self.tickets_title
+        return self.compose_messages(company, tickets_list, title, body, compact, clusters is not None)
+
+    @property
+    def response_format(self):
+        return RESPONSE_FORMAT if self.json_schema is not None else None
+
+
+def add_runner_arguments(parser):
+    """Ajoute les options d'exécution communes aux scripts d'analyse."""
+    parser.add_argument(
+        "--async", dest="async_mode", action="store_true",
+        help="Analyse les entreprises en parallèle via l'API asynchrone de Mistral."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Nombre maximal d'appels Mistral simultanés en mode --async (défaut : 4)."
+    )
+    parser.add_argument(
+        "--hierarchical", action="store_true",
+        help="Découpe les grosses entreprises en lots analysés en parallèle puis fusionnés (map-reduce)."
+    )
+    parser.add_argument(
+        "--chunk-tokens", type=int, default=24000,
+        help="Budget de tokens des tickets d'un lot en mode --hierarchical (défaut : 24000)."
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Ignore le cache des réponses (summaries/.cache) et interroge toujours Mistral."
+    )
+    parser.add_argument(
+        "--cache-max-age-days", type=float, default=30,
+        help="Âge maximal d'une réponse en cache, en jours (défaut : 30)."
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=200,
+        help="Taille maximale du cache en Mo, éviction des réponses les moins utilisées (défaut : 200)."
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="N'envoie que les nouveaux tickets et le rapport précédent (watermark par entreprise)."
+    )
+    parser.add_argument(
+        "--max-delta-ratio", type=float, default=0.3,
+        help="Part de nouveaux tickets au-delà de laquelle le rapport est reconstruit entièrement (défaut : 0.3)."
+    )
+    parser.add_argument(
+        "--full-rebuild", action="store_true",
+        help="Force une reconstruction complète en mode --incremental (les watermarks sont mis à jour)."
+    )
+    parser.add_argument(
+        "--anonymize-workers", type=int, default=0,
+        help="Processus dédiés à l'anonymisation des grosses entreprises (défaut : 0, en série)."
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Prompt compact : consignes en message système et une ligne par ticket (moins de tokens)."
+    )
+    parser.add_argument(
+        "--token-report", action="store_true",
+        help="Compare les tokens du prompt historique et du prompt compact par entreprise, sans appeler Mistral."
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Reçoit les réponses en flux, écrites au fur et à mesure dans summaries/.partial (TTFT et débit mesurés)."
+    )
+    parser.add_argument(
+        "--dedup", action="store_true",
+        help="Regroupe les tickets quasi identiques et n'envoie qu'un représentant par groupe (avec son nombre)."
+    )
+    parser.add_argument(
+        "--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+        help=f"Similarité minimale pour regrouper deux tickets avec --dedup (défaut : {DEFAULT_THRESHOLD})."
+    )
+    add_routing_arguments(parser)
+    add_preflight_arguments(parser)
+    add_scheduler_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def _messages(prompt):
+    return [{"role": "user", "content": prompt}]
+
+
+def _used_tokens(response):
+    return getattr(getattr(response, "usage", None), "total_tokens", None)
+
+
+def _completion_functions(client, model, cache, scheduler):
+    """Fonctions d'appel à Mistral (synchrone et asynchrone) passant par le cache éventuel.
+
+    Chaque appel passe par le planificateur (limites du compte, nouvelles tentatives, disjoncteur).
+    Avec ``sink`` (un StreamSink), la réponse est reçue en flux et écrite au fur et à mesure ;
+    ``response_format`` active le mode JSON de l'API.
+    """
+
+    def streamed_tokens(input_tokens, sink):
+        return lambda text: input_tokens + (sink.output_tokens or estimate_tokens(text))
+
+    def complete(messages, max_tokens, sink=None, response_format=None):
+        if cache is not None:
+            cached = cache.get(model, max_tokens, messages, response_format)
+            if cached is not None:
+                count("cache_hits")
+                return cached
+        input_tokens = messages_tokens(messages)
+        if sink is not None:
+            # Une nouvelle tentative repart d'un fichier partiel vide
+            content = scheduler.call(
+                lambda: stream_complete(client, model, messages, max_tokens, sink.restart(), response_format),
+                input_tokens + max_tokens, used_tokens=streamed_tokens(input_tokens, sink)
+            )
+        else:
+            response = scheduler.call(
+                lambda: client.chat.complete(
+                    model=model, messages=messages, max_tokens=max_tokens, **request_options(response_format)
+                ),
+                input_tokens + max_tokens, used_tokens=_used_tokens
+            )
+            content = response.choices[0].message.content
+        if cache is not None:
+            cache.put(model, max_tokens, messages, content, response_format)
+        return content
+
+    async def complete_async(messages, max_tokens, sink=None, response_format=None):
+        if cache is not None:
+            cached = cache.get(model, max_tokens, messages, response_format)
+            if cached is not None:
+                count("cache_hits")
+                return cached
+        input_tokens = messages_tokens(messages)
+        if sink is not None:
+            content = await scheduler.call_async(
+                lambda: stream_complete_async(client, model, messages, max_tokens, sink.restart(), response_format),
+                input_tokens + max_tokens, used_tokens=streamed_tokens(input_tokens, sink)
+            )
+        else:
+            response = await scheduler.call_async(
+                lambda: client.chat.complete_async(
+                    model=model, messages=messages, max_tokens=max_tokens, **request_options(response_format)
+                ),
+                input_tokens + max_tokens, used_tokens=_used_tokens
+            )
+            content = response.choices[0].message.content
+        if cache is not None:
+            cache.put(model, max_tokens, messages, content, response_format)
+        return content
+
+    return complete, complete_async
+
+
+def _print_timings(wall_clock, latencies):
+    """Affiche la durée totale et la latence de chaque entreprise (la plus lente d'abord)."""
+    print(f"\n⏱️ Durée totale : {wall_clock:.1f}s pour {len(latencies)} entreprise(s)")
+    for company, latency in sorted(latencies.items(), key=lambda item: item[1], reverse=True):
+        print(f"   - {company} : {latency:.1f}s")
+    logging.info(f"⏱️ Durée totale : {wall_clock:.1f}s pour {len(latencies)} entreprise(s)")
+
+
+def _print_stream_stats(stream_stats):
+    """Temps jusqu'au premier token et débit de chaque réponse reçue en flux."""
+    print("📡 Réponses en flux (premier token, débit) :")
+    for company, (ttft, tokens, rate) in stream_stats.items():
+        first = "aucun token" if ttft is None else f"{ttft:.2f}s"
+        print(f"   - {company} : {first}, {tokens} tokens à {rate:.1f} tokens/s")
+        logging.info(f"📡 {company} : TTFT {first}, {tokens} tokens, {rate:.1f} tokens/s")
+
+
+class _AnalysisRun:
+    """État partagé d'une exécution : appels Mistral, options, watermarks et latences."""
+
+    def __init__(self, complete, complete_async, max_tokens, spec, args, watermarks, anonymizer, scheduler=None):
+        self.complete = complete
+        self.complete_async = complete_async
+        self.max_tokens = max_tokens
+        self.spec = spec
+        self.args = args
+        self.watermarks = watermarks
+        self.anonymizer = anonymizer
+        self.budget = TokenBudget(args, max_tokens)
+        self.scheduler = scheduler
+        self.slots = None  # sémaphore des appels asynchrones du run (--concurrency), créé dans sa boucle asyncio
+        self.retry = {}  # entreprise -> (action, tickets_list, messages) déjà préparés, rejoués en fin d'exécution
+        self.latencies = {}
+        self.stream_stats = {}
+
+    def plan(self, company, tickets_list, quiet=False):
+        """Action pour une entreprise : "full" (analyse complète), "update" (avec ses nouveaux tickets et le
+        rapport précédent) ou "skip"."""
+        if not quiet:
+            logging.info(f"📊 Analyse en cours pour : {company} (Total : {len(tickets_list)})")
+        if self.watermarks is None or self.args.full_rebuild:
+            return "full", None
+        action, update = plan_update(self.watermarks, company, tickets_list, self.args.max_delta_ratio)
+        if action == "skip" and not quiet:
+            logging.info(f"⏭️ {company} : aucun nouveau ticket, rapport déjà à jour")
+            print(f"⏭️ Aucun nouveau ticket pour {company}, rapport déjà à jour.")
+        return action, update
+
+    def messages(self, company, tickets_list, update=None):
+        """Messages envoyés pour une entreprise (``update`` : nouveaux tickets et rapport précédent).
+
+        Une mise à jour passe par le même constructeur que le prompt complet (--compact, --dedup, tableaux
+        locaux) : seuls les tickets envoyés et leur titre changent, les statistiques portent sur tous les tickets.
+        """
+        if update is not None:
+            delta, previous_summary = update
+            return self.spec.build_messages(
+                company, tickets_list, self.args.compact, self.clusters(company, delta),
+                title=update_title(previous_summary), shown=delta
+            )
+        return self.spec.build_messages(company, tickets_list, self.args.compact, self.clusters(company, tickets_list))
+
+    def clusters(self, company, tickets_list):
+        """Groupes de tickets quasi identiques avec --dedup, sinon None."""
+        if not self.args.dedup:
+            return None
+        clusters = cluster_tickets(tickets_list, self.args.dedup_threshold)
+        logging.info(f"🧬 {company} : {len(tickets_list)} tickets regroupés en {len(clusters)} groupes")
+        return clusters
+
+    def prepare(self, company, tickets_list, quiet=False):
+        """Prépare l'envoi d'une entreprise : plan incrémental, prompt exact et budget de tokens.
+
+        Renvoie ``(action, tickets_list, messages)`` ; action vaut "skip", "full", "update" ou "chunk"
+        (analyse par lots). ``tickets_list`` peut être réduit à un échantillon par le budget.
+        """
+        with company_scope(company):
+            return self._prepare(company, tickets_list, quiet)
+
+    def _prepare(self, company, tickets_list, quiet):
+        with measure("plan"):
+            action, update = self.plan(company, tickets_list, quiet)
+        if action == "skip":
+            return action, tickets_list, None
+        with measure("anonymize"):
+            self.anonymizer.prepare(tickets_list)
+        with measure("prompt"):
+            messages = self.messages(company, tickets_list, update)
+
+        with measure("budget"):
+            # Un échantillon est toujours analysé en reconstruction complète, même à la place d'une mise à jour
+            decision, tickets_list, messages = self.budget.apply(
+                company, tickets_list, messages, lambda sample: self.messages(company, sample), quiet
+            )
+        if messages is not None and not quiet:
+            count("tickets", len(tickets_list))
+            count("prompt_bytes", sum(len(message["content"].encode("utf-8")) for message in messages))
+            count("prompt_tokens", messages_tokens(messages))
+        if decision == "skip":
+            return "skip", tickets_list, None
+        if decision == "chunk":
+            return "chunk", tickets_list, messages
+        if decision == "sample":
+            if action == "update" and not quiet:
+                logging.warning(f"✂️ {company} : mise à jour hors budget, reconstruction complète sur un échantillon")
+                print(f"✂️ {company} : mise à jour hors budget, rapport reconstruit sur les tickets les plus récents.")
+            return "full", tickets_list, messages
+        return action, tickets_list, messages
+
+    def estimate(self, company_tickets):
+        """Nombre de requêtes et tokens d'entrée estimés du run (hors entreprises déjà à jour ou hors budget)."""
+        for company, tickets_list in company_tickets.items():
+            self.prepare(company, tickets_list, quiet=True)
+        rows = [row for row in self.budget.rows if row.decision != "skip"]
+        # Le budget repart de zéro pour l'exécution réelle
+        self.budget = TokenBudget(self.args, self.max_tokens)
+        return len(rows), sum(row.input_tokens for row in rows)
+
+    def dry_run(self, company_tickets):
+        for company, tickets_list in company_tickets.items():
+            self.prepare(company, tickets_list, quiet=True)
+        self.budget.print_plan()
+        return self.budget.rows
+
+    def _repair(self, company, tickets_list, final_summary):
+        if self.spec.json_schema is None:
+            return None
+        context = self.spec.build_stats(company, tickets_list) if self.spec.build_stats is not None else ""
+        return ReportRepair(self.spec.json_schema, company, final_summary, context)
+
+    def _section_failed(self, company, key, error):
+        logging.error(f"❌ {company} : échec de la relance de la section « {key} » : {error}")
+
+    def finalize(self, company, tickets_list, final_summary):
+        """Répare un rapport JSON et ne redemande que ses sections invalides (sans schéma : inchangé)."""
+        repair = self._repair(company, tickets_list, final_summary)
+        if repair is None:
+            return final_summary
+        for key, messages in repair.requests():
+            try:
+                answer = self.complete(messages, SECTION_MAX_TOKENS, response_format=RESPONSE_FORMAT)
+            except Exception as e:
+                self._section_failed(company, key, e)
+                answer = None
+            repair.resolve(key, answer)
+        return repair.text()
+
+    async def call_async(self, messages, max_tokens, sink=None, response_format=None):
+        """Appel asynchrone à Mistral compté dans la limite --concurrency, partagée par tout le run."""
+        async with self.slots:
+            return await self.complete_async(messages, max_tokens, sink, response_format)
+
+    async def finalize_async(self, company, tickets_list, final_summary):
+        repair = self._repair(company, tickets_list, final_summary)
+        if repair is None:
+            return final_summary
+
+        async def section(key, messages):
+            try:
+                answer = await self.call_async(messages, SECTION_MAX_TOKENS, response_format=RESPONSE_FORMAT)
+                return key, answer
+            except Exception as e:
+                self._section_failed(company, key, e)
+                return key, None
+
+        for key, answer in await asyncio.gather(*(section(key, messages) for key, messages in repair.requests())):
+            repair.resolve(key, answer)
+        return repair.text()
+
+    def save(self, company, tickets_list, final_summary, sink=None):
+        with measure("save"):
+            saved = self.spec.save_summary(company, final_summary)
+            if saved and self.watermarks is not None:
+                self.watermarks.save(company, tickets_list, final_summary)
+        count("response_bytes", len(final_summary.encode("utf-8")))
+        if sink is not None and saved:
+            # Le fichier partiel n'est gardé que si le résumé final n'a pas pu être enregistré
+            sink.discard()
+
+    def sink(self, company):
+        if not self.args.stream:
+            return None
+        return StreamSink(self.spec.name, company, validate_json=self.spec.json_output)
+
+    def end_stream(self, company, sink, failed):
+        if sink is None:
+            return
+        sink.close()
+        if sink.first_token_at is not None:
+            self.stream_stats[company] = sink.stats()
+        if failed and sink.chunks:
+            logging.warning(f"💾 {company} : réponse partielle conservée dans {sink.path}")
+            print(f"💾 Réponse partielle conservée : {sink.path}")
+
+    def failed(self, company, error, prepared, retrying):
+        """Échec d'une entreprise : remise en file si l'erreur est temporaire (une seule fois), sinon abandon."""
+        if retrying:
+            self.scheduler.retry_queue.lose(company, error)
+        elif is_transient(error):
+            self.retry[company] = prepared
+            self.scheduler.retry_queue.add(company, error)
+        else:
+            logging.error(f"❌ Erreur lors de l'analyse pour {company}: {error}")
+            print(f"🚨 Erreur API Mistral : {error}")
+
+    def run_sync(self, company_tickets):
+        for company, tickets_list in company_tickets.items():
+            prepared = self.prepare(company, tickets_list)
+            if prepared[0] != "skip":
+                self.analyse_sync(company, prepared)
+
+        # 🔁 Rejeu des entreprises en échec temporaire, une fois le disjoncteur refermé
+        for company in self.scheduler.drain():
+            self.analyse_sync(company, self.retry.pop(company), retrying=True)
+
+    def analyse_sync(self, company, prepared, retrying=False):
+        with company_scope(company):
+            self._analyse_sync(company, prepared, retrying)
+
+    def _analyse_sync(self, company, prepared, retrying):
+        _, tickets_list, messages = prepared
+
+        # 🔍 Envoi vers l'API Mistral
+        start = time.perf_counter()
+        sink = self.sink(company)
+        try:
+            with measure("api"):
+                final_summary = self.complete(messages, self.max_tokens, sink, self.spec.response_format)
+        except Exception as e:
+            self.failed(company, e, prepared, retrying)
+            self.end_stream(company, sink, failed=True)
+            return
+        finally:
+            self.latencies[company] = time.perf_counter() - start
+
+        self.end_stream(company, sink, failed=False)
+        with measure("repair"):
+            final_summary = self.finalize(company, tickets_list, final_summary)
+        self.save(company, tickets_list, final_summary, sink)
+
+    async def analyse_async(self, company, tickets_list):
+        # L'anonymisation et la construction du prompt sont bloquantes : elles tournent hors de la boucle asyncio
+        prepared = await asyncio.to_thread(self.prepare, company, tickets_list)
+        if prepared[0] != "skip":
+            await self.send_async(company, prepared)
+
+    async def send_async(self, company, prepared, retrying=False):
+        with company_scope(company):
+            await self._send_async(company, prepared, retrying)
+
+    async def _send_async(self, company, prepared, retrying):
+        action, tickets_list, messages = prepared
+        start = time.perf_counter()
+        sink = None
+        try:
+            # Les autres entreprises avancent pendant l'attente : temps réel seulement
+            with measure("api", cpu=False):
+                if action == "chunk" or (action == "full" and self.args.hierarchical):
+                    # Les lots partagent la limite de concurrence du run avec les autres entreprises
+                    chunk_tokens = self.args.chunk_tokens
+                    if action == "chunk":
+                        chunk_tokens = min(chunk_tokens, int(self.args.max_company_tokens * 0.8))
+                    # Lots au format du prompt préparé (--compact, --dedup)
+                    clusters = await asyncio.to_thread(self.clusters, company, tickets_list)
+                    final_summary = await summarize_hierarchical(
+                        self.complete_async, self.max_tokens, company, tickets_list, self.spec,
+                        chunk_tokens, self.slots, messages, self.args.compact, clusters,
+                        self.spec.response_format
+                    )
+                else:
+                    sink = self.sink(company)
+                    final_summary = await self.call_async(
+                        messages, self.max_tokens, sink, self.spec.response_format
+                    )
+        except Exception as e:
+            self.failed(company, e, prepared, retrying)
+            self.end_stream(company, sink, failed=True)
+            return
+        finally:
+            self.latencies[company] = time.perf_counter() - start
+
+        # 💾 Chaque résumé est écrit dès que sa réponse arrive
+        self.end_stream(company, sink, failed=False)
+        with measure("repair", cpu=False):
+            final_summary = await self.finalize_async(company, tickets_list, final_summary)
+        self.save(company, tickets_list, final_summary, sink)
+
+    async def run_async(self, company_tickets, company_concurrency):
+        # 👷 Un nombre fixe de workers se partagent les entreprises : seuls les tickets des
+        # entreprises en cours d'analyse sont chargés (les partitions déversées restent sur disque)
+        companies = iter(company_tickets.items())
+        # --concurrency borne tous les appels simultanés : entreprises, lots du map-reduce et sections relancées
+        self.slots = asyncio.Semaphore(max(1, self.args.concurrency))
+
+        async def worker():
+            for company, tickets_list in companies:
+                await self.analyse_async(company, tickets_list)
+
+        await asyncio.gather(*(worker() for _ in range(company_concurrency)))
+
+        # 🔁 Rejeu des entreprises en échec temporaire, une fois le disjoncteur refermé
+        retries = iter(self.scheduler.drain())
+
+        async def retry_worker():
+            for company in retries:
+                await self.send_async(company, self.retry.pop(company), retrying=True)
+
+        await asyncio.gather(*(retry_worker() for _ in range(company_concurrency)))
+
+    def write_batch(self, registry, run_id, model, company_tickets, cache):
+        """Écrit les requêtes des entreprises à analyser dans les fichiers batch du run."""
+        folder = os.path.join(os.path.dirname(REGISTRY_PATH), run_id)
+        with BatchFileWriter(folder, prefix=f"{self.spec.name}_requests") as writer:
+            for number, (company, tickets_list) in enumerate(company_tickets.items()):
+                action, tickets_list, messages = self.prepare(company, tickets_list)
+                if action == "skip":
+                    continue
+                if action == "chunk":
+                    # Le map-reduce enchaîne des appels dépendants : impossible dans un seul batch
+                    logging.warning(f"⚠️ {company} : hors budget, analyse par lots impossible en batch")
+                    print(f"⚠️ {company} ignorée : hors budget (relancer en --route sync pour l'analyse par lots).")
+                    continue
+
+                # ♻️ Une réponse déjà en cache est enregistrée tout de suite, sans passer par le batch
+                response_format = self.spec.response_format
+                cached = None
+                if cache is not None:
+                    cached = cache.get(model, self.max_tokens, messages, response_format)
+                if cached is not None:
+                    self.save(company, tickets_list, self.finalize(company, tickets_list, cached))
+                    continue
+
+                custom_id = f"{number:05d}-{self.spec.name}"
+                body = {"max_tokens": self.max_tokens, "messages": messages}
+                if response_format is not None:
+                    body["response_format"] = response_format
+                writer.write(custom_id, body)
+                registry.add_requests(run_id, [(custom_id, company, self.spec.name)])
+
+        for path in writer.paths:
+            registry.add_file(run_id, path)
+        registry.mark_ready(run_id)
+        print(f"🧾 {writer.request_count} requête(s) réparties en {len(writer.paths)} fichier(s) batch")
+        return bool(writer.paths)
+
+    def run_batch(self, client, model, company_tickets, cache):
+        registry = BatchRegistry()
+        run_id = registry.resumable_run(self.spec.name)
+        resumed = run_id is not None
+        try:
+            if resumed:
+                # Reprise après un arrêt : les jobs déjà créés ne sont pas resoumis
+                print(f"♻️ Reprise du run batch {run_id}")
+                logging.info(f"♻️ Reprise du run batch {run_id}")
+            else:
+                run_id = registry.start_run(self.spec.name, model)
+                with measure("batch_write"):
+                    written = self.write_batch(registry, run_id, model, company_tickets, cache)
+                if not written:
+                    registry.set_run_state(run_id, "done")
+                    return
+
+            with measure("batch_submit"):
+                submit_run(client, registry, run_id, model, {"job_type": self.spec.name})
+            with measure("batch_wait"):
+                finished = poll_jobs(client, registry, run_id)
+            if not finished:
+                # Le run reste « submitted » : la prochaine exécution reprendra son suivi
+                return
+
+            def on_line(line):
+                result = json.loads(line)
+                company, _ = registry.request_target(run_id, result.get("custom_id"))
+                response = result.get("response") or {}
+                if company is None or result.get("error") or response.get("status_code", 200) != 200:
+                    logging.error(f"❌ Erreur batch pour {company or result.get('custom_id')} : "
+                                  f"{result.get('error') or response}")
+                    return
+                final_summary = response["body"]["choices"][0]["message"]["content"]
+                with company_scope(company):
+                    if resumed:
+                        # Les tickets ont pu changer depuis la soumission : pas de watermark, la
+                        # prochaine exécution incrémentale repartira du rapport enregistré
+                        tickets_list = company_tickets[company] if company in company_tickets else []
+                        self.spec.save_summary(company, self.finalize(company, tickets_list, final_summary))
+                    else:
+                        tickets_list = company_tickets[company]
+                        self.save(company, tickets_list, self.finalize(company, tickets_list, final_summary))
+
+            folder = os.path.join(os.path.dirname(REGISTRY_PATH), run_id)
+            os.makedirs(folder, exist_ok=True)
+            with measure("batch_download"):
+                download_results(client, registry, run_id, folder, on_line=on_line)
+            registry.set_run_state(run_id, "done")
+        finally:
+            registry.close()
+
+
+def run_analysis(client, model, max_tokens, company_tickets, spec, args):
+    """Lance l'analyse de toutes les entreprises, en série, en parallèle ou en batch selon ``args``."""
+    if args.token_report:
+        token_report(company_tickets, spec)
+        return
+    if args.dry_run:
+        # 🧾 Plan complet sans appel à Mistral (ni cache, ni watermark modifiés)
+        watermarks = WatermarkStore(spec.name) if args.incremental else None
+        with AnonymizationPool(args.anonymize_workers) as anonymizer:
+            run = _AnalysisRun(None, None, max_tokens, spec, args, watermarks, anonymizer)
+            rows = run.dry_run(company_tickets)
+        if args.route != "sync":
+            kept = [row for row in rows if row.decision != "skip"]
+            report_route(choose_route(
+                len(kept), sum(row.input_tokens for row in kept), max_tokens, max(1, args.concurrency), args
+            ))
+        return
+
+    # 📈 Mesures par étape et par entreprise, écrites en fin de run (JSON et Prometheus)
+    with instrumented_run(spec.name, args):
+        _run(client, model, max_tokens, company_tickets, spec, args)
+
+
+def _run(client, model, max_tokens, company_tickets, spec, args):
+    start = time.perf_counter()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            max_age_days=args.cache_max_age_days, max_bytes=int(args.cache_max_mb * 1024 * 1024)
+        )
+    scheduler = configure(args)
+    complete, complete_async = _completion_functions(client, model, cache, scheduler)
+    watermarks = WatermarkStore(spec.name) if args.incremental else None
+
+    try:
+        with AnonymizationPool(args.anonymize_workers) as anonymizer:
+            run = _AnalysisRun(complete, complete_async, max_tokens, spec, args, watermarks, anonymizer, scheduler)
+
+            route_plan = None
+            if args.route != "sync":
+                # 🧭 Choix de la voie à partir du volume estimé du run
+                requests, input_tokens = run.estimate(company_tickets)
+                concurrency = max(1, args.concurrency)
+                route_plan = choose_route(requests, input_tokens, max_tokens, concurrency, args)
+                if args.hierarchical and route_plan.route == "batch":
+                    # Le map-reduce enchaîne des appels dépendants : il ne passe pas par le batch
+                    route_plan = RoutePlan(
+                        "sync", "--hierarchical enchaîne des appels dépendants", requests, input_tokens,
+                        predict_sync_seconds(requests, input_tokens, max_tokens, concurrency)
+                    )
+                report_route(route_plan)
+
+            if route_plan is not None and route_plan.route == "batch":
+                run.run_batch(client, model, company_tickets, cache)
+            elif args.async_mode or (route_plan is not None and not args.hierarchical):
+                # Appels simultanés (--async, ou voie directe choisie par le routage)
+                asyncio.run(run.run_async(company_tickets, max(1, args.concurrency)))
+            elif args.hierarchical or (args.max_company_tokens is not None and args.over_budget == "chunk"):
+                # Entreprises traitées une par une, lots d'une entreprise analysés en parallèle
+                asyncio.run(run.run_async(company_tickets, 1))
+            else:
+                run.run_sync(company_tickets)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    _print_timings(time.perf_counter() - start, run.latencies)
+    if run.stream_stats:
+        _print_stream_stats(run.stream_stats)
+    scheduler.report()
+    if route_plan is not None:
+        report_actual(route_plan, time.perf_counter() - start)
@@ -0,0 +1,120 @@
+import argparse
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# 🧹 Motif unique (un seul passage sur le texte) équivalent aux quatre re.sub historiques :
+#   1. \n+ -> ' '   2. \s{2,} -> ' '   3. e-mails   4. numéros de téléphone
+# - Une suite d'espaces est remplacée par ' ' si elle contient un saut de ligne ou au moins deux
+#   caractères : c'est exactement le résultat des étapes 1 et 2 enchaînées.
+# - Dans un numéro, un séparateur d'espaces quelconque (\s+) correspond au \s unique que voyait
+#   l'étape 4 après normalisation.
+# - Un numéro ne peut pas se terminer au début d'une adresse e-mail (lookahead) : l'étape 3
+#   remplaçait l'adresse avant que l'étape 4 ne voie les chiffres.
+_EMAIL = r"\b[\w.-]+@[\w.-]+\.\w{2,4}\b"
+_PHONE_SEPARATOR = r"(?:[-.]|\s+)?"
+_PHONE = (
+    r"\b\d{2,3}" + _PHONE_SEPARATOR + r"\d{2,3}" + _PHONE_SEPARATOR + r"\d{2,3}" + _PHONE_SEPARATOR
+    + r"\d{2,3}\b(?![\w.-]*@[\w.-]+\.\w{2,4}\b)"
+)
+ANONYMIZATION_PATTERN = re.compile(rf"(?P<space>\s{{2,}}|\n)|(?P<email>{_EMAIL})|(?P<phone>{_PHONE})")
+
+_REPLACEMENTS = {"space": " ", "email": "[EMAIL_SUPPRIMÉ]", "phone": "[NUMERO_SUPPRIMÉ]"}
+
+# 📦 En dessous de ce nombre de tickets, le pool de processus coûte plus qu'il ne rapporte
+POOL_THRESHOLD = 5000
+POOL_CHUNKSIZE = 1000
+
+
+def _replacement(match):
+    return _REPLACEMENTS[match.lastgroup]
+
+
+def clean_text(text):
+    """Nettoyage et anonymisation du texte (sauts de ligne, espaces, e-mails, téléphones)."""
+    return ANONYMIZATION_PATTERN.sub(_replacement, text).strip()
+
+
+def clean_description(ticket):
+    """Description nettoyée d'un ticket, pré-calculée si le ticket est passé par un AnonymizationPool."""
+    if "_description" in ticket:
+        return ticket["_description"]
+    return clean_text(ticket['description'] or "Aucune description.")
+
+
+def clean_texts(texts):
+    return [clean_text(text) for text in texts]
+
+
+class AnonymizationPool:
+    """Pool de processus qui nettoie en parallèle les descriptions des gros ensembles de tickets."""
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def prepare(self, tickets_list):
+        """Renseigne `_description` sur chaque ticket (par lots dans le pool pour les gros volumes)."""
+        if self.executor is None or len(tickets_list) < POOL_THRESHOLD:
+            return
+        texts = [ticket['description'] or "Aucune description." for ticket in tickets_list]
+        chunks = [texts[start:start + POOL_CHUNKSIZE] for start in range(0, len(texts), POOL_CHUNKSIZE)]
+        start = 0
+        for cleaned in self.executor.map(clean_texts, chunks):
+            for ticket, description in zip(tickets_list[start:start + len(cleaned)], cleaned):
+                ticket["_description"] = description
+            start += len(cleaned)
+
+
+def legacy_clean_text(text):
+    """Implémentation historique des scripts, conservée pour le benchmark et la vérification."""
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r'\s{2,}', ' ', text)
+    text = re.sub(r'\b[\w.-]+@[\w.-]+\.\w{2,4}\b', '[EMAIL_SUPPRIMÉ]', text)
+    text = re.sub(r'\b\d{2,3}[-.\s]?\d{2,3}[-.\s]?\d{2,3}[-.\s]?\d{2,3}\b', '[NUMERO_SUPPRIMÉ]', text)
+    return text.strip()
+
+
+def benchmark(data_path, workers):
+    """Compare le débit (tickets/s) de l'ancienne fonction, du motif unique et du pool."""
+    from ticket_loader import iter_tickets
+
+    texts = [ticket.get('description') or "Aucune description." for ticket, _ in iter_tickets(data_path)]
+    print(f"📊 {len(texts)} descriptions chargées depuis {data_path}")
+
+    start = time.perf_counter()
+    expected = [legacy_clean_text(text) for text in texts]
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cleaned = clean_texts(texts)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = [texts[i:i + POOL_CHUNKSIZE] for i in range(0, len(texts), POOL_CHUNKSIZE)]
+        pooled = [text for chunk in executor.map(clean_texts, chunks) for text in chunk]
+    parallel = time.perf_counter() - start
+
+    for name, elapsed in (("clean_text historique", legacy), ("motif unique", single), (f"pool ({workers})", parallel)):
+        print(f"   - {name:<22} : {len(texts) / elapsed:>12,.0f} tickets/s ({elapsed:.2f}s)")
+
+    mismatches = sum(a != b for a, b in zip(expected, cleaned)) + sum(a != b for a, b in zip(expected, pooled))
+    print("✅ Sorties identiques" if not mismatches else f"🚨 {mismatches} sortie(s) différente(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark de l'anonymisation des descriptions.")
+    parser.add_argument("--data", default="data.json", help="Export des tickets (JSON ou JSONL).")
+    parser.add_argument("--workers", type=int, default=4, help="Nombre de processus du pool (défaut : 4).")
+    args = parser.parse_args()
+    benchmark(args.data, args.workers)
@@ -0,0 +1,57 @@
+import json
+import os
+
+# 📏 Limites d'un fichier d'entrée de l'API Batch (surchargeables en ligne de commande)
+MAX_BATCH_FILE_BYTES = 500 * 1024 * 1024
+MAX_BATCH_REQUESTS = 1_000_000
+
+
+class BatchFileWriter:
+    """Écrit les requêtes batch en JSONL au fil de l'eau, en changeant de fichier aux limites du fournisseur."""
+
+    def __init__(self, folder, prefix="batch_requests", max_bytes=MAX_BATCH_FILE_BYTES,
+                 max_requests=MAX_BATCH_REQUESTS):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_requests = max_requests
+        self.paths = []
+        self.request_count = 0
+        self._file = None
+        self._bytes = 0
+        self._requests = 0
+
+    def _next_file(self):
+        self.close()
+        path = os.path.join(self.folder, f"{self.prefix}_{len(self.paths) + 1:03d}.jsonl")
+        self._file = open(path, "wb")
+        self._bytes = 0
+        self._requests = 0
+        self.paths.append(path)
+
+    def write(self, custom_id, body):
+        line = (json.dumps({"custom_id": custom_id, "body": body}, ensure_ascii=False) + "\n").encode("utf-8")
+        if len(line) > self.max_bytes:
+            raise ValueError(f"Requête {custom_id} trop volumineuse pour un fichier batch ({len(line)} octets)")
+        if (
+            self._file is None
+            or self._bytes + len(line) > self.max_bytes
+            or self._requests >= self.max_requests
+        ):
+            self._next_file()
+        self._file.write(line)
+        self._bytes += len(line)
+        self._requests += 1
+        self.request_count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
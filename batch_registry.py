@@ -0,0 +1,318 @@
+import logging
+import os
+import random
+import sqlite3
+import time
+import uuid
+
+from batch_results import iter_jsonl_lines
+from scheduler import BACKOFF_BASE, BACKOFF_MAX, get_scheduler, is_transient
+
+# 📂 Registre des batchs (survit aux redémarrages du processus)
+REGISTRY_PATH = "summaries/batches/registry.sqlite"
+
+TERMINAL_STATUSES = {"SUCCESS", "FAILED", "TIMEOUT_EXCEEDED", "CANCELLED"}
+# Tours de suivi consécutifs sans aucun statut obtenu avant d'abandonner le suivi (le run reste reprenable)
+MAX_STATUS_FAILURES = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    model TEXT NOT NULL,
+    state TEXT NOT NULL,            -- preparing, ready, submitted, done, abandoned
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    file_id TEXT,                   -- renseigné après l'upload
+    job_id TEXT                     -- renseigné après la création du job
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_file TEXT,
+    error_file TEXT,
+    downloaded_to TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS requests (
+    custom_id TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    company TEXT NOT NULL,
+    method TEXT NOT NULL,
+    PRIMARY KEY (run_id, custom_id)
+);
+"""
+
+
+class BatchRegistry:
+    """Registre SQLite des runs batch : fichiers, jobs, statuts et correspondance custom_id → entreprise."""
+
+    def __init__(self, path=REGISTRY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    # 🗂️ Runs
+    def start_run(self, job_type, model):
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO runs (run_id, job_type, model, state, created_at) VALUES (?, ?, ?, 'preparing', ?)",
+                (run_id, job_type, model, time.time())
+            )
+        return run_id
+
+    def resumable_run(self, job_type):
+        """Dernier run non terminé dont les fichiers sont prêts ou déjà envoyés.
+
+        Un run interrompu pendant l'envoi est repris (les jobs déjà créés ne sont pas resoumis) ;
+        seuls les runs interrompus avant tout upload ou création de job sont abandonnés.
+        """
+        started = (
+            "EXISTS (SELECT 1 FROM files WHERE files.run_id = runs.run_id AND files.file_id IS NOT NULL)"
+            " OR EXISTS (SELECT 1 FROM jobs WHERE jobs.run_id = runs.run_id)"
+        )
+        with self.connection:
+            self.connection.execute(
+                f"UPDATE runs SET state = 'abandoned' WHERE job_type = ? AND state = 'preparing' AND NOT ({started})",
+                (job_type,)
+            )
+        row = self.connection.execute(
+            "SELECT run_id FROM runs WHERE job_type = ? AND state IN ('preparing', 'ready', 'submitted')"
+            " ORDER BY created_at DESC LIMIT 1",
+            (job_type,)
+        ).fetchone()
+        return row["run_id"] if row else None
+
+    def mark_ready(self, run_id):
+        """Fichiers batch écrits et enregistrés : le run sera repris, et non abandonné, après un arrêt."""
+        self.set_run_state(run_id, "ready")
+
+    def set_run_state(self, run_id, state):
+        with self.connection:
+            self.connection.execute("UPDATE runs SET state = ? WHERE run_id = ?", (state, run_id))
+
+    # 🧾 Requêtes et fichiers
+    def add_requests(self, run_id, rows):
+        """Enregistre des tuples (custom_id, company, method)."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO requests (custom_id, run_id, company, method) VALUES (?, ?, ?, ?)",
+                [(custom_id, run_id, company, method) for custom_id, company, method in rows]
+            )
+
+    def request_target(self, run_id, custom_id):
+        row = self.connection.execute(
+            "SELECT company, method FROM requests WHERE run_id = ? AND custom_id = ?", (run_id, custom_id)
+        ).fetchone()
+        return (row["company"], row["method"]) if row else (None, None)
+
+    def companies(self, run_id):
+        return [
+            row["company"]
+            for row in self.connection.execute(
+                "SELECT DISTINCT company FROM requests WHERE run_id = ? ORDER BY company", (run_id,)
+            )
+        ]
+
+    def add_file(self, run_id, path):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO files (path, run_id) VALUES (?, ?)", (path, run_id))
+
+    def files(self, run_id):
+        return self.connection.execute("SELECT * FROM files WHERE run_id = ? ORDER BY path", (run_id,)).fetchall()
+
+    def set_file_uploaded(self, path, file_id):
+        with self.connection:
+            self.connection.execute("UPDATE files SET file_id = ? WHERE path = ?", (file_id, path))
+
+    # 🚀 Jobs
+    def add_job(self, run_id, path, job_id, status):
+        with self.connection:
+            self.connection.execute("UPDATE files SET job_id = ? WHERE path = ?", (job_id, path))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, run_id, status, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, run_id, status, time.time())
+            )
+
+    def update_job(self, job_id, status, output_file=None, error_file=None):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, output_file = COALESCE(?, output_file),"
+                " error_file = COALESCE(?, error_file), updated_at = ? WHERE job_id = ?",
+                (status, output_file, error_file, time.time(), job_id)
+            )
+
+    def jobs(self, run_id):
+        return self.connection.execute("SELECT * FROM jobs WHERE run_id = ? ORDER BY job_id", (run_id,)).fetchall()
+
+    def pending_jobs(self, run_id):
+        return [job for job in self.jobs(run_id) if job["status"] not in TERMINAL_STATUSES]
+
+    def set_downloaded(self, job_id, path):
+        with self.connection:
+            self.connection.execute("UPDATE jobs SET downloaded_to = ? WHERE job_id = ?", (path, job_id))
+
+    def close(self):
+        self.connection.close()
+
+
+def _upload(client, path):
+    # Le fichier est rouvert à chaque tentative
+    with open(path, "rb") as f:
+        return client.files.upload(file={"file_name": os.path.basename(path), "content": f}, purpose="batch")
+
+
+def _existing_job(client, run_id, part):
+    """Job déjà créé pour ce fichier (métadonnées ``run_id``/``part``), ou None."""
+    jobs = get_scheduler().call(
+        lambda: client.batch.jobs.list(metadata={"run_id": run_id, "part": part}),
+        label=f"Recherche du batch {part}"
+    )
+    for job in jobs.data or []:
+        metadata = job.metadata or {}
+        if metadata.get("run_id") == run_id and metadata.get("part") == part:
+            return job
+    return None
+
+
+def _create_job(client, run_id, model, path, file_id, metadata):
+    """Crée le job d'un fichier sans jamais le créer deux fois.
+
+    La création n'est pas idempotente : elle n'est tentée qu'une fois par appel. Après une erreur
+    temporaire (la requête a pu aboutir sans que la réponse arrive), on cherche d'abord le job par
+    ses métadonnées avant de recommencer.
+    """
+    scheduler = get_scheduler()
+    part = os.path.basename(path)
+    attempt = 0
+    while True:
+        try:
+            return scheduler.call(lambda: client.batch.jobs.create(
+                input_files=[file_id],
+                model=model,
+                endpoint="/v1/chat/completions",
+                metadata={**metadata, "run_id": run_id, "part": part}
+            ), label=f"Création du batch {path}", retry=False)
+        except Exception as e:
+            if not is_transient(e) or attempt >= scheduler.max_retries:
+                raise
+            logging.warning(f"⚠️ Création du batch {path} incertaine ({e}) : recherche d'un job existant")
+        time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+        attempt += 1
+        existing = _existing_job(client, run_id, part)
+        if existing is not None:
+            logging.info(f"♻️ Batch {existing.id} déjà créé pour {path}")
+            return existing
+
+
+def submit_run(client, registry, run_id, model, metadata):
+    """Upload les fichiers et crée les jobs qui ne l'ont pas encore été (reprise sans double soumission)."""
+    scheduler = get_scheduler()
+    for row in registry.files(run_id):
+        file_id = row["file_id"]
+        if file_id is None:
+            # Un upload rejoué ne laisse au pire qu'un fichier inutilisé : il garde les nouvelles tentatives
+            batch_data = scheduler.call(lambda: _upload(client, row["path"]), label=f"Upload {row['path']}")
+            file_id = batch_data.id
+            registry.set_file_uploaded(row["path"], file_id)
+
+        if row["job_id"] is None:
+            batch_job = _create_job(client, run_id, model, row["path"], file_id, metadata)
+            registry.add_job(run_id, row["path"], batch_job.id, batch_job.status)
+            logging.info(f"🚀 Batch soumis : {batch_job.id} ({row['path']})")
+
+    registry.set_run_state(run_id, "submitted")
+
+
+def poll_jobs(client, registry, run_id, min_interval=5, max_interval=300, timeout=None,
+              max_failures=MAX_STATUS_FAILURES):
+    """Suit tous les jobs d'un run en même temps, avec un intervalle qui double tant que rien ne change.
+
+    Renvoie True quand tous les jobs sont terminés, False si ``timeout`` (secondes) est dépassé ou si
+    aucun statut n'a pu être obtenu pendant ``max_failures`` tours consécutifs.
+    """
+    scheduler = get_scheduler()
+    start = time.time()
+    interval = min_interval
+    failures = 0
+    while True:
+        changed = False
+        fetched = False
+        for job in registry.pending_jobs(run_id):
+            try:
+                batch_status = scheduler.call(
+                    lambda: client.batch.jobs.get(job_id=job["job_id"]), label=f"Statut du batch {job['job_id']}"
+                )
+            except Exception as e:
+                logging.warning(f"⚠️ Statut indisponible pour le batch {job['job_id']} : {e}")
+                continue
+            fetched = True
+            if batch_status.status != job["status"]:
+                changed = True
+                logging.info(f"🔄 Batch {job['job_id']} : {job['status']} → {batch_status.status}")
+            registry.update_job(
+                job["job_id"], batch_status.status,
+                getattr(batch_status, "output_file", None), getattr(batch_status, "error_file", None)
+            )
+
+        pending = registry.pending_jobs(run_id)
+        if not pending:
+            return True
+        if timeout is not None and time.time() - start > timeout:
+            return False
+        failures = 0 if fetched else failures + 1
+        if failures >= max_failures:
+            logging.error(f"❌ Run {run_id} : aucun statut obtenu pendant {failures} tours, suivi interrompu")
+            print(f"🚨 Statuts des batchs indisponibles : suivi interrompu (relancer pour reprendre le run {run_id})")
+            return False
+
+        statuses = ", ".join(sorted({job["status"] for job in pending}))
+        print(f"⏳ En attente des résultats... {len(pending)} batch(s) en cours ({statuses})")
+        # Backoff exponentiel avec gigue : on revient au rythme rapide dès qu'un statut change
+        interval = min_interval if changed else min(max_interval, interval * 2)
+        time.sleep(interval * random.uniform(0.8, 1.2))
+
+
+def download_results(client, registry, run_id, folder, on_line=None):
+    """Télécharge la sortie de chaque job réussi qui ne l'a pas encore été.
+
+    ``on_line(line)`` reçoit chaque ligne JSONL complète (en octets) pendant le téléchargement.
+    """
+    paths = []
+    for job in registry.jobs(run_id):
+        if job["status"] != "SUCCESS":
+            if job["status"] in TERMINAL_STATUSES:
+                logging.error(f"❌ Batch {job['job_id']} terminé avec le statut {job['status']}")
+                print(f"🚨 Batch {job['job_id']} : {job['status']}")
+            continue
+        if job["downloaded_to"]:
+            paths.append(job["downloaded_to"])
+            continue
+
+        output_file_path = os.path.join(folder, f"batch_results_{job['job_id']}.jsonl")
+        output_file = get_scheduler().call(
+            lambda: client.files.download(file_id=job["output_file"]), label=f"Résultats du batch {job['job_id']}"
+        )
+        # La réponse est lue en flux : elle est toujours fermée pour rendre sa connexion au pool partagé
+        try:
+            with open(output_file_path, "wb") as f_out:
+
+                def written(chunks):
+                    for chunk in chunks:
+                        f_out.write(chunk)
+                        yield chunk
+
+                for line in iter_jsonl_lines(written(output_file.stream)):
+                    if on_line is not None:
+                        on_line(line)
+        finally:
+            output_file.close()
+        registry.set_downloaded(job["job_id"], output_file_path)
+        paths.append(output_file_path)
+    return paths
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+
+
+def iter_jsonl_lines(chunks):
+    """Découpe un flux d'octets en lignes complètes.
+
+    Le découpage se fait sur les octets : un saut de ligne n'apparaît jamais au milieu d'un
+    caractère UTF-8 multi-octets, chaque ligne peut donc être décodée entière en toute sécurité.
+    """
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+def _company_dir(company):
+    return company.replace(' ', '_').replace('/', '_')
+
+
+class BatchResultAssembler:
+    """Range chaque résultat batch dans le rapport de son entreprise, ligne par ligne.
+
+    Chaque section (méthode d'analyse) est écrite dans ``summaries/<entreprise>/sections/<run>/`` dès
+    son arrivée ; le rapport de l'entreprise est assemblé dès que toutes ses sections sont là.
+    Seule la ligne en cours est gardée en mémoire, et les sections déjà reçues survivent à un arrêt.
+    """
+
+    def __init__(self, registry, run_id, methods, root="summaries", suffix="causes_batch_summary.txt"):
+        self.registry = registry
+        self.run_id = run_id
+        self.methods = methods  # [(clé, titre)] dans l'ordre du rapport
+        self.root = root
+        self.suffix = suffix
+        self.reports = []
+        self.errors = 0
+
+    def _sections_dir(self, company):
+        return os.path.join(self.root, _company_dir(company), "sections", self.run_id)
+
+    def feed(self, line):
+        result = json.loads(line)
+        custom_id = result.get("custom_id")
+        company, method = self.registry.request_target(self.run_id, custom_id)
+        if company is None:
+            logging.warning(f"⚠️ Résultat batch inconnu : {custom_id}")
+            return
+
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code", 200) != 200:
+            self.errors += 1
+            logging.error(f"❌ Erreur batch pour {company} ({method}) : {result.get('error') or response}")
+            return
+        self.write_section(company, method, response["body"]["choices"][0]["message"]["content"])
+
+    def write_section(self, company, method, content):
+        """Enregistre une section (réponse batch ou section calculée localement) ; assemble si tout est là."""
+        sections_dir = self._sections_dir(company)
+        os.makedirs(sections_dir, exist_ok=True)
+        with open(os.path.join(sections_dir, f"{method}.md"), "w", encoding="utf-8") as f:
+            f.write(content)
+
+        if all(os.path.exists(os.path.join(sections_dir, f"{key}.md")) for key, _ in self.methods):
+            self.assemble(company)
+
+    def assemble(self, company):
+        """Écrit le rapport de l'entreprise à partir des sections reçues, dans l'ordre des méthodes."""
+        sections_dir = self._sections_dir(company)
+        filename = os.path.join(self.root, _company_dir(company), f"{_company_dir(company)}_{self.suffix}")
+        with open(filename, "w", encoding="utf-8") as report:
+            report.write(f"# Analyse des causes — {company}\n\n")
+            for method_key, method_title in self.methods:
+                path = os.path.join(sections_dir, f"{method_key}.md")
+                report.write(f"## {method_title}\n\n")
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        report.write(f.read().strip() + "\n\n")
+                else:
+                    report.write("_Section indisponible (requête batch en échec)._\n\n")
+
+        self.reports.append(filename)
+        logging.info(f"✅ Rapport batch assemblé pour {company} : {filename}")
+        print(f"\n✅ Rapport final enregistré pour {company} : {filename}\n")
+
+    def finish(self):
+        """Assemble les rapports restés incomplets (sections en échec) une fois tous les jobs traités."""
+        assembled = set(self.reports)
+        for company in self.registry.companies(self.run_id):
+            filename = os.path.join(self.root, _company_dir(company), f"{_company_dir(company)}_{self.suffix}")
+            if filename not in assembled and os.path.isdir(self._sections_dir(company)):
+                self.assemble(company)
+        return self.reports
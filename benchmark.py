@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_mistral import add_mock_arguments, mock_config, start_server
+from ticket_loader import iter_tickets
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 🏁 Scénarios mesurés : (script, options) ; chaque script tourne dans un dossier temporaire, sans cache
+SCENARIOS = {
+    "analyze": ("prompt-engineering.py", ["--async", "--no-cache"]),
+    "analyze-text": ("prompt-engineering-without-json.py", ["--async", "--no-cache"]),
+    "causes": ("prompt-engineering-causes.py", ["--no-cache"]),
+    "causes-stream": ("prompt-engineering-causes.py", ["--async", "--stream", "--no-cache"]),
+    "batch": ("prompt-engineering-causes-with-batches.py", ["--new-run"]),
+}
+METRICS = ("companies_per_minute", "tokens_per_second", "latency_p50", "latency_p95", "peak_rss_mb")
+# Sens d'une régression pour chaque mesure comparée à la référence (--baseline)
+LOWER_IS_WORSE = {"companies_per_minute", "tokens_per_second"}
+
+
+def count_companies(data_path):
+    return len({ticket.get("company", "Inconnue") for ticket, _ in iter_tickets(data_path)})
+
+
+def _peak_rss_mb(rusage):
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_script(script, options, data_path, env, workdir):
+    """Lance un script et attend sa fin ; renvoie (code de sortie, secondes, pic de RSS en Mo ou None)."""
+    command = [sys.executable, os.path.join(ROOT, script), "--data", data_path, *options]
+    with open(os.path.join(workdir, "output.log"), "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss = _peak_rss_mb(rusage)
+        else:
+            process.wait()
+            peak_rss = None
+        return process.returncode, time.perf_counter() - start, peak_rss
+
+
+def run_scenario(name, server, url, data_path, companies, keep):
+    script, options = SCENARIOS[name]
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    env = {**os.environ, "MISTRAL_SERVER_URL": url, "MISTRAL_API_KEY": os.environ.get("MISTRAL_API_KEY", "mock")}
+    server.state.reset()
+    try:
+        returncode, seconds, peak_rss = run_script(script, options, data_path, env, workdir)
+        stats = server.state.stats()
+        if returncode != 0:
+            with open(os.path.join(workdir, "output.log"), "r", encoding="utf-8", errors="replace") as f:
+                print(f"🚨 {name} : code de sortie {returncode}\n{''.join(f.readlines()[-15:])}")
+    finally:
+        if keep:
+            print(f"📂 {name} : sorties conservées dans {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+    return {
+        "scenario": name,
+        "returncode": returncode,
+        "seconds": round(seconds, 3),
+        "companies": companies,
+        "companies_per_minute": round(companies / seconds * 60, 2),
+        "tokens_per_second": round(tokens / seconds, 1),
+        "latency_p50": None if stats["latency_p50"] is None else round(stats["latency_p50"], 3),
+        "latency_p95": None if stats["latency_p95"] is None else round(stats["latency_p95"], 3),
+        "peak_rss_mb": None if peak_rss is None else round(peak_rss, 1),
+        "requests": stats["requests"],
+        "rate_limited": stats["rate_limited"],
+        "failures": stats["failures"],
+    }
+
+
+def _format(value, unit=""):
+    return "—" if value is None else f"{value:g}{unit}"
+
+
+def print_results(results):
+    print("\n🏁 Résultats (serveur Mistral factice) :")
+    print(f"{'Scénario':<15} {'Durée':>8} {'Entr./min':>10} {'Tokens/s':>9} {'p50':>7} {'p95':>7} {'RSS max':>9} {'429':>5}")
+    for r in results:
+        print(
+            f"{r['scenario']:<15} {r['seconds']:>7.1f}s {r['companies_per_minute']:>10g} {r['tokens_per_second']:>9g} "
+            f"{_format(r['latency_p50'], 's'):>7} {_format(r['latency_p95'], 's'):>7} "
+            f"{_format(r['peak_rss_mb'], ' Mo'):>9} {r['rate_limited']:>5}"
+        )
+
+
+def regressions(results, baseline, tolerance):
+    """Écarts au-delà de ``tolerance`` (fraction) par rapport à un rapport précédent, scénario par scénario."""
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    found = []
+    for r in results:
+        before = previous.get(r["scenario"])
+        if before is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (metric in LOWER_IS_WORSE and change < -tolerance) or (metric not in LOWER_IS_WORSE and change > tolerance):
+                found.append(f"{r['scenario']} : {metric} {old:g} → {new:g} ({change:+.0%})")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mesure la chaîne d'analyse contre un serveur Mistral factice (aucun coût d'API)."
+    )
+    parser.add_argument("--data", default="data.json", help="Export des tickets utilisé (défaut : data.json).")
+    parser.add_argument(
+        "--scenario", action="append", choices=list(SCENARIOS),
+        help="Scénario à mesurer (option répétable ; par défaut : tous)."
+    )
+    parser.add_argument("--json", dest="json_output", help="Écrit les résultats dans ce fichier JSON.")
+    parser.add_argument("--baseline", help="Rapport JSON de référence (--json d'une exécution précédente).")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2,
+        help="Écart toléré par rapport à la référence avant de signaler une régression (défaut : 0.2)."
+    )
+    parser.add_argument("--keep", action="store_true", help="Conserve les dossiers de travail des scénarios.")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    data_path = os.path.abspath(args.data)
+    companies = count_companies(data_path)
+    config = mock_config(args)
+    server, url = start_server(config)
+    print(f"🧪 Serveur factice : {url} ({companies} entreprise(s) dans {args.data})")
+
+    results = []
+    for name in args.scenario or list(SCENARIOS):
+        print(f"🏃 {name}...")
+        results.append(run_scenario(name, server, url, data_path, companies, args.keep))
+    server.shutdown()
+    print_results(results)
+
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "mock": vars(config), "results": results}, f, indent=2)
+        print(f"💾 Résultats enregistrés : {args.json_output}")
+
+    failed = [r["scenario"] for r in results if r["returncode"] != 0]
+    found = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"📉 Régression : {line}")
+        if not found:
+            print(f"✅ Aucune régression au-delà de {args.tolerance:.0%} par rapport à {args.baseline}")
+    if failed:
+        print(f"🚨 Scénario(s) en échec : {', '.join(failed)}")
+    sys.exit(1 if failed or found else 0)
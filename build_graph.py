@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# 📂 Empreintes des artefacts construits (entrées et sortie de chaque nœud)
+STATE_PATH = "summaries/.build/graph.sqlite"
+
+READ_SIZE = 1024 * 1024
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_json(value):
+    """Empreinte d'une valeur JSON (clés triées : indépendante de l'ordre d'insertion des dict)."""
+    return hash_text(json.dumps(value, ensure_ascii=False, sort_keys=True))
+
+
+def hash_file(path):
+    """Empreinte du contenu d'un fichier, lu par blocs ; None s'il n'existe pas."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(READ_SIZE):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def hash_sources(*paths):
+    """Empreinte du code d'une étape : modifier l'un de ces fichiers rend ses artefacts obsolètes."""
+    return hash_json([(os.path.basename(path), hash_file(path)) for path in paths])
+
+
+# 🧱 Nœud du graphe : un artefact et les empreintes de tout ce dont il dépend
+@dataclass
+class Node:
+    key: str  # identifiant unique, ex. "summary:causes:ALK"
+    inputs: dict  # nom -> empreinte (sortie d'un autre nœud, code de l'étape, options)
+    output: str = None  # fichier produit : reconstruit s'il a disparu
+    payload: object = None  # données utiles à la recette (entreprise, chemins...)
+
+    @property
+    def input_hash(self):
+        return hash_json(self.inputs)
+
+
+class BuildState:
+    """Empreintes des nœuds construits (SQLite), comme ``make`` avec des hash à la place des dates."""
+
+    def __init__(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            " key TEXT PRIMARY KEY,"
+            " input_hash TEXT NOT NULL,"
+            " output_hash TEXT,"
+            " built_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, key):
+        """(empreinte des entrées, empreinte de la sortie) du dernier build, ou None."""
+        return self.connection.execute(
+            "SELECT input_hash, output_hash FROM nodes WHERE key = ?", (key,)
+        ).fetchone()
+
+    def keys(self, prefix):
+        rows = self.connection.execute("SELECT key FROM nodes WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        return [key for (key,) in rows]
+
+    def forget(self, keys):
+        self.connection.executemany("DELETE FROM nodes WHERE key = ?", [(key,) for key in keys])
+        self.connection.commit()
+
+    def record(self, records):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO nodes (key, input_hash, output_hash, built_at) VALUES (?, ?, ?, ?)",
+            [(node.key, node.input_hash, output_hash, time.time()) for node, output_hash in records],
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class BuildGraph:
+    """Reconstruit les seuls nœuds obsolètes de chaque étape, étape par étape.
+
+    Un nœud est obsolète si l'empreinte de ses entrées a changé depuis son dernier build, s'il n'a jamais
+    été construit ou si son fichier a disparu. La sortie d'un nœud reconstruit à l'identique garde la même
+    empreinte : les étapes suivantes ne sont alors pas relancées.
+    """
+
+    def __init__(self, state, force=False):
+        self.state = state
+        self.force = force
+        self.report = []  # (étape, reconstruits, échecs, total, secondes)
+
+    def is_stale(self, node):
+        if self.force:
+            return True
+        record = self.state.get(node.key)
+        if record is None or record[0] != node.input_hash:
+            return True
+        return node.output is not None and not os.path.exists(node.output)
+
+    def output_hash(self, node):
+        """Empreinte courante de la sortie : contenu du fichier produit, sinon valeur enregistrée."""
+        if node.output is not None:
+            return hash_file(node.output)
+        record = self.state.get(node.key)
+        return record[1] if record is not None else None
+
+    def run_stage(self, name, nodes, build):
+        """Construit les nœuds obsolètes de l'étape avec ``build(nœuds) -> {clé: empreinte ou None}``.
+
+        Renvoie l'empreinte de sortie de chaque nœud de l'étape (None pour un échec).
+        """
+        start = time.perf_counter()
+        stale = [node for node in nodes if self.is_stale(node)]
+        print(f"🧱 {name} : {len(stale)}/{len(nodes)} à reconstruire")
+        built = build(stale) if stale else {}
+
+        records, failures = [], 0
+        for node in stale:
+            output_hash = built.get(node.key)
+            if output_hash is not None and node.output is not None:
+                # Même empreinte que celle relue aux builds suivants : le contenu du fichier écrit
+                output_hash = hash_file(node.output)
+            if output_hash is None:
+                failures += 1
+                logging.error(f"❌ {node.key} : échec de la construction")
+                continue
+            records.append((node, output_hash))
+        self.state.record(records)
+
+        outputs = dict.fromkeys(node.key for node in stale)
+        outputs.update((node.key, output_hash) for node, output_hash in records)
+        for node in nodes:
+            if node.key not in outputs:
+                outputs[node.key] = self.output_hash(node)
+        elapsed = time.perf_counter() - start
+        self.report.append((name, len(records), failures, len(nodes), elapsed))
+        logging.info(f"🧱 {name} : {len(records)} reconstruits, {failures} échecs, {len(nodes)} nœuds en {elapsed:.1f}s")
+        return outputs
+
+    def print_report(self):
+        print("\n🧱 Bilan du build :")
+        for name, rebuilt, failures, total, elapsed in self.report:
+            failed = f", {failures} échec(s)" if failures else ""
+            print(f"- {name} : {rebuilt}/{total} reconstruits{failed} ({elapsed:.1f}s)")
+
+
+def parallel(build_one, workers):
+    """Recette d'étape à partir d'une recette par nœud, les nœuds indépendants étant construits en parallèle.
+
+    ``build_one(nœud)`` renvoie l'empreinte de sa sortie ; une exception compte comme un échec.
+    """
+
+    def build(nodes):
+        def safe(node):
+            try:
+                return node.key, build_one(node)
+            except Exception as e:
+                logging.error(f"❌ {node.key} : {e}")
+                print(f"🚨 {node.key} : {e}")
+                return node.key, None
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return dict(executor.map(safe, nodes))
+
+    return build
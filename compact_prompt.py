@@ -0,0 +1,81 @@
+from anonymization import clean_description
+from token_estimation import estimate_tokens
+
+# 🗜️ Encodage compact des tickets : une ligne d'en-tête puis une ligne par ticket
+SEPARATOR = " | "
+COMPACT_COLUMNS = ("id", "titre", "priorité", "thèmes", "heures", "création", "description")
+GROUP_COLUMN = "groupe"  # ajoutée avec --dedup : nombre de tickets similaires, période, heures cumulées
+
+COMPACT_TITLE = "📂 **Tickets à analyser** :\n"
+
+# Consigne ajoutée au message système (identique pour toutes les entreprises)
+COMPACT_FORMAT_NOTE = (
+    "\nLes tickets sont fournis sous forme de tableau : une ligne d'en-tête, puis une ligne par ticket "
+    "avec les champs séparés par « | » (heures = temps suivi, création = date de création).\n"
+)
+GROUP_FORMAT_NOTE = (
+    "La colonne groupe, si elle est renseignée, indique que le ticket représente plusieurs tickets "
+    "quasi identiques (nombre, période et temps suivi cumulé).\n"
+)
+
+
+def _field(value):
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def format_ticket_row(ticket, group=None):
+    """Ticket nettoyé sur une seule ligne, dans l'ordre de ``COMPACT_COLUMNS`` (+ ``GROUP_COLUMN``)."""
+    values = (
+        ticket['id'],
+        ticket['title'],
+        ticket['priority'],
+        ticket['Themes'] or 'Non spécifié',
+        ticket['trackedHours'],
+        ticket['dateCreation'],
+        clean_description(ticket),
+    )
+    if group is not None:
+        values += (group,)
+    return SEPARATOR.join(_field(value) for value in values) + "\n"
+
+
+def compact_system_prompt(spec, grouped=False):
+    """Message système statique (préfixe commun mis en cache par le fournisseur) : consignes et format du tableau."""
+    system = spec.system_prompt + COMPACT_FORMAT_NOTE
+    return system + GROUP_FORMAT_NOTE if grouped else system
+
+
+def compact_columns(grouped=False):
+    """Ligne d'en-tête du tableau des tickets (``grouped`` : colonne des groupes de --dedup)."""
+    return SEPARATOR.join(COMPACT_COLUMNS + (GROUP_COLUMN,) if grouped else COMPACT_COLUMNS) + "\n"
+
+
+def compact_rows(tickets_list, clusters=None):
+    """Une ligne par ticket ; avec ``clusters`` (--dedup), une ligne par représentant de groupe."""
+    if clusters is None:
+        return [format_ticket_row(ticket) for ticket in tickets_list]
+    return [
+        format_ticket_row(cluster.representative, cluster.summary() if cluster.count > 1 else "")
+        for cluster in clusters
+    ]
+
+
+def messages_tokens(messages):
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def token_report(company_tickets, spec):
+    """Compare, par entreprise, les tokens d'entrée du prompt historique et du prompt compact."""
+    print(f"🧮 Tokens d'entrée estimés ({spec.name}) : prompt historique → prompt compact")
+    total_verbose = total_compact = 0
+    for company, tickets_list in company_tickets.items():
+        verbose = messages_tokens(spec.build_messages(company, tickets_list))
+        compact = messages_tokens(spec.build_messages(company, tickets_list, compact=True))
+        total_verbose += verbose
+        total_compact += compact
+        print(f"   - {company} : {verbose:,} → {compact:,} ({1 - compact / max(1, verbose):.0%} de moins)")
+    print(
+        f"   = Total : {total_verbose:,} → {total_compact:,} "
+        f"({1 - total_compact / max(1, total_verbose):.0%} de moins)"
+    )
+    return total_verbose, total_compact
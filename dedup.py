@@ -0,0 +1,162 @@
+import argparse
+import re
+import time
+import zlib
+from dataclasses import dataclass, field
+
+from anonymization import clean_description
+from ticket_dates import ticket_date
+
+# 🧬 MinHash « une permutation » : chaque shingle tombe dans un des NUM_BINS compartiments,
+# on garde le plus petit hash de chaque compartiment (un seul hash par shingle, coût linéaire)
+NUM_BINS = 64
+ROWS_PER_BAND = 4  # LSH : 16 bandes de 4 valeurs, candidats à partir d'environ 50 % de similarité
+DEFAULT_THRESHOLD = 0.8  # similarité de Jaccard estimée à partir de laquelle deux tickets sont regroupés
+
+_WORDS = re.compile(r"\w+")
+_EMPTY_BIN = -1
+
+
+@dataclass
+class TicketCluster:
+    representative: dict
+    representative_length: int = 0
+    first_date: object = None
+    last_date: object = None
+    tracked_hours: float = 0.0
+    members: list = field(default_factory=list)
+
+    @property
+    def count(self):
+        return len(self.members)
+
+    def add(self, ticket, description_length):
+        self.members.append(ticket)
+        if description_length > self.representative_length:
+            self.representative, self.representative_length = ticket, description_length
+        date_obj = ticket_date(ticket)
+        if date_obj is not None:
+            self.first_date = date_obj if self.first_date is None else min(self.first_date, date_obj)
+            self.last_date = date_obj if self.last_date is None else max(self.last_date, date_obj)
+        self.tracked_hours += _hours(ticket.get('trackedHours'))
+
+    def summary(self):
+        """Description du groupe ajoutée au ticket représentatif dans le prompt."""
+        period = ""
+        if self.first_date is not None:
+            period = f" du {self.first_date:%Y-%m-%d} au {self.last_date:%Y-%m-%d}"
+        return f"{self.count} tickets similaires{period}, temps suivi cumulé : {self.tracked_hours:g}h"
+
+
+def format_cluster(format_ticket, cluster):
+    """Bloc du prompt pour un groupe : le ticket représentatif, suivi du résumé du groupe s'il y a des doublons."""
+    block = format_ticket(cluster.representative)
+    if cluster.count == 1:
+        return block
+    return block.rstrip("\n") + f"\n- Regroupement : {cluster.summary()}\n\n"
+
+
+def _hours(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def shingle_hashes(text):
+    """Hashes des paires de mots consécutifs (le mot seul pour un texte d'un mot)."""
+    words = _WORDS.findall(text)
+    if len(words) < 2:
+        return [zlib.crc32(word.encode("utf-8")) for word in words]
+    return [zlib.crc32(f"{a} {b}".encode("utf-8")) for a, b in zip(words, words[1:])]
+
+
+def sketch(hashes):
+    """Signature MinHash (une permutation, compartiments vides densifiés par rotation)."""
+    bins = [_EMPTY_BIN] * NUM_BINS
+    for value in hashes:
+        index, rest = value % NUM_BINS, value // NUM_BINS
+        if bins[index] == _EMPTY_BIN or rest < bins[index]:
+            bins[index] = rest
+    if _EMPTY_BIN in bins and any(value != _EMPTY_BIN for value in bins):
+        dense = list(bins)
+        for index in range(NUM_BINS):
+            distance = 1
+            while dense[index] == _EMPTY_BIN:
+                borrowed = bins[(index + distance) % NUM_BINS]
+                if borrowed != _EMPTY_BIN:
+                    dense[index] = borrowed + distance * (1 << 32)
+                distance += 1
+        bins = dense
+    return tuple(bins)
+
+
+def similarity(sketch_a, sketch_b):
+    """Similarité de Jaccard estimée (part des compartiments identiques)."""
+    return sum(a == b for a, b in zip(sketch_a, sketch_b)) / NUM_BINS
+
+
+def cluster_tickets(tickets_list, threshold=DEFAULT_THRESHOLD):
+    """Regroupe les tickets quasi identiques (titre + description nettoyés), en temps linéaire.
+
+    Chaque ticket est comparé, via les bandes LSH, aux seuls premiers tickets (« meneurs ») des
+    groupes existants. Les groupes sont renvoyés dans l'ordre de leur premier ticket, avec pour
+    représentant le ticket à la description la plus longue. Un ticket sans titre ni description
+    forme toujours un groupe à lui seul.
+    """
+    clusters, leaders, buckets = [], [], {}
+    for ticket in tickets_list:
+        description = clean_description(ticket)
+        # Le texte de remplacement d'une description vide (« Aucune description. ») ne rapproche pas deux tickets
+        text = description if (ticket.get('description') or "").strip() else ""
+        hashes = shingle_hashes(f"{ticket.get('title') or ''} {text}".lower())
+        # Sans aucun mot, rien ne permet de dire que deux tickets se ressemblent : chacun forme son groupe
+        signature = sketch(hashes) if hashes else None
+        keys = [
+            (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            for band in range(NUM_BINS // ROWS_PER_BAND)
+        ] if signature is not None else []
+
+        target = None
+        for key in keys:
+            candidate = buckets.get(key)
+            if candidate is not None and similarity(signature, leaders[candidate]) >= threshold:
+                target = candidate
+                break
+
+        if target is None:
+            target = len(clusters)
+            clusters.append(TicketCluster(representative=ticket, representative_length=len(description)))
+            leaders.append(signature)
+            for key in keys:
+                buckets.setdefault(key, target)
+
+        clusters[target].add(ticket, len(description))
+    return clusters
+
+
+def benchmark(data_path, threshold):
+    """Mesure le regroupement par entreprise et le nombre de tickets économisés dans les prompts."""
+    from ticket_loader import load_company_tickets
+
+    company_tickets = load_company_tickets(data_path)
+    total = groups = 0
+    start = time.perf_counter()
+    for company, tickets_list in company_tickets.items():
+        clusters = cluster_tickets(tickets_list, threshold)
+        total += len(tickets_list)
+        groups += len(clusters)
+        print(f"   - {company} : {len(tickets_list)} tickets → {len(clusters)} groupes")
+    elapsed = time.perf_counter() - start
+    print(f"🧬 {total} tickets → {groups} groupes en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} tickets/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regroupement des tickets quasi identiques (MinHash/LSH).")
+    parser.add_argument("--data", default="data.json", help="Export des tickets (JSON ou JSONL).")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help=f"Similarité minimale pour regrouper deux tickets (défaut : {DEFAULT_THRESHOLD})."
+    )
+    args = parser.parse_args()
+    benchmark(args.data, args.threshold)
@@ -0,0 +1,280 @@
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+# 🏭 Générateur de tickets synthétiques (même schéma que les exports) pour les tests de charge
+BLOCK_SIZE = 10_000  # tickets tirés et écrits à la fois : mémoire constante quelle que soit la taille
+RECENT_PER_COMPANY = 20  # descriptions récentes gardées par entreprise pour fabriquer les quasi-doublons
+
+COMPANY_NAMES = (
+    "ACME corp", "ALK", "Novo nordisk", "Tucania", "Helios Énergie", "Banque Lémanique", "Orbital Santé",
+    "Groupe Vauban", "Mistral Logistique", "Atelier Numérique", "Cléo Assurances", "Pharma Rhône",
+)
+PROJECTS = ("Support", "Infrastructure", "Messagerie", "ERP", "Postes de travail", "Téléphonie", "Sécurité")
+PRIORITIES = (("P1", 0.08), ("P2", 0.32), ("P3", 0.45), ("P4", 0.15))
+FIRST_NAMES = ("jean", "marie", "luc", "sophie", "karim", "chloe", "thomas", "ines", "paul", "lea")
+LAST_NAMES = ("dupont", "martin", "bernard", "durand", "petit", "moreau", "laurent", "garcia")
+
+# 🏷️ Thème -> (titres, descriptions) ; le premier thème est le plus fréquent (loi de Zipf)
+THEMES = {
+    "Accès": (
+        ("Mot de passe expiré", "Compte verrouillé", "Accès refusé à l'application", "MFA ne fonctionne plus"),
+        (
+            "Impossible de me connecter depuis ce matin, le mot de passe est refusé.",
+            "Mon compte est verrouillé après trois tentatives, merci de le débloquer.",
+            "Le code MFA n'arrive plus sur mon téléphone, je ne peux pas valider la connexion.",
+            "Accès refusé au dossier partagé de l'équipe depuis la mise à jour des droits.",
+        ),
+    ),
+    "Réseau": (
+        ("VPN instable", "Pas de connexion Wi-Fi", "Lenteurs réseau", "Coupure internet"),
+        (
+            "Le VPN se déconnecte toutes les dix minutes en télétravail.",
+            "Aucune connexion Wi-Fi au troisième étage depuis hier.",
+            "Les applications métier sont très lentes, les pages mettent une minute à charger.",
+            "Coupure complète d'internet sur le site, plusieurs collègues impactés.",
+        ),
+    ),
+    "Matériel": (
+        ("Écran noir", "Imprimante hors service", "Clavier défectueux", "Poste très lent"),
+        (
+            "Écran noir au démarrage du poste, le voyant reste orange.",
+            "L'imprimante du couloir affiche une erreur de bourrage en permanence.",
+            "Plusieurs touches du clavier ne répondent plus.",
+            "Le poste met dix minutes à démarrer et se fige régulièrement.",
+        ),
+    ),
+    "Messagerie": (
+        ("Mails non reçus", "Boîte pleine", "Calendrier non synchronisé", "Pièce jointe bloquée"),
+        (
+            "Je ne reçois plus les mails externes depuis ce matin.",
+            "Ma boîte aux lettres est pleine, je ne peux plus envoyer de messages.",
+            "Le calendrier ne se synchronise plus sur le téléphone.",
+            "Une pièce jointe PDF est bloquée par l'antivirus de la messagerie.",
+        ),
+    ),
+    "Logiciel": (
+        ("Erreur ERP", "Licence expirée", "Plantage Excel", "Mise à jour échouée"),
+        (
+            "L'ERP affiche une erreur 500 lors de la validation des commandes.",
+            "La licence du logiciel de CAO a expiré, impossible de l'ouvrir.",
+            "Excel plante à l'ouverture des fichiers partagés.",
+            "La mise à jour automatique a échoué et le logiciel ne démarre plus.",
+        ),
+    ),
+    "Téléphonie": (
+        ("Ligne muette", "Softphone déconnecté", "Renvoi d'appel"),
+        (
+            "Ma ligne fixe est muette, aucune tonalité.",
+            "Le softphone se déconnecte pendant les appels clients.",
+            "Merci de mettre en place un renvoi d'appel vers mon portable.",
+        ),
+    ),
+}
+DETAILS = (
+    "C'est urgent, toute l'équipe est bloquée.", "Le problème revient chaque lundi.",
+    "J'ai déjà redémarré le poste sans succès.", "Cela arrive depuis la dernière mise à jour.",
+    "Capture d'écran jointe.", "Plusieurs collègues ont le même souci.", "",
+)
+
+
+def zipf_weights(count, exponent):
+    """Poids cumulés d'une loi de Zipf sur ``count`` rangs (le rang 1 est le plus fréquent)."""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def company_names(count):
+    names = list(COMPANY_NAMES[:count])
+    for index in range(len(names), count):
+        base = COMPANY_NAMES[index % len(COMPANY_NAMES)]
+        names.append(f"{base} {index // len(COMPANY_NAMES) + 1}")
+    return names
+
+
+class TicketGenerator:
+    """Tickets reproductibles (``seed``) avec la dissymétrie d'un export réel.
+
+    Entreprises et thèmes suivent une loi de Zipf, les dates forment des pics d'activité, une partie des
+    descriptions sont des quasi-doublons de tickets récents de la même entreprise, contiennent un e-mail
+    ou un téléphone, ou sont nulles. Seul un petit historique par entreprise est gardé en mémoire.
+    """
+
+    def __init__(self, seed=42, companies=50, start="2024-01-01", end="2025-12-31", zipf=1.1,
+                 duplicate_rate=0.2, pii_rate=0.15, null_rate=0.05, iso_date_rate=0.5, burst_rate=0.3):
+        self.random = random.Random(seed)
+        self.companies = company_names(companies)
+        self.company_weights = zipf_weights(len(self.companies), zipf)
+        self.themes = list(THEMES)
+        self.theme_weights = zipf_weights(len(self.themes), zipf)
+        self.projects = {
+            company: self.random.sample(PROJECTS, self.random.randint(1, 4)) for company in self.companies
+        }
+        self.start = datetime.fromisoformat(start)
+        self.days = max(1, (datetime.fromisoformat(end) - self.start).days)
+        # Pics d'activité : environ un par mois, d'une durée de 1 à 3 jours
+        self.bursts = sorted(
+            (self.random.randrange(self.days), self.random.randint(1, 3)) for _ in range(max(1, self.days // 30))
+        )
+        self.duplicate_rate = duplicate_rate
+        self.pii_rate = pii_rate
+        self.null_rate = null_rate
+        self.iso_date_rate = iso_date_rate
+        self.burst_rate = burst_rate
+        self.recent = {}
+        self.next_id = 0
+
+    def date(self):
+        rand = self.random
+        if rand.random() < self.burst_rate:
+            day, length = rand.choice(self.bursts)
+            day += rand.randrange(length)
+        else:
+            day = rand.randrange(self.days)
+            # Moins de tickets le week-end : la plupart sont reportés au vendredi
+            weekday = (self.start + timedelta(days=day)).weekday()
+            if weekday >= 5 and rand.random() < 0.8:
+                day = max(0, day - (weekday - 4))
+        moment = self.start + timedelta(
+            days=min(day, self.days), hours=rand.randint(7, 19), minutes=rand.randrange(60)
+        )
+        if rand.random() < self.iso_date_rate:
+            return moment.strftime("%Y-%m-%d")
+        return moment.strftime("%d/%m/%Y %H:%M")
+
+    def pii(self, company):
+        rand = self.random
+        if rand.random() < 0.5:
+            domain = company.split()[0].lower().replace("é", "e") + ".fr"
+            return f" Contact : {rand.choice(FIRST_NAMES)}.{rand.choice(LAST_NAMES)}@{domain}"
+        digits = [f"{rand.randrange(100):02d}" for _ in range(4)]
+        separator = rand.choice((" ", ".", "-", ""))
+        return f" Rappeler au 0{rand.randint(1, 9)}{separator}{separator.join(digits)}"
+
+    def near_duplicate(self, description):
+        """Variante proche : espaces, casse ou détail modifiés (ce que les groupes de dedup doivent absorber)."""
+        rand = self.random
+        variant = rand.randrange(3)
+        if variant == 0:
+            return description.replace(" ", "  ", 1) + rand.choice(("", " Merci.", " Cordialement."))
+        if variant == 1:
+            return description[:1].lower() + description[1:]
+        return description + " " + rand.choice(DETAILS)
+
+    def description(self, company, theme):
+        rand = self.random
+        if rand.random() < self.null_rate:
+            return None
+        recent = self.recent.setdefault(company, deque(maxlen=RECENT_PER_COMPANY))
+        if recent and rand.random() < self.duplicate_rate:
+            return self.near_duplicate(rand.choice(recent))
+        text = rand.choice(THEMES[theme][1])
+        detail = rand.choice(DETAILS)
+        if detail:
+            text += " " + detail
+        if rand.random() < self.pii_rate:
+            text += self.pii(company)
+        recent.append(text)
+        return text
+
+    def block(self, count):
+        """``count`` tickets ; les tirages pondérés sont faits par lot."""
+        rand = self.random
+        companies = rand.choices(self.companies, cum_weights=self.company_weights, k=count)
+        themes = rand.choices(self.themes, cum_weights=self.theme_weights, k=count)
+        priorities = rand.choices([p for p, _ in PRIORITIES], weights=[w for _, w in PRIORITIES], k=count)
+        tickets = []
+        for company, theme, priority in zip(companies, themes, priorities):
+            tickets.append({
+                "id": self.next_id,
+                "company": company,
+                "title": rand.choice(THEMES[theme][0]),
+                "description": self.description(company, theme),
+                "priority": priority,
+                "Themes": theme if rand.random() > 0.03 else None,
+                "project": rand.choice(self.projects[company]),
+                "trackedHours": round(min(40.0, rand.lognormvariate(0, 0.9)) * 4) / 4,
+                "dateCreation": self.date(),
+            })
+            self.next_id += 1
+        return tickets
+
+
+def write_tickets(generator, count, out, jsonl=False):
+    """Écrit ``count`` tickets en flux (tableau JSON ou JSONL) ; renvoie le nombre d'octets écrits."""
+    written = 0
+    if not jsonl:
+        written += out.write("[\n")
+    remaining = count
+    first = True
+    while remaining > 0:
+        tickets = generator.block(min(BLOCK_SIZE, remaining))
+        remaining -= len(tickets)
+        lines = [json.dumps(ticket, ensure_ascii=False) for ticket in tickets]
+        if jsonl:
+            chunk = "\n".join(lines) + "\n"
+        else:
+            chunk = ("" if first else ",\n") + ",\n".join(lines)
+        written += out.write(chunk)
+        first = False
+    if not jsonl:
+        written += out.write("\n]\n")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un export de tickets synthétiques pour les tests de charge.")
+    parser.add_argument("--tickets", type=int, default=10_000, help="Nombre de tickets (défaut : 10000).")
+    parser.add_argument(
+        "--companies", type=int, default=None,
+        help="Nombre d'entreprises (défaut : une pour 2 000 tickets, entre 5 et 500)."
+    )
+    parser.add_argument(
+        "--output", default="data.json",
+        help="Fichier produit, JSONL si l'extension est .jsonl, - pour la sortie standard (défaut : data.json)."
+    )
+    parser.add_argument("--jsonl", action="store_true", help="Un ticket par ligne (sinon : tableau JSON).")
+    parser.add_argument("--seed", type=int, default=42, help="Graine : même graine, même fichier (défaut : 42).")
+    parser.add_argument("--start", default="2024-01-01", help="Première date de création (défaut : 2024-01-01).")
+    parser.add_argument("--end", default="2025-12-31", help="Dernière date de création (défaut : 2025-12-31).")
+    parser.add_argument(
+        "--zipf", type=float, default=1.1, help="Exposant de Zipf des entreprises et des thèmes (défaut : 1.1)."
+    )
+    parser.add_argument(
+        "--duplicate-rate", type=float, default=0.2, help="Part de descriptions quasi dupliquées (défaut : 0.2)."
+    )
+    parser.add_argument(
+        "--pii-rate", type=float, default=0.15, help="Part de descriptions avec e-mail ou téléphone (défaut : 0.15)."
+    )
+    parser.add_argument("--null-rate", type=float, default=0.05, help="Part de descriptions nulles (défaut : 0.05).")
+    parser.add_argument(
+        "--iso-date-rate", type=float, default=0.5,
+        help="Part des dates au format AAAA-MM-JJ, les autres en JJ/MM/AAAA HH:MM (défaut : 0.5)."
+    )
+    args = parser.parse_args()
+
+    companies = args.companies or min(500, max(5, math.ceil(args.tickets / 2000)))
+    generator = TicketGenerator(
+        seed=args.seed, companies=companies, start=args.start, end=args.end, zipf=args.zipf,
+        duplicate_rate=args.duplicate_rate, pii_rate=args.pii_rate, null_rate=args.null_rate,
+        iso_date_rate=args.iso_date_rate,
+    )
+    jsonl = args.jsonl or args.output.endswith(".jsonl")
+
+    start = time.perf_counter()
+    if args.output == "-":
+        size = write_tickets(generator, args.tickets, sys.stdout, jsonl)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            size = write_tickets(generator, args.tickets, f, jsonl)
+    elapsed = time.perf_counter() - start
+    print(
+        f"🏭 {args.tickets} tickets ({companies} entreprises, {size / 1e6:.1f} M caractères) en {elapsed:.1f}s "
+        f"({args.tickets / max(elapsed, 1e-9):,.0f} tickets/s) → {args.output}",
+        file=sys.stderr,
+    )
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+from ticket_dates import ticket_date
+
+# 📂 État des analyses incrémentales (un fichier par analyse et par entreprise)
+STATE_DIR = "summaries/.state"
+
+UPDATE_TITLE = """📄 **Rapport précédent** (à mettre à jour, pas à réécrire de zéro) :
+
+{previous_summary}
+
+---
+
+🔄 **Mise à jour attendue :**  
+- Les statistiques ci-dessus portent sur l'ensemble des tickets et remplacent celles du rapport précédent.  
+- Intègre les nouveaux tickets ci-dessous dans les sections existantes (tendances, problèmes, causes, risques).  
+- Conserve la structure et le format du rapport précédent.  
+
+📂 **Nouveaux tickets depuis le dernier rapport** :
+
+"""
+
+
+def compute_watermark(tickets_list):
+    """Dernière `dateCreation` analysée et identifiants des tickets créés à cette date."""
+    dated = [(ticket_date(ticket), ticket['id']) for ticket in tickets_list]
+    dated = [(date_obj, ticket_id) for date_obj, ticket_id in dated if date_obj is not None]
+    if not dated:
+        return None
+
+    last_date = max(date_obj for date_obj, _ in dated)
+    return {
+        "date": last_date.isoformat(),
+        "ids": [ticket_id for date_obj, ticket_id in dated if date_obj == last_date],
+    }
+
+
+def delta_tickets(tickets_list, watermark):
+    """Tickets créés après le watermark (les dates illisibles ne sont jamais considérées comme nouvelles)."""
+    last_date = datetime.fromisoformat(watermark["date"])
+    known_ids = set(watermark["ids"])
+    delta = []
+    for ticket in tickets_list:
+        date_obj = ticket_date(ticket)
+        if date_obj is None:
+            continue
+        if date_obj > last_date or (date_obj == last_date and ticket['id'] not in known_ids):
+            delta.append(ticket)
+    return delta
+
+
+class WatermarkStore:
+    """Watermark et dernier résumé de chaque entreprise pour une analyse donnée."""
+
+    def __init__(self, analysis_name, root=STATE_DIR):
+        self.directory = os.path.join(root, analysis_name)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, company):
+        return os.path.join(self.directory, f"{company.replace(' ', '_').replace('/', '_')}.json")
+
+    def load(self, company):
+        try:
+            with open(self._path(company), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logging.warning(f"⚠️ État incrémental illisible pour {company}, reconstruction complète")
+            return None
+
+    def save(self, company, tickets_list, summary):
+        state = {"watermark": compute_watermark(tickets_list), "summary": summary}
+        # Écriture atomique : un arrêt brutal ne laisse jamais un état à moitié écrit
+        path = self._path(company)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def update_title(previous_summary):
+    """Titre de la section des tickets d'une mise à jour : rapport précédent puis consignes."""
+    return UPDATE_TITLE.format(previous_summary=previous_summary)
+
+
+def plan_update(store, company, tickets_list, max_delta_ratio):
+    """Décide comment analyser une entreprise en mode incrémental.
+
+    Renvoie ``("skip", None)`` si aucun ticket n'est nouveau, ``("update", (nouveaux tickets, rapport
+    précédent))`` pour une mise à jour du rapport précédent, ou ``("full", None)`` pour une reconstruction
+    complète. Le prompt de mise à jour est construit par le runner, comme le prompt complet.
+    """
+    state = store.load(company)
+    if not state or not state.get("watermark"):
+        return "full", None
+
+    delta = delta_tickets(tickets_list, state["watermark"])
+    if not delta:
+        return "skip", None
+    if len(delta) > max_delta_ratio * len(tickets_list):
+        logging.info(f"🔁 {company} : {len(delta)} nouveaux tickets, reconstruction complète")
+        return "full", None
+
+    logging.info(f"🔄 {company} : mise à jour avec {len(delta)} nouveau(x) ticket(s) sur {len(tickets_list)}")
+    return "update", (delta, state["summary"])
@@ -0,0 +1,315 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+try:
+    import resource
+except ImportError:  # Windows : pas de getrusage, pic mémoire non mesuré
+    resource = None
+
+# 📂 Rapports d'exécution : JSON horodaté par run, fichier Prometheus écrasé à chaque run
+METRICS_DIR = "summaries/.metrics"
+PROMETHEUS_PREFIX = "resume_ia"
+
+# Entreprise en cours de traitement : héritée par les tâches asyncio et asyncio.to_thread
+_company = contextvars.ContextVar("metrics_company", default=None)
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus en Mo, ou None si la plateforme ne le fournit pas."""
+    if resource is None:
+        return None
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+# ⏱️ Cumul d'une étape (pour une entreprise, ou hors entreprise comme le chargement)
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_mb: float = None  # pic du processus observé à la fin de l'étape
+
+    def add(self, other):
+        self.calls += other.calls
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+        if other.peak_rss_mb is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, other.peak_rss_mb)
+
+
+class RunMetrics:
+    """Chronomètres et compteurs d'une exécution, par étape et par entreprise.
+
+    Le temps CPU est celui du thread qui exécute l'étape (``time.thread_time``) : il reste juste avec
+    ``asyncio.to_thread``. Les étapes qui attendent dans la boucle asyncio ne mesurent que le temps réel.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.lock = threading.Lock()
+        self.stages = {}  # (étape, entreprise) -> StageStats
+        self.counters = {}  # (nom, entreprise) -> valeur
+        self.observations = {}  # (nom, entreprise) -> [valeurs], ex. latence de chaque appel Mistral
+
+    @contextmanager
+    def measure(self, stage, cpu=True):
+        company = _company.get()
+        start, start_cpu = time.perf_counter(), time.thread_time() if cpu else 0.0
+        try:
+            yield
+        finally:
+            sample = StageStats(
+                1, time.perf_counter() - start, time.thread_time() - start_cpu if cpu else 0.0, peak_rss_mb()
+            )
+            with self.lock:
+                self.stages.setdefault((stage, company), StageStats()).add(sample)
+
+    def count(self, name, value=1):
+        key = (name, _company.get())
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value):
+        key = (name, _company.get())
+        with self.lock:
+            self.observations.setdefault(key, []).append(value)
+
+    def _stage_totals(self, company=...):
+        totals = {}
+        for (stage, stage_company), stats in self.stages.items():
+            if company is ... or stage_company == company:
+                totals.setdefault(stage, StageStats()).add(stats)
+        return {stage: _rounded(asdict(stats)) for stage, stats in totals.items()}
+
+    def _counter_totals(self, company=...):
+        totals = {}
+        for (name, counter_company), value in self.counters.items():
+            if company is ... or counter_company == company:
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def _observation_summary(self, company=...):
+        values = {}
+        for (name, observed_company), observed in self.observations.items():
+            if company is ... or observed_company == company:
+                values.setdefault(name, []).extend(observed)
+        return {name: _summary(observed) for name, observed in values.items()}
+
+    def report(self, analysis, args=None):
+        """Rapport JSON de l'exécution : totaux par étape, puis détail de chaque entreprise."""
+        with self.lock:
+            companies = sorted(
+                {company for _, company in (*self.stages, *self.counters, *self.observations) if company is not None}
+            )
+            return {
+                "analysis": analysis,
+                "started_at": self.started_at,
+                "argv": sys.argv[1:],
+                "options": vars(args) if args is not None else {},
+                "wall_seconds": round(time.perf_counter() - self.start, 6),
+                "cpu_seconds": round(time.process_time() - self.start_cpu, 6),
+                "peak_rss_mb": _round(peak_rss_mb()),
+                "stages": self._stage_totals(),
+                "counters": self._counter_totals(),
+                "observations": self._observation_summary(),
+                "companies": {
+                    company: {
+                        "stages": self._stage_totals(company),
+                        "counters": self._counter_totals(company),
+                        "observations": self._observation_summary(company),
+                    }
+                    for company in companies
+                },
+            }
+
+
+def _round(value):
+    return None if value is None else round(value, 6)
+
+
+def _rounded(values):
+    return {key: _round(value) if isinstance(value, float) else value for key, value in values.items()}
+
+
+def _summary(values):
+    return {
+        "count": len(values), "sum": _round(sum(values)), "p50": _round(percentile(values, 0.5)),
+        "p95": _round(percentile(values, 0.95)), "max": _round(max(values)),
+    }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    # repr conserve tous les chiffres (timestamps compris), contrairement au format :g
+    return repr(float(value))
+
+
+def _metric_name(name):
+    return f"{PROMETHEUS_PREFIX}_{''.join(c if c.isalnum() else '_' for c in name)}"
+
+
+def prometheus_text(report):
+    """Rapport au format texte de Prometheus (collecteur « textfile » de node_exporter)."""
+    analysis = report["analysis"]
+    lines = []
+
+    def metric(name, help_text, samples, kind="gauge"):
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(label)}"' for key, label in {"analysis": analysis, **labels}.items())
+            lines.append(f"{name}{{{label_text}}} {_number(value)}")
+
+    metric(f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds", "Début du dernier run.", [({}, report["started_at"])])
+    metric(f"{PROMETHEUS_PREFIX}_run_wall_seconds", "Durée réelle du run.", [({}, report["wall_seconds"])])
+    metric(f"{PROMETHEUS_PREFIX}_run_cpu_seconds", "Temps CPU du processus.", [({}, report["cpu_seconds"])])
+    peak = report["peak_rss_mb"]
+    metric(
+        f"{PROMETHEUS_PREFIX}_peak_rss_bytes", "Pic de mémoire résidente du processus.",
+        [({}, None if peak is None else peak * 1024 * 1024)]
+    )
+    for field, help_text in (
+        ("wall_seconds", "Temps réel cumulé par étape."),
+        ("cpu_seconds", "Temps CPU cumulé par étape."),
+        ("calls", "Passages dans chaque étape."),
+    ):
+        metric(
+            f"{PROMETHEUS_PREFIX}_stage_{field}", help_text,
+            [({"stage": stage}, stats[field]) for stage, stats in report["stages"].items()]
+        )
+        metric(
+            f"{PROMETHEUS_PREFIX}_company_stage_{field}", f"{help_text[:-1]} et par entreprise.",
+            [
+                ({"company": company, "stage": stage}, stats[field])
+                for company, detail in report["companies"].items() for stage, stats in detail["stages"].items()
+            ]
+        )
+    for name, total in report["counters"].items():
+        metric(_metric_name(name), f"Compteur {name} du run.", [({}, total)])
+        metric(
+            _metric_name(f"company_{name}"), f"Compteur {name} par entreprise.",
+            [
+                ({"company": company}, detail["counters"][name])
+                for company, detail in report["companies"].items() if name in detail["counters"]
+            ]
+        )
+    for name, summary in report["observations"].items():
+        base = _metric_name(name)
+        label = f'analysis="{_label(analysis)}"'
+        lines.append(f"# HELP {base} Observations {name} du run.")
+        lines.append(f"# TYPE {base} summary")
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95")):
+            lines.append(f'{base}{{{label},quantile="{quantile}"}} {_number(summary[key])}')
+        lines.append(f"{base}_sum{{{label}}} {_number(summary['sum'])}")
+        lines.append(f"{base}_count{{{label}}} {summary['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _write(path, text):
+    # Écriture atomique : le collecteur ne lit jamais un fichier à moitié écrit
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def write_reports(metrics, analysis, args=None, folder=METRICS_DIR):
+    """Écrit le rapport JSON du run et le fichier Prometheus de l'analyse ; renvoie leurs chemins."""
+    os.makedirs(folder, exist_ok=True)
+    report = metrics.report(analysis, args)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(metrics.started_at))
+    json_path = os.path.join(folder, f"{analysis}_{stamp}.json")
+    prometheus_path = os.path.join(folder, f"{analysis}.prom")
+    _write(json_path, json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    _write(prometheus_path, prometheus_text(report))
+    return json_path, prometheus_path
+
+
+_metrics = None
+
+
+def get_metrics():
+    """Mesures partagées du processus (créées au premier usage, donc dès le chargement des tickets)."""
+    global _metrics
+    if _metrics is None:
+        _metrics = RunMetrics()
+    return _metrics
+
+
+def measure(stage, cpu=True):
+    """Chronomètre une étape pour l'entreprise en cours : ``with measure("prompt"): ...``."""
+    return get_metrics().measure(stage, cpu)
+
+
+def count(name, value=1):
+    get_metrics().count(name, value)
+
+
+def observe(name, value):
+    get_metrics().observe(name, value)
+
+
+@contextmanager
+def company_scope(company):
+    """Rattache les mesures du bloc (threads et tâches asyncio lancés dedans compris) à ``company``."""
+    token = _company.set(company)
+    try:
+        yield
+    finally:
+        _company.reset(token)
+
+
+@contextmanager
+def instrumented_run(analysis, args):
+    """Profil cProfile optionnel (--profile) et rapports écrits en fin de run, même après une erreur."""
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield get_metrics()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if not args.no_metrics:
+            json_path, prometheus_path = write_reports(get_metrics(), analysis, args, args.metrics_dir)
+            print(f"📈 Mesures du run : {json_path} (Prometheus : {prometheus_path})")
+            logging.info(f"📈 Mesures du run : {json_path}")
+        if profiler is not None:
+            os.makedirs(args.metrics_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(get_metrics().started_at))
+            profile_path = os.path.join(args.metrics_dir, f"{analysis}_{stamp}.prof")
+            profiler.dump_stats(profile_path)
+            print(f"🔬 Profil cProfile : {profile_path} (python -m pstats {profile_path})")
+
+
+def add_instrumentation_arguments(parser):
+    parser.add_argument(
+        "--metrics-dir", default=METRICS_DIR,
+        help=f"Dossier du rapport JSON et du fichier Prometheus de chaque run (défaut : {METRICS_DIR})."
+    )
+    parser.add_argument("--no-metrics", action="store_true", help="N'écrit pas les rapports de mesures du run.")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Profile le run avec cProfile et enregistre le profil (.prof) dans le dossier des mesures."
+    )
@@ -1,19 +1,31 @@
+import argparse
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from fpdf import FPDF
 from bs4 import BeautifulSoup
 
-# Charger le fichier JSON
-with open('summaries/Novo_nordisk_summary.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+# 🔤 Polices DejaVu (Unicode) : (style, fichier)
+FONT_DIR = "fonts"
+FONTS = (("", "DejaVuSans.ttf"), ("B", "DejaVuSans-Bold.ttf"), ("I", "DejaVuSans-Oblique.ttf"))
+SKIPPED_DIRS = {"batches"}  # fichiers techniques (requêtes et résultats bruts des batchs)
+
+# Chemins des polices, résolus une seule fois par processus (voir _init_worker)
+_font_paths = None
 
-company = data.get('company', 'Inconnue')
-summary = data.get('summary', '')
 
 # Créer un document PDF avec une meilleure mise en page
 class PDF(FPDF):
+    def __init__(self, company):
+        super().__init__()
+        self.company = company
+        for style, path in _font_paths:
+            self.add_font('DejaVu', style, path)
+
     def header(self):
         self.set_font('DejaVu', 'B', 14)
-        self.cell(0, 10, f"Rapport d'Analyse des Tickets - {company}", new_x='LMARGIN', new_y='NEXT', align='C')
+        self.cell(0, 10, f"Rapport d'Analyse des Tickets - {self.company}", new_x='LMARGIN', new_y='NEXT', align='C')
         self.ln(5)
 
     def chapter_title(self, title):
@@ -32,7 +44,7 @@ class PDF(FPDF):
 
     def chapter_body(self, body):
         self.set_font('DejaVu', '', 8)
-        self.multi_cell(0, 6, body)
+        self.multi_cell(0, 6, body, new_x='LMARGIN', new_y='NEXT')
         self.ln(2)
 
     def clean_text(self, text):
@@ -45,9 +57,11 @@ class PDF(FPDF):
     def add_html_content(self, html_content):
         """Parse le contenu HTML et l'ajoute au PDF."""
         soup = BeautifulSoup(html_content, 'html.parser')
+        self._add_html_children(soup)
 
-        # Parcourir les éléments HTML et les ajouter au PDF
-        for tag in soup.find_all(['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'li']):
+    def _add_html_children(self, node, depth=0):
+        # Parcours unique de l'arbre : chaque élément n'est rendu qu'une fois (les <li> par leur liste)
+        for tag in node.children:
             if tag.name == 'h1':
                 self.chapter_title(f"📘 {tag.get_text(strip=True)}")
             elif tag.name == 'h2':
@@ -56,25 +70,155 @@ class PDF(FPDF):
                 self.sub_chapter_title(f"➡️ {tag.get_text(strip=True)}")
             elif tag.name == 'p':
                 self.chapter_body(self.clean_text(tag.get_text(strip=True)))
-            elif tag.name == 'ul':
-                for li in tag.find_all('li'):
-                    self.chapter_body(f"• {self.clean_text(li.get_text(strip=True))}")
-            elif tag.name == 'ol':
-                count = 1
-                for li in tag.find_all('li'):
-                    self.chapter_body(f"{count}. {self.clean_text(li.get_text(strip=True))}")
-                    count += 1
-
-# Initialisation du PDF
-pdf = PDF()
-pdf.add_font('DejaVu', '', 'fonts/DejaVuSans.ttf', uni=True)
-pdf.add_font('DejaVu', 'B', 'fonts/DejaVuSans-Bold.ttf', uni=True)
-pdf.add_font('DejaVu', 'I', 'fonts/DejaVuSans-Oblique.ttf', uni=True)
-pdf.add_page()
-
-# Ajouter le contenu HTML converti en texte
-pdf.add_html_content(summary)
-
-# Enregistrer le PDF
-pdf.output(f'Rapport_{company}.pdf')
-print(f"📄 Rapport généré : Rapport_{company}.pdf")
+            elif tag.name in ('ul', 'ol'):
+                self._add_html_list(tag, depth)
+            elif tag.name is not None:
+                self._add_html_children(tag, depth)
+
+    def _add_html_list(self, tag, depth):
+        indent = "    " * depth
+        for count, li in enumerate(tag.find_all('li', recursive=False), start=1):
+            marker = "•" if tag.name == 'ul' else f"{count}."
+            # Texte propre à l'élément : les sous-listes sont rendues ensuite, une seule fois
+            text = "".join(
+                child.get_text() if child.name is not None else str(child)
+                for child in li.children if child.name not in ('ul', 'ol')
+            )
+            self.chapter_body(f"{indent}{marker} {self.clean_text(' '.join(text.split()))}")
+            for nested in li.find_all(('ul', 'ol'), recursive=False):
+                self._add_html_list(nested, depth + 1)
+
+    def add_json_content(self, value, depth=0):
+        """Rapport JSON par sections (prompt-engineering.py) : clés en titres, listes en puces."""
+        indent = "    " * max(0, depth - 2)
+        if isinstance(value, dict):
+            for key, item in value.items():
+                title = str(key).replace("_", " ").strip().capitalize()
+                if depth == 0:
+                    self.chapter_title(f"📘 {title}")
+                elif depth == 1:
+                    self.sub_chapter_title(f"🔹 {title}")
+                elif isinstance(item, (dict, list)):
+                    self.chapter_body(f"{indent}{title} :")
+                else:
+                    self.chapter_body(f"{indent}{title} : {self.clean_text(str(item))}")
+                    continue
+                self.add_json_content(item, depth + 1)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, (dict, list)):
+                    self.add_json_content(item, depth + 1)
+                else:
+                    self.chapter_body(f"{indent}• {self.clean_text(str(item))}")
+        elif value is not None:
+            self.chapter_body(f"{indent}{self.clean_text(str(value))}")
+
+
+def _init_worker(font_dir=FONT_DIR):
+    """Initialisation d'un processus : les polices sont cherchées et vérifiées une seule fois."""
+    global _font_paths
+    _font_paths = []
+    for style, name in FONTS:
+        path = os.path.join(font_dir, name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Police introuvable : {path}")
+        _font_paths.append((style, path))
+
+
+def company_name(path, data):
+    if isinstance(data, dict) and data.get('company'):
+        return data['company']
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name.removesuffix("_summary").replace("_", " ")
+
+
+def render_file(path, output_dir):
+    """Génère le PDF d'un résumé JSON ; renvoie (fichier PDF, nombre de pages)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    company = company_name(path, data)
+    pdf = PDF(company)
+    pdf.add_page()
+    if isinstance(data, dict) and isinstance(data.get('summary'), str):
+        # Résumé HTML (format historique : {"company": ..., "summary": "<h1>...</h1>"})
+        pdf.add_html_content(data['summary'])
+    else:
+        pdf.add_json_content({key: value for key, value in data.items() if key != 'company'}
+                             if isinstance(data, dict) else data)
+
+    output_pdf = os.path.join(output_dir, f"Rapport_{company}.pdf")
+    pdf.output(output_pdf)
+    return output_pdf, pdf.page_no()
+
+
+def _render(job):
+    path, output_dir = job
+    try:
+        return path, *render_file(path, output_dir), None
+    except Exception as e:
+        return path, None, 0, e
+
+
+def find_summaries(root):
+    """Résumés JSON d'un fichier ou de toute l'arborescence ``root`` (dossiers cachés et batchs exclus)."""
+    if os.path.isfile(root):
+        return [root]
+    paths = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        paths.extend(os.path.join(folder, name) for name in sorted(files) if name.endswith(".json"))
+    return paths
+
+
+def _collect(results):
+    pages = rendered = 0
+    for path, output_pdf, page_count, error in results:
+        if error is not None:
+            print(f"🚨 {path} : {error}")
+            continue
+        rendered += 1
+        pages += page_count
+        print(f"📄 Rapport généré : {output_pdf} ({page_count} page(s))")
+    return rendered, pages
+
+
+def render_all(paths, output_dir, workers, font_dir=FONT_DIR):
+    """Génère les PDF en parallèle (un processus par cœur par défaut) et affiche le débit en pages/s."""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, output_dir) for path in paths]
+    workers = max(1, min(workers, len(jobs)))
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(font_dir)
+        rendered, pages = _collect(map(_render, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(font_dir,)) as executor:
+            rendered, pages = _collect(executor.map(_render, jobs))
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ {rendered}/{len(jobs)} PDF, {pages} pages en {elapsed:.1f}s "
+        f"({pages / max(elapsed, 1e-9):.1f} pages/s, {workers} processus)"
+    )
+    return rendered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère les rapports PDF des résumés JSON.")
+    parser.add_argument(
+        "input", nargs="*", default=["summaries"],
+        help="Résumés JSON ou dossiers parcourus récursivement (défaut : summaries)."
+    )
+    parser.add_argument("--output-dir", default=".", help="Dossier des PDF générés (défaut : dossier courant).")
+    parser.add_argument("--fonts", default=FONT_DIR, help=f"Dossier des polices DejaVu (défaut : {FONT_DIR}).")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Nombre de processus de rendu (défaut : nombre de cœurs)."
+    )
+    args = parser.parse_args()
+
+    paths = [path for root in args.input for path in find_summaries(root)]
+    if not paths:
+        exit(f"❌ Aucun résumé JSON trouvé dans {', '.join(args.input)}")
+    render_all(paths, args.output_dir, args.workers, args.fonts)
@@ -0,0 +1,205 @@
+import json
+import logging
+import re
+
+# 🧾 Rapports JSON : mode JSON de Mistral, réparation locale et relance ciblée par section
+RESPONSE_FORMAT = {"type": "json_object"}
+SECTION_MAX_TOKENS = 2048  # une section seule, bien moins chère que le rapport complet
+MAX_CUT_POINTS = 64  # points de coupe essayés (du plus récent au plus ancien) pour un objet tronqué
+
+_FENCE = re.compile(r"```[\w-]*[ \t]*\n?")
+_CLOSERS = {"{": "}", "[": "]"}
+_TYPES = {"object": dict, "array": list, "string": str}
+
+SECTION_PROMPT = """Le rapport JSON d'analyse des tickets de l'entreprise {company} est incomplet : la section « {key} » est absente ou invalide.
+Rédige uniquement cette section, en cohérence avec les statistiques et les sections déjà rédigées ci-dessous.
+Réponds exclusivement par un objet JSON de la forme {{"{key}": ...}}, où la section respecte ce schéma :
+{schema}
+
+{context}## Sections déjà rédigées
+{report}
+"""
+
+
+def report_schema(sections):
+    """Schéma JSON d'un rapport : un objet par section, ``sections`` étant une suite de (clé, description)."""
+    return {
+        "type": "object",
+        "properties": {key: {"type": "object", "description": description} for key, description in sections},
+        "required": [key for key, _ in sections],
+    }
+
+
+def schema_instructions(schema):
+    """Consigne de format ajoutée au prompt (le mode JSON de l'API n'impose pas les clés)."""
+    return (
+        "\n🧾 **Format de la réponse** : un unique objet JSON respectant ce schéma, une clé par section :\n"
+        + json.dumps(schema, ensure_ascii=False, indent=2) + "\n"
+    )
+
+
+def strip_fences(text):
+    """Retire les balises de code Markdown (```json ... ```), y compris une balise fermante manquante."""
+    return _FENCE.sub("", text).strip()
+
+
+def remove_trailing_commas(text):
+    """Supprime les virgules placées juste avant ``}`` ou ``]`` (hors chaînes)."""
+    out, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "}]":
+            end = len(out)
+            while end and out[end - 1].isspace():
+                end -= 1
+            if end and out[end - 1] == ",":
+                del out[end - 1]
+        out.append(char)
+    return "".join(out)
+
+
+def close_truncated(text):
+    """Candidats pour un document coupé en cours de génération, du plus complet au plus court.
+
+    Le premier referme la chaîne et les blocs ouverts ; les suivants coupent à la dernière virgule
+    (membre incomplet abandonné) avant de refermer les blocs ouverts à cet endroit.
+    """
+    stack, cuts, in_string, escaped = [], [], False, False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == ",":
+            cuts.append((index, tuple(stack)))
+
+    def closed(prefix, opened):
+        return prefix + "".join(_CLOSERS[char] for char in reversed(opened))
+
+    head = text[:-1] if escaped else text
+    candidates = [closed(head + ('"' if in_string else ""), stack)]
+    candidates.extend(closed(text[:index], opened) for index, opened in reversed(cuts[-MAX_CUT_POINTS:]))
+    return [remove_trailing_commas(candidate) for candidate in candidates]
+
+
+def _decode(text):
+    # raw_decode ignore un éventuel texte après la fin de l'objet
+    return json.JSONDecoder().raw_decode(text)[0]
+
+
+def repair_json(text):
+    """Décode une réponse JSON, en la réparant si besoin ; renvoie ``(données ou None, réparations)``."""
+    repairs = []
+    try:
+        return json.loads(text), repairs
+    except (TypeError, json.JSONDecodeError):
+        if not isinstance(text, str):
+            return None, repairs
+
+    candidate = strip_fences(text)
+    if "```" in text:
+        repairs.append("balises de code retirées")
+    start = candidate.find("{")
+    if start < 0:
+        return None, repairs
+    if start > 0:
+        candidate = candidate[start:]
+        repairs.append("texte avant le JSON retiré")
+
+    fixed = remove_trailing_commas(candidate)
+    if fixed != candidate:
+        repairs.append("virgules finales supprimées")
+    try:
+        return _decode(fixed), repairs
+    except json.JSONDecodeError:
+        pass
+
+    for closed in close_truncated(fixed):
+        try:
+            data = _decode(closed)
+        except json.JSONDecodeError:
+            continue
+        repairs.append("objet tronqué refermé")
+        return data, repairs
+    return None, repairs
+
+
+def _valid(value, schema):
+    expected = _TYPES.get(schema.get("type"), object)
+    return isinstance(value, expected) and bool(value)
+
+
+def invalid_sections(data, schema):
+    """Sections requises absentes, vides ou d'un type différent de celui du schéma."""
+    return [key for key in schema["required"] if not _valid(data.get(key), schema["properties"][key])]
+
+
+class ReportRepair:
+    """Réparation d'un rapport JSON : décodage tolérant, puis une relance par section invalide.
+
+    ``requests()`` donne les messages des relances à envoyer ; chaque réponse est passée à
+    ``resolve()``. ``text()`` renvoie toujours un JSON valide, les sections dans l'ordre du schéma.
+    """
+
+    def __init__(self, schema, company, text, context=""):
+        self.schema = schema
+        self.company = company
+        self.context = context
+        data, repairs = repair_json(text)
+        if not isinstance(data, dict):
+            logging.error(f"❌ {company} : réponse JSON irrécupérable, toutes les sections seront redemandées")
+            data = {}
+        elif repairs:
+            logging.warning(f"🩹 {company} : JSON réparé localement ({', '.join(repairs)})")
+        self.data = data
+        self.broken = invalid_sections(data, schema)
+        if self.broken:
+            logging.warning(f"🩹 {company} : section(s) à redemander : {', '.join(self.broken)}")
+
+    def requests(self):
+        """(clé, messages) de chaque relance, une par section invalide."""
+        report = {key: value for key, value in self.data.items() if key not in self.broken}
+        return [
+            (key, [{"role": "user", "content": SECTION_PROMPT.format(
+                company=self.company, key=key, context=self.context,
+                schema=json.dumps(self.schema["properties"][key], ensure_ascii=False),
+                report=json.dumps(report, ensure_ascii=False, indent=2),
+            )}])
+            for key in self.broken
+        ]
+
+    def resolve(self, key, answer):
+        """Intègre la réponse d'une relance (``None`` si l'appel a échoué)."""
+        data, _ = repair_json(answer) if answer is not None else (None, [])
+        if isinstance(data, dict) and key in data:
+            data = data[key]
+        if _valid(data, self.schema["properties"][key]):
+            self.data[key] = data
+            logging.info(f"✅ {self.company} : section « {key} » régénérée")
+            return
+        logging.error(f"❌ {self.company} : section « {key} » toujours invalide après relance")
+        if self.data.get(key) is None:
+            # Le rapport reste un JSON valide : la section est marquée comme indisponible
+            self.data[key] = {"indisponible": "Section non générée : réponse du modèle invalide."}
+
+    def text(self):
+        ordered = {key: self.data[key] for key in self.schema["required"]}
+        ordered.update((key, value) for key, value in self.data.items() if key not in ordered)
+        return json.dumps(ordered, ensure_ascii=False)
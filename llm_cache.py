@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+# 📂 Emplacement par défaut du cache des réponses Mistral
+CACHE_PATH = "summaries/.cache/llm_cache.sqlite"
+
+
+def cache_key(model, max_tokens, messages, response_format=None):
+    """Empreinte SHA-256 d'une requête : modèle, limite de tokens, prompt complet et format de réponse."""
+    request = [model, max_tokens, messages]
+    if response_format is not None:
+        # Les requêtes sans format imposé gardent la même empreinte qu'avant
+        request.append(response_format)
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache persistant (SQLite) des réponses Mistral, adressé par le contenu des requêtes.
+
+    Les entrées plus anciennes que ``max_age_days`` sont supprimées à l'ouverture, et les
+    entrées les moins récemment utilisées sont évincées dès que le cache dépasse ``max_bytes``.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_age_days=30, max_bytes=200 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+        self._evict_expired()
+
+    def get(self, model, max_tokens, messages, response_format=None):
+        key = cache_key(model, max_tokens, messages, response_format)
+        row = self.connection.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return row[0]
+
+    def put(self, model, max_tokens, messages, content, response_format=None):
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, model, content, size, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                cache_key(model, max_tokens, messages, response_format), model, content,
+                len(content.encode("utf-8")), now, now
+            )
+        )
+        self.connection.commit()
+        self._evict_oversize()
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.max_age_days * 86400
+        deleted = self.connection.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+        self.connection.commit()
+        if deleted:
+            logging.info(f"🧹 Cache : {deleted} réponse(s) expirée(s) supprimée(s)")
+
+    def _evict_oversize(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Éviction LRU : on supprime les réponses les moins récemment utilisées
+        deleted = 0
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            deleted += 1
+        self.connection.commit()
+        logging.info(f"🧹 Cache : {deleted} réponse(s) évincée(s) (taille maximale atteinte)")
+
+    def close(self):
+        logging.info(f"🗃️ Cache des réponses : {self.hits} hit(s), {self.misses} miss(es)")
+        print(f"🗃️ Cache : {self.hits} hit(s), {self.misses} miss(es)")
+        self.connection.close()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+
+from compact_prompt import COMPACT_FORMAT_NOTE, GROUP_FORMAT_NOTE
+from token_estimation import estimate_tokens
+
+# 🗺️ Taille maximale d'une analyse partielle (un lot de tickets)
+MAP_MAX_TOKENS = 2048
+
+MAP_PROMPT = """
+Tu es un expert en support IT.
+Voici le lot {index}/{total} des tickets de l'entreprise {company}. Les autres lots sont analysés séparément
+et toutes les analyses partielles seront ensuite fusionnées dans un rapport unique.
+
+Produis une **analyse partielle concise** en texte brut :
+- Problèmes récurrents et thèmes associés (avec le nombre de tickets concernés).
+- Causes racines probables (techniques, humaines, organisationnelles).
+- Solutions appliquées et leur efficacité.
+- Exemples de tickets représentatifs (numéros de tickets).
+- Risques et points de vigilance.
+
+📂 **Tickets du lot** :
+
+"""
+
+MERGE_PROMPT = """
+Tu es un expert en support IT.
+Fusionne les analyses partielles ci-dessous (entreprise {company}) en une seule analyse partielle concise,
+sans perdre les chiffres, les exemples de tickets ni les risques identifiés.
+
+"""
+
+PARTIALS_TITLE = "📂 **Analyses partielles à fusionner** (chaque analyse couvre un lot de tickets) :\n\n"
+
+
+def split_into_chunks(blocks, budget_tokens):
+    """Regroupe des blocs de texte consécutifs en lots ne dépassant pas ``budget_tokens``.
+
+    Un bloc plus grand que le budget forme un lot à lui seul.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if current and current_tokens + tokens > budget_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _format_partials(partials):
+    return "".join(f"### Lot {index}\n{partial}\n\n" for index, partial in enumerate(partials, start=1))
+
+
+async def summarize_hierarchical(
+    complete_async, max_tokens, company, tickets_list, spec, chunk_tokens, semaphore, messages,
+    compact=False, clusters=None, response_format=None
+):
+    """Analyse une entreprise par lots (map) puis fusionne les analyses partielles (reduce).
+
+    ``complete_async(messages, max_tokens)`` renvoie le texte de la réponse Mistral ; chaque appel occupe une
+    place de ``semaphore``, partagé par tout le run pour que --concurrency borne l'ensemble des appels.
+    Les lots reprennent le format des tickets du prompt préparé (``compact``, ``clusters`` de --dedup) ;
+    si tout tient dans un seul lot, ``messages`` (le prompt préparé) est envoyé tel quel.
+    ``response_format`` (mode JSON) s'applique à la réponse finale ; les analyses partielles restent en texte brut.
+    """
+    grouped = clusters is not None
+
+    async def complete(messages, tokens, response_format=None):
+        async with semaphore:
+            return await complete_async(messages, tokens, response_format=response_format)
+
+    def user(prompt):
+        return [{"role": "user", "content": prompt}]
+
+    chunks = split_into_chunks(spec.ticket_blocks(tickets_list, compact, clusters), chunk_tokens)
+    if len(chunks) == 1:
+        return await complete(messages, max_tokens, response_format)
+
+    logging.info(f"🗺️ {company} : {len(tickets_list)} tickets répartis en {len(chunks)} lots")
+
+    # 🗺️ Map : une analyse partielle par lot, en parallèle
+    note = ""
+    if spec.is_compact(compact):
+        note = COMPACT_FORMAT_NOTE + (GROUP_FORMAT_NOTE if grouped else "")
+    partials = await asyncio.gather(*(
+        complete(
+            user(
+                MAP_PROMPT.format(index=index, total=len(chunks), company=company) + note
+                + spec.tickets_section(chunk, compact, grouped)
+            ),
+            MAP_MAX_TOKENS
+        )
+        for index, chunk in enumerate(chunks, start=1)
+    ))
+
+    # 🔁 Fusions intermédiaires tant que les analyses partielles dépassent le budget
+    while len(partials) > 1:
+        groups = split_into_chunks(partials, chunk_tokens)
+        if len(groups) in (1, len(partials)):
+            break
+        logging.info(f"🔁 {company} : fusion de {len(partials)} analyses partielles en {len(groups)}")
+        partials = await asyncio.gather(*(
+            complete(user(MERGE_PROMPT.format(company=company) + _format_partials(group)), MAP_MAX_TOKENS)
+            for group in groups
+        ))
+
+    # 🧩 Reduce : contexte (statistiques, tableaux locaux) et consignes du rapport identiques au prompt complet
+    reduce_messages = spec.compose_messages(
+        company, tickets_list, PARTIALS_TITLE, _format_partials(partials), compact, grouped
+    )
+    return await complete(reduce_messages, max_tokens, response_format)
@@ -1,103 +1,261 @@
-import markdown2
-import pdfkit
+import argparse
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import markdown2
 
-# 📂 Configuration de wkhtmltopdf
-pdfkit_config = pdfkit.configuration(wkhtmltopdf="C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe")
-
-# 🖹 Lecture du fichier markdown
-input_file = "/summaries/ALK_summary.txt"
-output_pdf = "Rapport_Analyse_IT.pdf"
-
-if not os.path.exists(input_file):
-    print(f"❌ Fichier introuvable : {input_file}")
-    exit()
+# 📂 Configuration de wkhtmltopdf : --wkhtmltopdf, variable WKHTMLTOPDF, PATH, puis emplacement Windows par défaut
+WKHTMLTOPDF_DEFAULT = "C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe"
+WKHTMLTOPDF_OPTIONS = {"encoding": "UTF-8", "quiet": ""}
 
-with open(input_file, "r", encoding="utf-8") as f:
-    markdown_content = f.read()
+# 🔤 Polices DejaVu (Unicode) du rendu Python (fpdf2) : (style, fichier)
+FONT_DIR = "fonts"
+FONTS = (
+    ("", "DejaVuSans.ttf"), ("B", "DejaVuSans-Bold.ttf"),
+    ("I", "DejaVuSans-Oblique.ttf"), ("BI", "DejaVuSans-Bold.ttf"),
+)
+SKIPPED_DIRS = {"batches", "sections"}  # requêtes brutes et sections intermédiaires des batchs
 
-# 🖼️ Conversion Markdown → HTML
-html_content = markdown2.markdown(markdown_content)
+TITLE = "📊 Rapport d'Analyse IT"
 
-# 🎨 Insertion d'un style CSS
-styled_html = f"""
-<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <title>Rapport d'Analyse IT</title>
-    <style>
-        body {{
+# 🎨 Style CSS (rendu wkhtmltopdf)
+STYLE = """
+        body {
             font-family: 'Arial', sans-serif;
             line-height: 1.6;
             color: #333;
             margin: 20px;
-        }}
-        h1, h2, h3 {{
+        }
+        h1, h2, h3 {
             color: #1F618D;
             border-bottom: 2px solid #1F618D;
             padding-bottom: 5px;
             margin-top: 25px;
-        }}
-        h4 {{
+        }
+        h4 {
             color: #117A65;
             margin-top: 15px;
-        }}
-        ul {{
+        }
+        ul {
             margin: 15px 0;
             padding-left: 20px;
-        }}
-        li::before {{
+        }
+        li::before {
             content: "• ";
             color: #E74C3C;
             font-weight: bold;
-        }}
-        table {{
+        }
+        table {
             border-collapse: collapse;
             width: 100%;
             margin: 20px 0;
-        }}
-        th, td {{
+        }
+        th, td {
             border: 1px solid #ddd;
             padding: 10px;
             text-align: left;
-        }}
-        th {{
+        }
+        th {
             background-color: #AED6F1;
             color: #000;
-        }}
-        .footer {{
+        }
+        .footer {
             text-align: center;
             margin-top: 30px;
             font-size: 0.8em;
             color: #555;
-        }}
-    </style>
-</head>
-<body>
+        }
+"""
 
-<h1>📊 Rapport d'Analyse IT</h1>
+# Polices du rendu Python, résolues une seule fois par processus (voir _init_worker)
+_font_paths = None
+
+
+def markdown_to_html(markdown_content, source):
+    """🖼️ Conversion Markdown → HTML en mémoire (contenu seul, sans feuille de style)."""
+    html_content = markdown2.markdown(markdown_content)
+    return f"""<h1>{TITLE}</h1>
 {html_content}
 
 <div class="footer">
-    📑 Rapport généré automatiquement par Tucania AI - {input_file}
+    📑 Rapport généré automatiquement par Tucania AI - {source}
 </div>
+"""
+
+
+def styled_html(body):
+    return f"""
+<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <title>Rapport d'Analyse IT</title>
+    <style>{STYLE}    </style>
+</head>
+<body>
+
+{body}
 
 </body>
 </html>
 """
 
-# 💾 Enregistrer le contenu HTML temporaire
-temp_html = "temp_rapport.html"
-with open(temp_html, "w", encoding="utf-8") as f:
-    f.write(styled_html)
 
-# 🖨️ Génération du PDF
-try:
-    pdfkit.from_file(temp_html, output_pdf, configuration=pdfkit_config)
-    print(f"✅ PDF généré avec succès : {output_pdf}")
-except Exception as e:
-    print(f"🚨 Erreur lors de la génération du PDF : {e}")
+def find_wkhtmltopdf(path=None):
+    """Exécutable wkhtmltopdf disponible, ou None (le rendu Python prend alors le relais)."""
+    for candidate in (path, os.environ.get("WKHTMLTOPDF"), shutil.which("wkhtmltopdf"), WKHTMLTOPDF_DEFAULT):
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def output_path(path, output_dir):
+    name = os.path.splitext(os.path.basename(path))[0].removesuffix("_summary")
+    return os.path.join(output_dir, f"Rapport_{name}.pdf")
+
+
+def render_wkhtmltopdf(path, output_dir, wkhtmltopdf):
+    """Rendu wkhtmltopdf : le HTML est transmis sur l'entrée standard du processus, sans fichier temporaire."""
+    import pdfkit
+
+    with open(path, "r", encoding="utf-8") as f:
+        html = styled_html(markdown_to_html(f.read(), path))
+    output_pdf = output_path(path, output_dir)
+    pdfkit.from_string(
+        html, output_pdf, configuration=pdfkit.configuration(wkhtmltopdf=wkhtmltopdf), options=WKHTMLTOPDF_OPTIONS
+    )
+    return output_pdf
+
+
+def render_fpdf(path, output_dir):
+    """Rendu 100 % Python (fpdf2), sans processus externe : utilisé quand wkhtmltopdf est absent."""
+    from fpdf import FPDF, FontFace, TextStyle
+
+    with open(path, "r", encoding="utf-8") as f:
+        html = markdown_to_html(f.read(), path)
+
+    pdf = FPDF()
+    for style, font in _font_paths:
+        pdf.add_font("DejaVu", style, font)
+    pdf.add_page()
+    heading = {"color": "#1F618D", "font_family": "DejaVu"}
+    pdf.write_html(
+        html,
+        font_family="DejaVu",
+        tag_styles={
+            "h1": TextStyle(font_size_pt=20, t_margin=6, b_margin=2, **heading),
+            "h2": TextStyle(font_size_pt=16, t_margin=6, b_margin=2, **heading),
+            "h3": TextStyle(font_size_pt=13, t_margin=5, b_margin=2, **heading),
+            "h4": TextStyle(font_size_pt=11, t_margin=4, b_margin=1, color="#117A65", font_family="DejaVu"),
+            "code": FontFace(family="DejaVu"),
+            "pre": TextStyle(t_margin=4, font_family="DejaVu"),
+        },
+        li_prefix_color="#E74C3C",
+        warn_on_tags_not_matching=False,
+    )
+    output_pdf = output_path(path, output_dir)
+    pdf.output(output_pdf)
+    return output_pdf
+
+
+def _init_worker(font_dir=FONT_DIR):
+    """Initialisation d'un processus de rendu Python : les polices sont cherchées et vérifiées une seule fois."""
+    global _font_paths
+    _font_paths = []
+    for style, name in FONTS:
+        path = os.path.join(font_dir, name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Police introuvable : {path}")
+        _font_paths.append((style, path))
+
+
+def _render(job):
+    path, output_dir, wkhtmltopdf = job
+    try:
+        if wkhtmltopdf:
+            return path, render_wkhtmltopdf(path, output_dir, wkhtmltopdf), None
+        return path, render_fpdf(path, output_dir), None
+    except Exception as e:
+        return path, None, e
+
+
+def find_reports(root):
+    """Rapports Markdown (.txt) d'un fichier ou de toute l'arborescence ``root`` (dossiers cachés et batchs exclus)."""
+    if os.path.isfile(root):
+        return [root]
+    paths = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        paths.extend(os.path.join(folder, name) for name in sorted(files) if name.endswith(".txt"))
+    return paths
+
+
+def convert_all(paths, output_dir, workers, wkhtmltopdf=None, font_dir=FONT_DIR):
+    """🖨️ Convertit les rapports en parallèle ; au plus ``workers`` rendus (et processus wkhtmltopdf) simultanés."""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, output_dir, wkhtmltopdf) for path in paths]
+    workers = max(1, min(workers, len(jobs)))
+    start = time.perf_counter()
+    if wkhtmltopdf:
+        # Le rendu a lieu dans wkhtmltopdf : des threads suffisent pour borner les processus lancés
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_render, jobs))
+    elif workers == 1:
+        _init_worker(font_dir)
+        results = list(map(_render, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(font_dir,)) as executor:
+            results = list(executor.map(_render, jobs))
+
+    converted = 0
+    for path, output_pdf, error in results:
+        if error is not None:
+            print(f"🚨 Erreur lors de la génération du PDF de {path} : {error}")
+            continue
+        converted += 1
+        print(f"✅ PDF généré avec succès : {output_pdf}")
+
+    elapsed = time.perf_counter() - start
+    renderer = "wkhtmltopdf" if wkhtmltopdf else "fpdf2"
+    print(
+        f"📑 {converted}/{len(jobs)} PDF en {elapsed:.1f}s "
+        f"({converted / max(elapsed, 1e-9):.1f} PDF/s, {workers} rendus simultanés, {renderer})"
+    )
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertit les rapports Markdown des résumés en PDF.")
+    parser.add_argument(
+        "input", nargs="*", default=["summaries"],
+        help="Rapports Markdown (.txt) ou dossiers parcourus récursivement (défaut : summaries)."
+    )
+    parser.add_argument("--output-dir", default=".", help="Dossier des PDF générés (défaut : dossier courant).")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Nombre de rendus simultanés (défaut : nombre de cœurs)."
+    )
+    parser.add_argument(
+        "--renderer", choices=("auto", "wkhtmltopdf", "fpdf"), default="auto",
+        help="auto : wkhtmltopdf s'il est installé, sinon rendu Python fpdf2 (défaut : auto)."
+    )
+    parser.add_argument("--wkhtmltopdf", help="Chemin de l'exécutable wkhtmltopdf.")
+    parser.add_argument(
+        "--fonts", default=FONT_DIR, help=f"Dossier des polices DejaVu du rendu fpdf2 (défaut : {FONT_DIR})."
+    )
+    args = parser.parse_args()
+
+    paths = [path for root in args.input for path in find_reports(root)]
+    if not paths:
+        print(f"❌ Fichier introuvable : {', '.join(args.input)}")
+        exit()
 
-# 🧹 Nettoyage du fichier temporaire
-os.remove(temp_html)
+    wkhtmltopdf = None
+    if args.renderer != "fpdf":
+        wkhtmltopdf = find_wkhtmltopdf(args.wkhtmltopdf)
+        if wkhtmltopdf is None and args.renderer == "wkhtmltopdf":
+            exit("❌ wkhtmltopdf introuvable (--wkhtmltopdf ou variable WKHTMLTOPDF)")
+        if wkhtmltopdf is None:
+            print("ℹ️ wkhtmltopdf introuvable : rendu Python (fpdf2)")
+    convert_all(paths, args.output_dir, args.workers, wkhtmltopdf, args.fonts)
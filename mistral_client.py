@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+import weakref
+
+# 🔌 Client Mistral unique par processus : connexions HTTP keep-alive réutilisées par tous les appels
+MAX_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60  # secondes d'inactivité avant de fermer une connexion du pool
+TIMEOUT = 300  # secondes : une analyse complète peut générer 8k tokens
+
+_client = None
+_http_client = None
+# Un httpx.AsyncClient est lié à la boucle asyncio qui l'utilise en premier : un client par boucle
+_loop_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _http_pool(kind):
+    """Client httpx ``kind`` (``"Client"`` ou ``"AsyncClient"``) à pool de connexions (installé avec mistralai)."""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+    return getattr(httpx, kind)(limits=limits, timeout=TIMEOUT)
+
+
+def _new_client(**http_clients):
+    from mistralai import Mistral
+
+    options = {name: http_client for name, http_client in http_clients.items() if http_client is not None}
+    if os.environ.get("MISTRAL_SERVER_URL"):
+        # Autre serveur compatible (ex. mock_mistral.py pour les benchmarks)
+        options["server_url"] = os.environ["MISTRAL_SERVER_URL"]
+    return Mistral(api_key=os.environ.get("MISTRAL_API_KEY"), **options)
+
+
+def get_client():
+    """Client Mistral du processus, créé (et ``mistralai`` importé) au premier appel seulement.
+
+    Dans une boucle asyncio, renvoie le client de cette boucle : il partage le pool synchrone du processus
+    et a son propre pool asynchrone, si bien que plusieurs ``asyncio.run`` successifs restent possibles.
+    """
+    global _client, _http_client
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _lock:
+        if _client is None:
+            _http_client = _http_pool("Client")
+            _client = _new_client(client=_http_client)
+        if loop is None:
+            return _client
+        client = _loop_clients.get(loop)
+        if client is None:
+            client = _loop_clients[loop] = _new_client(client=_http_client, async_client=_http_pool("AsyncClient"))
+        return client
+
+
+class _LazyClient:
+    """S'utilise comme le client Mistral ; celui-ci n'est créé qu'au premier attribut demandé."""
+
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+
+def shared_client():
+    """Client à placer au niveau module des scripts : l'importer ne coûte rien tant qu'on n'appelle pas l'API."""
+    return _LazyClient()
@@ -0,0 +1,463 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from token_estimation import CHARS_PER_TOKEN, estimate_tokens
+
+# 🧪 Serveur Mistral local : mêmes routes et mêmes formats que l'API (chat, flux SSE, fichiers, batchs),
+# avec latence, débit de génération et erreurs configurables, pour mesurer la chaîne sans coût d'API
+FILLER = (
+    "Les tickets montrent des incidents récurrents de connexion VPN et d'authentification, "
+    "concentrés en début de semaine. La cause racine probable est l'expiration des jetons MFA. "
+)
+STREAM_CHUNK_TOKENS = 8  # tokens par événement SSE
+_REQUIRED_KEYS = re.compile(r'"required":\s*\[([^\]]*)\]')
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.3  # secondes avant le premier token
+    token_rate: float = 200.0  # tokens générés par seconde et par requête
+    output_tokens: int = 600  # longueur des réponses (plafonnée par max_tokens)
+    rate_429: float = 0.0  # probabilité d'une réponse 429 (avec Retry-After)
+    failure_rate: float = 0.0  # probabilité d'une erreur 500
+    retry_after: float = 1.0  # secondes annoncées dans Retry-After
+    requests_per_minute: int = 0  # limite de débit du serveur (0 : aucune), 429 au-delà
+    batch_seconds: float = 2.0  # durée de traitement d'un job batch
+
+
+class MockState:
+    """Fichiers, jobs batch et mesures de toutes les requêtes servies (partagés entre les threads)."""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.files = {}  # id -> (nom, contenu)
+        self.jobs = {}  # id -> description du job (format BatchJobOut)
+        self.requests = []  # mesures par requête : route, statut, durée, tokens
+        self.recent = []  # instants des dernières requêtes (limite par minute)
+
+    def record(self, route, status, seconds, prompt_tokens=0, completion_tokens=0):
+        with self.lock:
+            self.requests.append({
+                "route": route, "status": status, "seconds": seconds,
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            })
+
+    def throttled(self):
+        """True si la requête dépasse la limite par minute du serveur."""
+        if not self.config.requests_per_minute:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            self.recent = [t for t in self.recent if now - t < 60]
+            if len(self.recent) >= self.config.requests_per_minute:
+                return True
+            self.recent.append(now)
+            return False
+
+    def stats(self):
+        with self.lock:
+            requests = list(self.requests)
+        chats = [r for r in requests if r["route"] == "chat" and r["status"] == 200]
+        latencies = sorted(r["seconds"] for r in chats)
+        return {
+            "requests": len(requests),
+            "chat_completions": len(chats),
+            "rate_limited": sum(r["status"] == 429 for r in requests),
+            "failures": sum(r["status"] >= 500 for r in requests),
+            "batch_requests": sum(r["route"] == "batch_request" for r in requests),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in requests),
+            "completion_tokens": sum(r["completion_tokens"] for r in requests),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+        }
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.recent.clear()
+
+
+def percentile(values, q):
+    """Percentile par rang le plus proche (``values`` trié) ; None si vide."""
+    if not values:
+        return None
+    rank = max(1, round(q / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def answer_text(messages, tokens, json_mode):
+    """Réponse factice d'environ ``tokens`` tokens ; en mode JSON, un objet avec les clés exigées par le prompt."""
+    length = int(tokens * CHARS_PER_TOKEN)
+    if not json_mode:
+        text = "## Analyse\n\n" + FILLER * (length // len(FILLER) + 1)
+        return text[:length]
+
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    match = _REQUIRED_KEYS.search(prompt)
+    keys = re.findall(r'"([^"]+)"', match.group(1)) if match else ["analyse"]
+    per_key = max(1, length // len(keys))
+    return json.dumps(
+        {key: {"synthese": (FILLER * (per_key // len(FILLER) + 1))[:per_key]} for key in keys},
+        ensure_ascii=False,
+    )
+
+
+def completion(request, config):
+    """Réponse complète (format ChatCompletionResponse) et nombre de tokens d'entrée et de sortie."""
+    messages = request.get("messages", [])
+    prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+    tokens = min(config.output_tokens, request.get("max_tokens") or config.output_tokens)
+    json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+    text = answer_text(messages, tokens, json_mode)
+    completion_tokens = estimate_tokens(text)
+    body = {
+        "id": uuid.uuid4().hex,
+        "object": "chat.completion",
+        "model": request.get("model", "mock"),
+        "created": int(time.time()),
+        "usage": {
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+        "choices": [{
+            "index": 0, "message": {"role": "assistant", "content": text, "tool_calls": None},
+            "finish_reason": "stop",
+        }],
+    }
+    return body, text
+
+
+def _multipart_fields(body, content_type):
+    """Champs d'un formulaire multipart : nom -> (nom de fichier, contenu en octets)."""
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    fields = {}
+    for part in body.split(b"--" + boundary):
+        if b"\r\n\r\n" not in part:
+            continue
+        headers, content = part.split(b"\r\n\r\n", 1)
+        disposition = headers.decode("utf-8", "replace")
+        name = re.search(r'name="([^"]*)"', disposition)
+        filename = re.search(r'filename="([^"]*)"', disposition)
+        if name:
+            fields[name.group(1)] = (filename.group(1) if filename else None, content.removesuffix(b"\r\n"))
+    return fields
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState = None  # renseigné par make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    # 📤 Réponses
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _fault(self, route):
+        """Erreur injectée (429 ou 500) ; True si la requête s'arrête là."""
+        config = self.state.config
+        if self.state.throttled() or random.random() < config.rate_429:
+            self.state.record(route, 429, 0)
+            self._send_json(
+                429, {"object": "error", "message": "Requests rate limit exceeded", "code": "1300"},
+                {"Retry-After": f"{config.retry_after:g}"},
+            )
+            return True
+        if random.random() < config.failure_rate:
+            self.state.record(route, 500, 0)
+            self._send_json(500, {"object": "error", "message": "Internal server error (mock)"})
+            return True
+        return False
+
+    # 🧭 Routage
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/mock/stats":
+            return self._send_json(200, self.state.stats())
+        match = re.fullmatch(r"/v1/files/([^/]+)/content", path)
+        if match:
+            return self._download(match.group(1))
+        if path == "/v1/batch/jobs":
+            return self._list_jobs(dict(parse_qsl(urlsplit(self.path).query)))
+        match = re.fullmatch(r"/v1/batch/jobs/([^/]+)", path)
+        if match:
+            return self._job_status(match.group(1))
+        self._send_json(404, {"object": "error", "message": f"Route inconnue : {path}"})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        body = self._read_body()
+        if path == "/v1/chat/completions":
+            return self._chat(json.loads(body))
+        if path == "/v1/files":
+            return self._upload(body)
+        if path == "/v1/batch/jobs":
+            return self._create_job(json.loads(body))
+        match = re.fullmatch(r"/v1/batch/jobs/([^/]+)/cancel", path)
+        if match:
+            return self._cancel_job(match.group(1))
+        if path == "/mock/reset":
+            self.state.reset()
+            return self._send_json(200, {"reset": True})
+        self._send_json(404, {"object": "error", "message": f"Route inconnue : {path}"})
+
+    # 💬 Chat (réponse complète ou flux SSE)
+    def _chat(self, request):
+        if self._fault("chat"):
+            return
+        config = self.state.config
+        start = time.perf_counter()
+        body, text = completion(request, config)
+        usage = body["usage"]
+        time.sleep(config.latency)
+
+        if not request.get("stream"):
+            time.sleep(usage["completion_tokens"] / config.token_rate)
+            self._send_json(200, body)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            step = int(STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN)
+            pieces = [text[i:i + step] for i in range(0, len(text), step)] or [""]
+            for index, piece in enumerate(pieces):
+                last = index == len(pieces) - 1
+                chunk = {
+                    "id": body["id"], "object": "chat.completion.chunk", "model": body["model"],
+                    "created": body["created"],
+                    "choices": [{
+                        "index": 0, "delta": {"role": "assistant", "content": piece},
+                        "finish_reason": "stop" if last else None,
+                    }],
+                }
+                if last:
+                    chunk["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if not last:
+                    time.sleep(STREAM_CHUNK_TOKENS / config.token_rate)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        self.state.record(
+            "chat", 200, time.perf_counter() - start, usage["prompt_tokens"], usage["completion_tokens"]
+        )
+
+    # 📁 Fichiers
+    def _upload(self, body):
+        if self._fault("files"):
+            return
+        fields = _multipart_fields(body, self.headers.get("Content-Type", ""))
+        filename, content = fields.get("file", ("upload.jsonl", b""))
+        purpose = (fields.get("purpose") or (None, b"batch"))[1].decode()
+        file_id = str(uuid.uuid4())
+        with self.state.lock:
+            self.state.files[file_id] = (filename, content)
+        self.state.record("files", 200, 0)
+        self._send_json(200, {
+            "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": filename or "upload.jsonl", "purpose": purpose, "sample_type": "batch_request",
+            "source": "upload", "num_lines": content.count(b"\n"),
+        })
+
+    def _download(self, file_id):
+        if self._fault("files"):
+            return
+        with self.state.lock:
+            stored = self.state.files.get(file_id)
+        if stored is None:
+            return self._send_json(404, {"object": "error", "message": f"Fichier inconnu : {file_id}"})
+        content = stored[1]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        self.state.record("files", 200, 0)
+
+    # 🗂️ Jobs batch : traités en arrière-plan, en ``batch_seconds``
+    def _create_job(self, request):
+        if self._fault("batch"):
+            return
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id, "object": "batch", "input_files": request.get("input_files", []),
+            "endpoint": request.get("endpoint", "/v1/chat/completions"), "model": request.get("model"),
+            "metadata": request.get("metadata"), "errors": [], "status": "QUEUED", "created_at": int(time.time()),
+            "total_requests": 0, "completed_requests": 0, "succeeded_requests": 0, "failed_requests": 0,
+            "output_file": None, "error_file": None,
+        }
+        with self.state.lock:
+            self.state.jobs[job_id] = job
+        threading.Thread(target=_process_job, args=(self.state, job_id), daemon=True).start()
+        self.state.record("batch", 200, 0)
+        self._send_json(200, job)
+
+    def _job_status(self, job_id):
+        if self._fault("batch"):
+            return
+        with self.state.lock:
+            job = dict(self.state.jobs.get(job_id) or {})
+        if not job:
+            return self._send_json(404, {"object": "error", "message": f"Job inconnu : {job_id}"})
+        self.state.record("batch", 200, 0)
+        self._send_json(200, job)
+
+    def _list_jobs(self, query):
+        # Filtre par métadonnées : le SDK envoie chaque clé de ``metadata`` comme paramètre de requête
+        standard = {"page", "page_size", "model", "agent_id", "created_after", "created_by_me", "status", "order_by"}
+        wanted = {key: value for key, value in query.items() if key not in standard}
+        with self.state.lock:
+            jobs = [
+                dict(job) for job in self.state.jobs.values()
+                if all((job.get("metadata") or {}).get(key) == value for key, value in wanted.items())
+            ]
+        self._send_json(200, {"object": "list", "data": jobs, "total": len(jobs)})
+
+    def _cancel_job(self, job_id):
+        with self.state.lock:
+            job = self.state.jobs.get(job_id)
+            if job is not None and job["status"] in ("QUEUED", "RUNNING"):
+                job["status"] = "CANCELLATION_REQUESTED"
+            job = dict(job or {})
+        if not job:
+            return self._send_json(404, {"object": "error", "message": f"Job inconnu : {job_id}"})
+        self._send_json(200, job)
+
+
+def _process_job(state, job_id):
+    """Exécute les requêtes d'un job batch et publie son fichier de résultats."""
+    config = state.config
+    with state.lock:
+        job = state.jobs[job_id]
+        job["status"] = "RUNNING"
+        job["started_at"] = int(time.time())
+        inputs = [state.files[file_id][1] for file_id in job["input_files"] if file_id in state.files]
+
+    lines = [line for content in inputs for line in content.splitlines() if line.strip()]
+    with state.lock:
+        job["total_requests"] = len(lines)
+    time.sleep(config.batch_seconds)
+
+    results = []
+    for line in lines:
+        request = json.loads(line)
+        body, _ = completion(request["body"], config)
+        usage = body["usage"]
+        state.record("batch_request", 200, 0, usage["prompt_tokens"], usage["completion_tokens"])
+        results.append(json.dumps({
+            "id": uuid.uuid4().hex, "custom_id": request.get("custom_id"),
+            "response": {"status_code": 200, "body": body}, "error": None,
+        }, ensure_ascii=False))
+
+    output_id = str(uuid.uuid4())
+    with state.lock:
+        state.files[output_id] = (f"{job_id}.jsonl", ("\n".join(results) + "\n").encode("utf-8"))
+        if job["status"] == "CANCELLATION_REQUESTED":
+            job["status"] = "CANCELLED"
+            return
+        job.update(
+            status="SUCCESS", output_file=output_id, completed_requests=len(lines), succeeded_requests=len(lines),
+            completed_at=int(time.time()),
+        )
+
+
+def make_server(config, host="127.0.0.1", port=0):
+    """Serveur prêt à démarrer (``port=0`` : port libre) ; son état est accessible via ``server.state``."""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = handler.state
+    return server
+
+
+def start_server(config, host="127.0.0.1", port=0):
+    """Démarre le serveur dans un thread ; renvoie (serveur, URL à placer dans MISTRAL_SERVER_URL)."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_mock_arguments(parser):
+    """Options du serveur factice (latence, débit, erreurs injectées)."""
+    defaults = MockConfig()
+    parser.add_argument(
+        "--latency", type=float, default=defaults.latency,
+        help=f"Secondes avant le premier token (défaut : {defaults.latency})."
+    )
+    parser.add_argument(
+        "--token-rate", type=float, default=defaults.token_rate,
+        help=f"Tokens générés par seconde et par requête (défaut : {defaults.token_rate:g})."
+    )
+    parser.add_argument(
+        "--output-tokens", type=int, default=defaults.output_tokens,
+        help=f"Longueur des réponses en tokens, plafonnée par max_tokens (défaut : {defaults.output_tokens})."
+    )
+    parser.add_argument(
+        "--rate-429", type=float, default=defaults.rate_429,
+        help="Probabilité d'une réponse 429 avec Retry-After (défaut : 0)."
+    )
+    parser.add_argument(
+        "--failure-rate", type=float, default=defaults.failure_rate,
+        help="Probabilité d'une erreur 500 (défaut : 0)."
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=defaults.retry_after,
+        help=f"Secondes annoncées dans l'en-tête Retry-After des 429 (défaut : {defaults.retry_after:g})."
+    )
+    parser.add_argument(
+        "--server-rpm", type=int, default=defaults.requests_per_minute,
+        help="Requêtes par minute acceptées avant de répondre 429 (défaut : 0, sans limite)."
+    )
+    parser.add_argument(
+        "--batch-seconds", type=float, default=defaults.batch_seconds,
+        help=f"Durée de traitement d'un job batch (défaut : {defaults.batch_seconds:g})."
+    )
+
+
+def mock_config(args):
+    return MockConfig(
+        latency=args.latency, token_rate=args.token_rate, output_tokens=args.output_tokens, rate_429=args.rate_429,
+        failure_rate=args.failure_rate, retry_after=args.retry_after, requests_per_minute=args.server_rpm,
+        batch_seconds=args.batch_seconds,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur Mistral factice pour mesurer la chaîne sans coût d'API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute (défaut : 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Port d'écoute (défaut : 8765).")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    config = mock_config(args)
+    server = make_server(config, args.host, args.port)
+    print(f"🧪 Serveur Mistral factice : http://{args.host}:{args.port} ({json.dumps(asdict(config))})")
+    print(f"   export MISTRAL_SERVER_URL=http://{args.host}:{args.port}   # statistiques : GET /mock/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {json.dumps(server.state.stats(), ensure_ascii=False)}")
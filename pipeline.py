@@ -0,0 +1,282 @@
+import argparse
+import functools
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from datetime import date
+
+from analysis_runner import add_runner_arguments, run_analysis
+from build_graph import BuildGraph, BuildState, Node, hash_file, hash_json, hash_sources, hash_text, parallel
+from dedup import cluster_tickets
+from ticket_analytics import render_analytics
+from ticket_loader import add_loader_arguments, load_company_tickets
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = "summaries/.build"
+
+# 🧭 Analyse -> (script d'analyse, script de rendu PDF)
+ANALYSES = {
+    "causes": ("prompt-engineering-causes.py", "markdown_to_pdf.py"),
+    "analyze": ("prompt-engineering.py", "json-to-pdf.py"),
+    "analyze-text": ("prompt-engineering-without-json.py", "markdown_to_pdf.py"),
+}
+STAGES = ("tickets", "stats", "prompt", "summary", "pdf")
+
+# Code dont dépendent les artefacts locaux (le script d'analyse s'ajoute à celui des prompts)
+STATS_SOURCES = ("ticket_analytics.py", "ticket_dates.py")
+PROMPT_SOURCES = (
+    "analysis_runner.py", "anonymization.py", "compact_prompt.py", "dedup.py", "json_report.py",
+    "ticket_analytics.py", "ticket_dates.py",
+)
+
+
+def _source(name):
+    return os.path.join(ROOT, name)
+
+
+def _file_name(company):
+    return company.replace(" ", "_").replace("/", "_")
+
+
+def _export_fields(tickets_list):
+    """Champs de l'export seuls : sans les valeurs pré-calculées du store ni les ajouts des étapes (`_...`)."""
+    return [{key: value for key, value in ticket.items() if not key.startswith("_")} for ticket in tickets_list]
+
+
+def ticket_stage(graph, args, load_tickets):
+    """📥 Empreinte des tickets de chaque entreprise ; l'export n'est relu que s'il a changé."""
+    data_hash = hash_file(args.data)
+    if data_hash is None:
+        exit(f"❌ Fichier introuvable : {args.data}")
+    export = Node("export", {"data": data_hash})
+
+    known = {key.removeprefix("tickets:") for key in graph.state.keys("tickets:")}
+    if graph.is_stale(export):
+        companies = list(load_tickets())
+        # Entreprises disparues de l'export : leurs nœuds ne seront plus jamais visités
+        graph.state.forget(f"tickets:{company}" for company in known.difference(companies))
+    else:
+        companies = sorted(known)
+
+    nodes = [Node(f"tickets:{company}", {"export": data_hash}, payload=company) for company in companies]
+    outputs = graph.run_stage(
+        "tickets", nodes,
+        parallel(lambda node: hash_json(_export_fields(load_tickets()[node.payload])), args.workers)
+    )
+    # L'export n'est marqué à jour que si toutes ses entreprises ont été lues : sinon il serait
+    # considéré inchangé au prochain build et les entreprises en échec ne seraient jamais reconstruites
+    if all(outputs[node.key] is not None for node in nodes):
+        graph.state.record([(export, data_hash)])
+    return {node.payload: outputs[node.key] for node in nodes if outputs[node.key] is not None}
+
+
+def stats_stage(graph, args, tickets_hashes, load_tickets):
+    """📐 Tableaux Pareto, cartes de contrôle et séries temporelles de chaque entreprise (sans Mistral)."""
+    code = hash_sources(*map(_source, STATS_SOURCES))
+    nodes = [
+        Node(
+            f"stats:{company}", {"tickets": tickets_hash, "code": code},
+            output=os.path.join(BUILD_DIR, "stats", f"{_file_name(company)}.md"), payload=company
+        )
+        for company, tickets_hash in tickets_hashes.items()
+    ]
+
+    def build_one(node):
+        text = render_analytics(node.payload, load_tickets()[node.payload])
+        _write(node.output, text)
+        return hash_text(text)
+
+    graph.run_stage("stats", nodes, parallel(build_one, args.workers))
+
+
+def prompt_stage(graph, args, analysis, spec, tickets_hashes, load_tickets):
+    """🧠 Prompt exact de chaque entreprise ; son empreinte décide seule de l'appel à Mistral."""
+    script, _ = ANALYSES[analysis]
+    code = hash_sources(_source(script), *map(_source, PROMPT_SOURCES))
+    options = {
+        "compact": args.compact, "dedup": args.dedup, "dedup_threshold": args.dedup_threshold,
+        "local_analytics": args.local_analytics,
+        # Les comptages récents du prompt portent sur une fenêtre glissante qui se termine aujourd'hui
+        "today": date.today().isoformat(),
+    }
+    nodes = [
+        Node(
+            f"prompt:{analysis}:{company}", {"tickets": tickets_hash, "code": code, "options": options},
+            output=os.path.join(BUILD_DIR, analysis, f"{_file_name(company)}.prompt.json"), payload=company
+        )
+        for company, tickets_hash in tickets_hashes.items()
+    ]
+
+    def build_one(node):
+        tickets_list = load_tickets()[node.payload]
+        clusters = cluster_tickets(tickets_list, args.dedup_threshold) if args.dedup else None
+        messages = spec.build_messages(node.payload, tickets_list, args.compact, clusters)
+        _write(node.output, json.dumps(messages, ensure_ascii=False, indent=1))
+        return hash_json(messages)
+
+    outputs = graph.run_stage("prompt", nodes, parallel(build_one, args.workers))
+    return {node.payload: outputs[node.key] for node in nodes if outputs[node.key] is not None}
+
+
+def summary_nodes(analysis, module, spec, prompt_hashes):
+    request = {
+        "model": module["model"], "max_tokens": module["max_tokens"], "response_format": spec.response_format,
+    }
+    return [
+        Node(
+            f"summary:{analysis}:{company}", {"prompt": prompt_hash, **request},
+            output=module["summary_path"](company), payload=company
+        )
+        for company, prompt_hash in prompt_hashes.items()
+    ]
+
+
+def summary_stage(graph, args, module, spec, nodes, load_tickets):
+    """🔍 Résumés Mistral des seules entreprises dont le prompt a changé (toutes les options du runner s'appliquent)."""
+
+    def build(stale):
+        saved = set()
+
+        def save_summary(company, final_summary):
+            if spec.save_summary(company, final_summary):
+                saved.add(company)
+                return True
+            return False
+
+        company_tickets = {node.payload: load_tickets()[node.payload] for node in stale}
+        run_analysis(
+            module["client"], module["model"], module["max_tokens"], company_tickets,
+            replace(spec, save_summary=save_summary), args
+        )
+        return {node.key: hash_file(node.output) for node in stale if node.payload in saved}
+
+    outputs = graph.run_stage("summary", nodes, build)
+    return {node.payload: (node.output, outputs[node.key]) for node in nodes if outputs[node.key] is not None}
+
+
+def pdf_stage(graph, args, analysis, summaries):
+    """🖨️ PDF des résumés modifiés, ou de tous si le code du rendu (CSS compris) a changé."""
+    _, renderer = ANALYSES[analysis]
+    code = hash_sources(_source(renderer))
+    options = {"renderer": args.renderer, "fonts": args.fonts, "output_dir": args.output_dir}
+    nodes = [
+        Node(
+            f"pdf:{analysis}:{company}", {"summary": summary_hash, "code": code, "options": options},
+            output=_pdf_path(renderer, path, args.output_dir), payload=path
+        )
+        for company, (path, summary_hash) in summaries.items()
+    ]
+
+    def build(stale):
+        # Un seul lancement du script de rendu pour tous les PDF obsolètes (pool de rendu du script)
+        command = [
+            sys.executable, _source(renderer), *(node.payload for node in stale),
+            "--output-dir", args.output_dir, "--workers", str(args.workers), "--fonts", args.fonts,
+        ]
+        if renderer == "markdown_to_pdf.py":
+            command += ["--renderer", args.renderer]
+        start = time.time()
+        subprocess.run(command, check=False)
+        return {
+            node.key: hash_file(node.output)
+            for node in stale if os.path.exists(node.output) and os.path.getmtime(node.output) >= start - 1
+        }
+
+    graph.run_stage("pdf", nodes, build)
+
+
+def _pdf_path(renderer, summary, output_dir):
+    """Nom du PDF produit par le script de rendu pour ce résumé."""
+    if renderer == "markdown_to_pdf.py":
+        name = os.path.splitext(os.path.basename(summary))[0].removesuffix("_summary")
+        return os.path.join(output_dir, f"Rapport_{name}.pdf")
+    with open(summary, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    company = _json_to_pdf()["company_name"](summary, data)
+    return os.path.join(output_dir, f"Rapport_{company}.pdf")
+
+
+@functools.cache
+def _json_to_pdf():
+    return runpy.run_path(_source("json-to-pdf.py"), run_name="json_to_pdf")
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def build(args):
+    script, _ = ANALYSES[args.analysis]
+    # Le script d'analyse est chargé sans exécuter son bloc __main__ (prompts, client, fichiers de sortie)
+    module = runpy.run_path(_source(script), run_name="pipeline_analysis")
+    spec = module["build_spec"](args)
+    last = STAGES.index(args.until)
+
+    load_tickets = functools.cache(
+        lambda: load_company_tickets(args.data, spill_mb=args.spill_mb, use_store=args.store)
+    )
+    graph = BuildGraph(BuildState(), force=args.force)
+    start = time.perf_counter()
+    try:
+        tickets_hashes = ticket_stage(graph, args, load_tickets)
+        if last >= STAGES.index("stats"):
+            stats_stage(graph, args, tickets_hashes, load_tickets)
+        if last >= STAGES.index("prompt"):
+            prompt_hashes = prompt_stage(graph, args, args.analysis, spec, tickets_hashes, load_tickets)
+        if last >= STAGES.index("summary"):
+            nodes = summary_nodes(args.analysis, module, spec, prompt_hashes)
+            if args.dry_run or args.token_report:
+                # Plan ou rapport de tokens des seules entreprises à reconstruire, sans rien enregistrer
+                stale = {node.payload: load_tickets()[node.payload] for node in nodes if graph.is_stale(node)}
+                run_analysis(module["client"], module["model"], module["max_tokens"], stale, spec, args)
+                return
+            summaries = summary_stage(graph, args, module, spec, nodes, load_tickets)
+        if last >= STAGES.index("pdf"):
+            pdf_stage(graph, args, args.analysis, summaries)
+    finally:
+        graph.state.close()
+
+    graph.print_report()
+    print(f"⏱️ Build terminé en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Chaîne complète export → statistiques → prompts → résumés → PDF, en ne reconstruisant "
+                    "que les artefacts dont les entrées ont changé."
+    )
+    add_loader_arguments(parser)
+    add_runner_arguments(parser)
+    parser.add_argument(
+        "--analysis", choices=sorted(ANALYSES), default="causes",
+        help="Analyse à construire (défaut : causes)."
+    )
+    parser.add_argument(
+        "--until", choices=STAGES, default="pdf",
+        help="Dernière étape construite, ex. prompt pour ne rien envoyer à Mistral (défaut : pdf)."
+    )
+    parser.add_argument("--force", action="store_true", help="Reconstruit tous les artefacts.")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Nœuds locaux (statistiques, prompts, PDF) construits en parallèle (défaut : nombre de cœurs)."
+    )
+    parser.add_argument(
+        "--local-analytics", action="store_true",
+        help="Ajoute au prompt de l'analyse causes les tableaux calculés localement."
+    )
+    parser.add_argument("--output-dir", default=".", help="Dossier des PDF générés (défaut : dossier courant).")
+    parser.add_argument("--fonts", default="fonts", help="Dossier des polices DejaVu (défaut : fonts).")
+    parser.add_argument(
+        "--renderer", choices=("auto", "wkhtmltopdf", "fpdf"), default="auto",
+        help="Rendu des rapports Markdown (voir markdown_to_pdf.py, défaut : auto)."
+    )
+    # Les entreprises à résumer sont analysées en parallèle (--concurrency appels simultanés)
+    parser.set_defaults(async_mode=True)
+    build(parser.parse_args())
@@ -0,0 +1,144 @@
+import logging
+import threading
+from dataclasses import dataclass
+
+from compact_prompt import messages_tokens
+from routing import SYNC_EXPECTED_OUTPUT_TOKENS, format_duration, predict_sync_seconds
+from ticket_dates import EPOCH, ticket_date
+
+# 💶 Tarifs par million de tokens (mistral-large, surchargeables en ligne de commande)
+PRICE_INPUT_PER_M = 2.0
+PRICE_OUTPUT_PER_M = 6.0
+
+OVER_BUDGET_POLICIES = ("skip", "chunk", "sample")
+
+
+@dataclass
+class CompanyEstimate:
+    company: str
+    tickets: int
+    input_tokens: int
+    output_tokens: int
+    cost: float
+    seconds: float
+    decision: str  # ok, chunk, sample ou skip
+
+
+def add_preflight_arguments(parser):
+    parser.add_argument(
+        "--max-company-tokens", type=int, default=None,
+        help="Budget de tokens d'entrée par entreprise (défaut : aucun)."
+    )
+    parser.add_argument(
+        "--max-run-tokens", type=int, default=None,
+        help="Budget de tokens d'entrée pour l'ensemble du run (défaut : aucun)."
+    )
+    parser.add_argument(
+        "--over-budget", choices=OVER_BUDGET_POLICIES, default="chunk",
+        help="Entreprise hors budget : skip (ignorée), chunk (analyse par lots, map-reduce) ou sample "
+             "(tickets les plus récents seulement) (défaut : chunk)."
+    )
+    parser.add_argument(
+        "--price-input", type=float, default=PRICE_INPUT_PER_M,
+        help=f"Prix d'un million de tokens d'entrée (défaut : {PRICE_INPUT_PER_M})."
+    )
+    parser.add_argument(
+        "--price-output", type=float, default=PRICE_OUTPUT_PER_M,
+        help=f"Prix d'un million de tokens de sortie (défaut : {PRICE_OUTPUT_PER_M})."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Affiche le plan (tokens, coût, durée, décisions de budget) sans appeler Mistral."
+    )
+
+
+def sample_recent(tickets_list, keep):
+    """Les ``keep`` tickets les plus récents, dans leur ordre d'origine."""
+    recent = sorted(range(len(tickets_list)), key=lambda i: ticket_date(tickets_list[i]) or EPOCH, reverse=True)
+    return [tickets_list[i] for i in sorted(recent[:keep])]
+
+
+class TokenBudget:
+    """Comptabilité des tokens avant envoi : estimation par entreprise et application des budgets."""
+
+    def __init__(self, args, max_tokens):
+        self.args = args
+        self.max_tokens = max_tokens
+        self.spent = 0
+        self.rows = []
+        self._lock = threading.Lock()  # les entreprises peuvent être préparées dans des threads
+
+    def _estimate(self, company, tickets_list, input_tokens, decision):
+        if decision == "skip":
+            return CompanyEstimate(company, len(tickets_list), input_tokens, 0, 0.0, 0.0, decision)
+        output_tokens = min(self.max_tokens, SYNC_EXPECTED_OUTPUT_TOKENS)
+        cost = (input_tokens * self.args.price_input + output_tokens * self.args.price_output) / 1_000_000
+        seconds = predict_sync_seconds(1, input_tokens, self.max_tokens, 1)
+        return CompanyEstimate(company, len(tickets_list), input_tokens, output_tokens, cost, seconds, decision)
+
+    def apply(self, company, tickets_list, messages, build_messages, quiet=False):
+        """Décision de budget pour une entreprise.
+
+        ``build_messages(tickets_list)`` reconstruit le prompt complet d'un échantillon de tickets.
+        Renvoie ``(decision, tickets_list, messages)``.
+        """
+        with self._lock:
+            input_tokens = messages_tokens(messages)
+            run_left = None if self.args.max_run_tokens is None else self.args.max_run_tokens - self.spent
+            limits = [limit for limit in (self.args.max_company_tokens, run_left) if limit is not None]
+            limit = min(limits) if limits else None
+
+            decision = "ok"
+            if limit is not None and input_tokens > limit:
+                over_run = run_left is not None and input_tokens > run_left
+                if self.args.over_budget == "chunk" and not over_run:
+                    # Chaque lot reste sous le budget ; le total n'est pas réduit
+                    decision = "chunk"
+                elif self.args.over_budget == "sample" and limit > 0:
+                    decision = "sample"
+                    keep = max(1, int(len(tickets_list) * limit / input_tokens))
+                    while True:
+                        tickets_list = sample_recent(tickets_list, keep)
+                        messages = build_messages(tickets_list)
+                        input_tokens = messages_tokens(messages)
+                        if input_tokens <= limit or keep == 1:
+                            break
+                        keep = max(1, int(keep * 0.9))
+                else:
+                    decision = "skip"
+
+            estimate = self._estimate(company, tickets_list, input_tokens, decision)
+            self.rows.append(estimate)
+            if decision != "skip":
+                self.spent += input_tokens
+
+        if quiet:
+            return decision, tickets_list, messages
+        logging.info(
+            f"🧮 {company} : {input_tokens:,} tokens d'entrée, ~{estimate.output_tokens:,} en sortie, "
+            f"{estimate.cost:.2f} $, ~{format_duration(estimate.seconds)} ({decision})"
+        )
+        if decision == "skip":
+            print(f"⛔ {company} : {input_tokens:,} tokens d'entrée, hors budget — entreprise ignorée.")
+        elif decision == "sample":
+            print(f"✂️ {company} : budget dépassé, analyse limitée aux {len(tickets_list)} tickets les plus récents.")
+        return decision, tickets_list, messages
+
+    def print_plan(self):
+        """Tableau récapitulatif du plan (mode --dry-run)."""
+        print("🧾 Plan d'exécution (aucun appel à Mistral) :")
+        for row in self.rows:
+            print(
+                f"   - {row.company} : {row.tickets} tickets, {row.input_tokens:,} tokens d'entrée, "
+                f"~{row.output_tokens:,} en sortie, {row.cost:.2f} $, ~{format_duration(row.seconds)} "
+                f"[{row.decision}]"
+            )
+        kept = [row for row in self.rows if row.decision != "skip"]
+        print(
+            f"   = {len(kept)} requête(s), {sum(row.input_tokens for row in kept):,} tokens d'entrée, "
+            f"~{sum(row.output_tokens for row in kept):,} en sortie, {sum(row.cost for row in kept):.2f} $, "
+            f"~{format_duration(sum(row.seconds for row in kept))} en série"
+        )
+        skipped = len(self.rows) - len(kept)
+        if skipped:
+            print(f"   ⛔ {skipped} entreprise(s) hors budget ignorée(s)")
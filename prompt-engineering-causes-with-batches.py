@@ -1,20 +1,23 @@
-import json
+import argparse
 import os
-import re
 import logging
-import time
-from datetime import datetime, timedelta
-from collections import defaultdict, Counter
-from io import BytesIO
-from mistralai import Mistral
+from anonymization import clean_description
+from batch_files import MAX_BATCH_FILE_BYTES, MAX_BATCH_REQUESTS, BatchFileWriter
+from batch_registry import BatchRegistry, download_results, poll_jobs, submit_run
+from batch_results import BatchResultAssembler
+from instrumentation import add_instrumentation_arguments, company_scope, count, instrumented_run, measure
+from mistral_client import shared_client
+from scheduler import add_scheduler_arguments, configure
+from ticket_analytics import LOCAL_SECTIONS, format_counts, recent_activity, top_counts
+from ticket_loader import add_loader_arguments, load_company_tickets
 
 # 🔑 Initialisation du client Mistral
-api_key = os.environ.get("MISTRAL_API_KEY")
 model = "mistral-large-latest"
-client = Mistral(api_key=api_key)
+client = shared_client()  # mistralai n'est importé qu'au premier appel à l'API
 
 # 📂 Création des répertoires
 os.makedirs("summaries", exist_ok=True)
+batch_folder = "summaries/batches"
 
 # 🛠️ Configuration des logs
 logging.basicConfig(
@@ -23,82 +26,7 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-# 🧹 Nettoyage du texte
-def clean_text(text):
-    if not text:
-        return "Aucune description."
-    text = re.sub(r'\n+', ' ', text)
-    text = re.sub(r'\s{2,}', ' ', text)
-    return text.strip()
-
-# 🚀 Chargement des données JSON
-json_file = "data.json"
-try:
-    with open(json_file, "r", encoding="utf-8") as f:
-        tickets = json.load(f)
-except Exception as e:
-    logging.error(f"Erreur lors du chargement du fichier JSON : {e}")
-    exit("❌ Impossible de charger les données.")
-
-# 🏢 Sélection d'une entreprise à analyser
-company = "Novo nordisk"  # Remplace avec l'entreprise à analyser
-tickets_list = [t for t in tickets if t.get("company") == company]
-
-if not tickets_list:
-    exit(f"❌ Aucun ticket trouvé pour l'entreprise {company}")
-
-logging.info(f"📊 Analyse en cours pour : {company} (Total : {len(tickets_list)})")
-
-# 📂 Création des dossiers pour l'entreprise
-company_folder = f"summaries/{company.replace(' ', '_')}"
-batch_folder = f"{company_folder}/batches"
-os.makedirs(company_folder, exist_ok=True)
-os.makedirs(batch_folder, exist_ok=True)
-
-# 📊 Statistiques
-total_tickets = len(tickets_list)
-themes = Counter(ticket.get('Themes', 'Non spécifié') for ticket in tickets_list)
-top_themes = ', '.join([f"{theme} ({count})" for theme, count in themes.most_common(5)])
-
-projects = Counter(ticket.get('project', 'Inconnu') for ticket in tickets_list)
-top_projects = ', '.join([f"{proj} ({count})" for proj, count in projects.most_common(3)])
-
-# 📆 Analyse temporelle
-today = datetime.now()
-six_months_ago = today - timedelta(days=180)
-monthly_counts = defaultdict(int)
-weekly_counts = defaultdict(int)
-daily_counts = defaultdict(int)
-
-empty_tickets = 0
-for t in tickets_list:
-    try:
-        date_obj = datetime.strptime(t['dateCreation'], '%d/%m/%Y %H:%M')
-    except ValueError:
-        try:
-            date_obj = datetime.strptime(t['dateCreation'], '%Y-%m-%d')
-        except ValueError:
-            logging.warning(f"⚠️ Format de date inconnu : {t['dateCreation']}")
-            continue
-
-    if not t['description'] or len(t['description'].split()) < 5:
-        empty_tickets += 1
-
-    if date_obj >= six_months_ago:
-        month = date_obj.strftime('%Y-%m')
-        week = date_obj.strftime('%Y-%U')
-        day = date_obj.strftime('%A')
-
-        monthly_counts[month] += 1
-        weekly_counts[week] += 1
-        daily_counts[day] += 1
-
-ticket_trend = ', '.join([f"{month}: {count}" for month, count in sorted(monthly_counts.items())])
-weekly_trend = ', '.join([f"{week}: {count}" for week, count in sorted(weekly_counts.items())])
-daily_trend = ', '.join([f"{day}: {count}" for day, count in sorted(daily_counts.items())])
-
-# 🛠️ **Création du fichier batch JSONL**
-batch_requests = []
+# 🔬 Méthodes d'analyse : une requête batch par entreprise et par méthode
 methods = [
     ("5_pourquoi", "Analyse détaillée des causes profondes avec la méthode des 5 pourquoi."),
     ("fishbone", "Analyse des causes avec le Diagramme d’Ishikawa (5M ou Fishbone)."),
@@ -109,59 +37,165 @@ methods = [
     ("correlation", "Corrélation et analyse factorielle des incidents."),
 ]
 
-for i, (method_key, method_desc) in enumerate(methods):
-    batch_requests.append({
-        "custom_id": str(i),
-        "body": {
-            "max_tokens": 4096,
-            "messages": [
-                {"role": "user", "content": f"""
+
+# 📊 Statistiques et tickets d'une entreprise, communs à toutes les méthodes
+def build_company_context(company, tickets_list):
+    total_tickets = len(tickets_list)
+    top_themes = top_counts(tickets_list, 'Themes', 'Non spécifié', 5)
+    top_projects = top_counts(tickets_list, 'project', 'Inconnu', 3)
+
+    # 📆 Analyse temporelle
+    empty_tickets, monthly_counts, weekly_counts, daily_counts = recent_activity(tickets_list)
+    ticket_trend = format_counts(monthly_counts)
+    weekly_trend = format_counts(weekly_counts)
+    daily_trend = format_counts(daily_counts)
+
+    context = f"""
+## 📊 Statistiques générales ({company})  
+- Nombre total de tickets : {total_tickets}  
+- Nombre de tickets vides ou très courts : {empty_tickets}  
+- Thèmes principaux : {top_themes}  
+- Projets principaux : {top_projects}  
+- Évolution sur les 6 derniers mois : {ticket_trend}  
+- Évolution hebdomadaire : {weekly_trend}  
+- Évolution quotidienne : {daily_trend}  
+
+📂 **Tickets à analyser** :
+
+"""
+    for ticket in tickets_list:
+        context += (
+            f"Ticket #{ticket['id']} :\n"
+            f"- Titre : {ticket['title']}\n"
+            f"- Description : {clean_description(ticket)}\n"
+            f"- Priorité : {ticket['priority']}\n"
+            f"- Thèmes : {ticket['Themes'] or 'Non spécifié'}\n"
+            f"- Temps suivi : {ticket['trackedHours']}h\n"
+            f"- Date de création : {ticket['dateCreation']}\n\n"
+        )
+    return context
+
+
+# 🛠️ Requête batch d'une méthode pour une entreprise
+def build_method_request(method_desc, context):
+    return {
+        "max_tokens": 4096,
+        "messages": [
+            {"role": "user", "content": f"""
 ## 🔬 Analyse avancée : {method_desc}  
 - Applique cette méthode pour analyser les données disponibles.  
 - Explique en détail les résultats et ton raisonnement.  
+{context}
+🔔 **IMPORTANT : La réponse doit être rédigée en texte clair et professionnel, sans instructions visibles.**
 """}
-            ]
-        }
-    })
-
-batch_file_path = f"{batch_folder}/batch_requests.jsonl"
-with open(batch_file_path, "w", encoding="utf-8") as f:
-    for request in batch_requests:
-        f.write(json.dumps(request) + "\n")
-
-# 📤 **Upload du batch file**
-with open(batch_file_path, "rb") as f:
-    batch_data = client.files.upload(
-        file={
-            "file_name": "batch_requests.jsonl",
-            "content": f.read()
-        },
-        purpose="batch"
-    )
-
-# 🚀 **Création du batch job**
-batch_job = client.batch.jobs.create(
-    input_files=[batch_data.id],
-    model=model,
-    endpoint="/v1/chat/completions",
-    metadata={"job_type": "analysis"}
-)
-
-# ⏳ **Suivi du batch**
-while True:
-    batch_status = client.batch.jobs.get(job_id=batch_job.id)
-    print(f"⏳ En attente des résultats... Statut actuel : {batch_status.status}")
-    if batch_status.status == "SUCCESS":
-        break
-    time.sleep(10)
-
-# 📥 **Téléchargement des résultats**
-output_file_path = f"{batch_folder}/batch_results.jsonl"
-with open(output_file_path, "wb") as f_out:
-    output_file = client.files.download(file_id=batch_status.output_file)
-    for chunk in output_file.stream:
-        f_out.write(chunk)
+        ]
+    }
 
-print(f"\n✅ Synthèse batch enregistrée pour {company} : {output_file_path}")
 
-print("🎯 Analyse complète avec Batches terminée.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse des causes pour toutes les entreprises via l'API Batch.")
+    add_loader_arguments(parser)
+    parser.add_argument(
+        "--company", action="append",
+        help="Limite le batch à cette entreprise (option répétable ; par défaut : toutes)."
+    )
+    parser.add_argument(
+        "--max-file-mb", type=float, default=MAX_BATCH_FILE_BYTES / 1024 / 1024,
+        help="Taille maximale d'un fichier batch en Mo (défaut : limite du fournisseur)."
+    )
+    parser.add_argument(
+        "--max-requests-per-file", type=int, default=MAX_BATCH_REQUESTS,
+        help="Nombre maximal de requêtes par fichier batch (défaut : limite du fournisseur)."
+    )
+    parser.add_argument(
+        "--local-analytics", action="store_true",
+        help="Calcule localement les sections Pareto, SPC et séries temporelles au lieu de les demander au modèle."
+    )
+    parser.add_argument(
+        "--new-run", action="store_true",
+        help="Prépare un nouveau batch même si un run précédent n'est pas terminé."
+    )
+    add_scheduler_arguments(parser)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    scheduler = configure(args)
+    # 📈 Mesures par étape et par entreprise, écrites en fin de run (JSON et Prometheus)
+    with instrumented_run("analysis_batch", args):
+        registry = BatchRegistry()
+        run_id = None if args.new_run else registry.resumable_run("analysis")
+
+        if run_id:
+            # ♻️ Reprise après un arrêt : les fichiers déjà uploadés et les jobs créés ne sont pas resoumis
+            print(f"♻️ Reprise du run batch {run_id}")
+            logging.info(f"♻️ Reprise du run batch {run_id}")
+        else:
+            # 🚀 Chargement des données
+            try:
+                company_tickets = load_company_tickets(args.data, spill_mb=args.spill_mb, use_store=args.store)
+            except Exception as e:
+                logging.error(f"Erreur lors du chargement du fichier JSON : {e}")
+                exit("❌ Impossible de charger les données.")
+
+            companies = args.company or list(company_tickets)
+            missing = [company for company in companies if company not in company_tickets]
+            if missing:
+                exit(f"❌ Aucun ticket trouvé pour l'entreprise {', '.join(missing)}")
+
+            run_id = registry.start_run("analysis", model)
+            run_folder = f"{batch_folder}/{run_id}"
+            local_sections = BatchResultAssembler(registry, run_id, methods)
+
+            # 🛠️ **Écriture en flux des fichiers batch JSONL** (une entreprise en mémoire à la fois)
+            with BatchFileWriter(
+                run_folder, max_bytes=int(args.max_file_mb * 1024 * 1024), max_requests=args.max_requests_per_file
+            ) as writer:
+                for company_number, company in enumerate(companies):
+                    tickets_list = company_tickets[company]
+                    logging.info(f"📊 Préparation du batch pour : {company} (Total : {len(tickets_list)})")
+                    with company_scope(company):
+                        with measure("prompt"):
+                            context = build_company_context(company, tickets_list)
+                        count("tickets", len(tickets_list))
+                        count("prompt_bytes", len(context.encode("utf-8")))
+                        rows = []
+                        for method_key, method_desc in methods:
+                            if args.local_analytics and method_key in LOCAL_SECTIONS:
+                                # 📐 Section purement arithmétique : calculée ici, sans requête au modèle
+                                with measure("analytics"):
+                                    section = LOCAL_SECTIONS[method_key](tickets_list)
+                                local_sections.write_section(company, method_key, section)
+                                continue
+                            custom_id = f"{company_number:05d}-{method_key}"
+                            with measure("batch_write"):
+                                writer.write(custom_id, build_method_request(method_desc, context))
+                            rows.append((custom_id, company, method_key))
+                        registry.add_requests(run_id, rows)
+
+            for batch_file_path in writer.paths:
+                registry.add_file(run_id, batch_file_path)
+            registry.mark_ready(run_id)
+            print(f"🧾 {writer.request_count} requêtes réparties en {len(writer.paths)} fichier(s) batch")
+
+        # 📤 **Upload et création des batch jobs** (tous soumis avant le suivi)
+        with measure("batch_submit"):
+            submit_run(client, registry, run_id, model, {"job_type": "analysis"})
+
+        # ⏳ **Suivi de tous les batchs en parallèle**
+        with measure("batch_wait"):
+            finished = poll_jobs(client, registry, run_id)
+        if not finished:
+            # Le run reste « submitted » : la prochaine exécution reprendra son suivi
+            exit(f"❌ Suivi du run {run_id} interrompu, relancer le script pour le reprendre.")
+
+        # 📥 **Téléchargement des résultats**, rangés au fil de l'eau dans le rapport de chaque entreprise
+        assembler = BatchResultAssembler(registry, run_id, methods)
+        with measure("batch_download"):
+            for output_file_path in download_results(
+                client, registry, run_id, f"{batch_folder}/{run_id}", on_line=assembler.feed
+            ):
+                logging.info(f"📥 Résultats batch enregistrés : {output_file_path}")
+            assembler.finish()
+
+        registry.set_run_state(run_id, "done")
+        scheduler.report()
+        print("🎯 Analyse complète avec Batches terminée.")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import os
+import runpy
+import sys
+
+# 🧭 Commande unique : chaque sous-commande exécute un script existant, qui n'importe que ses propres
+# dépendances (mistralai, fpdf, bs4, markdown2, pdfkit ne sont chargés que si la commande en a besoin)
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    "analyze": ("prompt-engineering.py", "Rapport complet par entreprise (JSON)"),
+    "analyze-text": ("prompt-engineering-without-json.py", "Rapport complet par entreprise (texte)"),
+    "causes": ("prompt-engineering-causes.py", "Analyse des causes par entreprise"),
+    "batch": ("prompt-engineering-causes-with-batches.py", "Analyse des causes de toutes les entreprises (API Batch)"),
+    "build": ("pipeline.py", "Chaîne complète export → résumés → PDF, en ne reconstruisant que ce qui a changé"),
+    "render-pdf": ("json-to-pdf.py", "Résumé JSON → PDF"),
+    "render-md": ("markdown_to_pdf.py", "Résumé Markdown → PDF"),
+    "stats": ("ticket_analytics.py", "Pareto, cartes de contrôle et séries temporelles, sans appel à Mistral"),
+    "dedup": ("dedup.py", "Regroupement des tickets quasi identiques"),
+    "anonymize": ("anonymization.py", "Mesure de l'anonymisation des descriptions"),
+    "mock-server": ("mock_mistral.py", "Serveur Mistral factice local (latence, débit et erreurs configurables)"),
+    "bench": ("benchmark.py", "Benchmark de bout en bout contre le serveur factice"),
+    "generate": ("generate_tickets.py", "Export de tickets synthétiques pour les tests de charge"),
+    "test-api": ("test-mistral-IA.py", "Appel de test de l'API Mistral"),
+}
+
+
+def usage():
+    width = max(len(command) for command in COMMANDS)
+    lines = ["usage: resume-ia <commande> [options]", "", "Commandes :"]
+    lines.extend(f"  {command:<{width}}  {description}" for command, (_, description) in COMMANDS.items())
+    lines.append("\n`resume-ia <commande> --help` affiche les options d'une commande.")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, options = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"❌ Commande inconnue : {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    script, _ = COMMANDS[command]
+    # Le script s'exécute comme s'il était lancé directement (même argparse, mêmes sorties)
+    sys.argv = [f"resume-ia {command}", *options]
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    runpy.run_path(os.path.join(ROOT, script), run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
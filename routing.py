@@ -0,0 +1,115 @@
+import logging
+from dataclasses import dataclass
+
+# 🧭 Modèle de coût/délai utilisé pour choisir entre appels directs et API Batch
+SYNC_REQUEST_OVERHEAD_S = 2.0  # latence fixe d'un appel (réseau, file d'attente)
+SYNC_INPUT_TOKENS_PER_S = 2000  # lecture du prompt par le modèle
+SYNC_OUTPUT_TOKENS_PER_S = 40  # génération de la réponse
+SYNC_EXPECTED_OUTPUT_TOKENS = 1500  # longueur habituelle d'un rapport (plafonnée par max_tokens)
+BATCH_EXPECTED_HOURS = 1.0  # délai habituel de traitement d'un batch
+BATCH_WINDOW_HOURS = 24.0  # délai maximal garanti par le fournisseur
+BATCH_PRICE_RATIO = 0.5  # prix d'un token en batch par rapport à un appel direct
+
+ROUTES = ("sync", "batch", "auto")
+POLICIES = ("cost", "throughput")
+
+
+@dataclass
+class RoutePlan:
+    route: str  # "sync" ou "batch"
+    reason: str
+    requests: int
+    input_tokens: int
+    predicted_seconds: float
+
+
+def predict_sync_seconds(requests, input_tokens, max_tokens, concurrency):
+    """Durée prévue des appels directs, répartis sur ``concurrency`` appels simultanés."""
+    output_tokens = requests * min(max_tokens, SYNC_EXPECTED_OUTPUT_TOKENS)
+    total = (
+        requests * SYNC_REQUEST_OVERHEAD_S
+        + input_tokens / SYNC_INPUT_TOKENS_PER_S
+        + output_tokens / SYNC_OUTPUT_TOKENS_PER_S
+    )
+    return total / max(1, concurrency)
+
+
+def add_routing_arguments(parser):
+    parser.add_argument(
+        "--route", choices=ROUTES, default="sync",
+        help="sync : appels directs ; batch : API Batch ; auto : choix selon le volume et le délai (défaut : sync)."
+    )
+    parser.add_argument(
+        "--deadline-hours", type=float, default=None,
+        help="Délai maximal souhaité pour obtenir les rapports en mode --route auto (défaut : aucun)."
+    )
+    parser.add_argument(
+        "--route-policy", choices=POLICIES, default="cost",
+        help="cost : batch dès que le volume et le délai le permettent ; throughput : batch seulement s'il est "
+             "prévu plus rapide (défaut : cost)."
+    )
+    parser.add_argument(
+        "--batch-min-requests", type=int, default=50,
+        help="Nombre d'entreprises à partir duquel le batch est envisagé (défaut : 50)."
+    )
+    parser.add_argument(
+        "--batch-min-tokens", type=int, default=2_000_000,
+        help="Tokens d'entrée à partir desquels le batch est envisagé (défaut : 2 000 000)."
+    )
+
+
+def choose_route(requests, input_tokens, max_tokens, concurrency, args):
+    """Choisit la voie d'exécution d'un run à partir de son volume estimé et des options ``args``."""
+    sync_seconds = predict_sync_seconds(requests, input_tokens, max_tokens, concurrency)
+    batch_seconds = BATCH_EXPECTED_HOURS * 3600
+
+    def plan(route, reason):
+        predicted = sync_seconds if route == "sync" else batch_seconds
+        return RoutePlan(route, reason, requests, input_tokens, predicted)
+
+    if args.route != "auto":
+        return plan(args.route, "voie imposée par --route")
+    if requests == 0:
+        return plan("sync", "aucune requête à envoyer")
+
+    deadline_seconds = None if args.deadline_hours is None else args.deadline_hours * 3600
+    if deadline_seconds is not None and deadline_seconds < BATCH_WINDOW_HOURS * 3600:
+        # Le batch ne garantit un résultat qu'à l'intérieur de sa fenêtre de traitement
+        return plan("sync", f"délai de {args.deadline_hours:g} h plus court que la fenêtre batch")
+
+    if args.route_policy == "throughput":
+        if sync_seconds > batch_seconds:
+            return plan("batch", "batch prévu plus rapide que les appels directs")
+        return plan("sync", "appels directs prévus plus rapides que le batch")
+
+    if requests >= args.batch_min_requests or input_tokens >= args.batch_min_tokens:
+        return plan(
+            "batch", f"volume suffisant pour le tarif batch ({BATCH_PRICE_RATIO:.0%} du prix des appels directs)"
+        )
+    return plan("sync", "volume trop faible pour justifier le batch")
+
+
+def format_duration(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def report_route(route_plan):
+    message = (
+        f"🧭 Voie choisie : {route_plan.route} ({route_plan.reason}) — {route_plan.requests} requête(s), "
+        f"~{route_plan.input_tokens:,} tokens d'entrée, durée prévue {format_duration(route_plan.predicted_seconds)}"
+    )
+    print(message)
+    logging.info(message)
+
+
+def report_actual(route_plan, wall_clock):
+    message = (
+        f"🧭 Voie {route_plan.route} : durée prévue {format_duration(route_plan.predicted_seconds)}, "
+        f"durée réelle {format_duration(wall_clock)}"
+    )
+    print(message)
+    logging.info(message)
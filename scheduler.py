@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from instrumentation import count, observe
+
+# 🚦 Limites du compte Mistral et politique de nouvelles tentatives (partagées par tout le processus)
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 500_000
+BURST_SECONDS = 6  # capacité des seaux : quelques secondes de débit, pour ne pas dépasser la limite par minute
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # secondes, doublées à chaque tentative (gigue complète)
+BACKOFF_MAX = 60.0
+BREAKER_THRESHOLD = 5  # appels consécutifs en échec (nouvelles tentatives épuisées) avant d'ouvrir le disjoncteur
+BREAKER_RESET_SECONDS = 60.0
+TRIAL_POLL_SECONDS = 0.5  # pendant l'appel d'essai d'un autre appelant, intervalle entre deux vérifications
+
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans être envoyé : le disjoncteur est ouvert après trop d'échecs consécutifs."""
+
+
+def _response(error):
+    return getattr(error, "raw_response", None) or getattr(error, "response", None)
+
+
+def status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(_response(error), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error):
+    """Délai demandé par l'en-tête Retry-After (secondes ou date HTTP), ou None."""
+    headers = getattr(_response(error), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(error):
+    """Erreur qui peut disparaître d'elle-même : limite de débit, 5xx, coupure réseau ou disjoncteur ouvert."""
+    if isinstance(error, CircuitOpenError):
+        return True
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Erreurs réseau de httpx (client de mistralai) : le module n'est consulté que s'il a déjà été chargé
+    httpx = sys.modules.get("httpx")
+    network_errors = (ConnectionError, TimeoutError) + ((httpx.TransportError,) if httpx is not None else ())
+    return isinstance(error, network_errors)
+
+
+def counts_against_breaker(error):
+    """Échec qui compte pour le disjoncteur : erreur temporaire venant de l'API (pas un refus du disjoncteur)."""
+    return is_transient(error) and not isinstance(error, CircuitOpenError)
+
+
+class TokenBucket:
+    """Seau à jetons réservant ``amount`` unités ; renvoie l'attente nécessaire (le niveau peut devenir négatif).
+
+    Une demande plus grosse que la capacité est acceptée : elle attend simplement plus longtemps.
+    """
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount):
+        with self.lock:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class CircuitBreaker:
+    """Ouvert après ``threshold`` appels consécutifs en échec ; un appel d'essai est permis après ``reset_seconds``."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False  # appel d'essai (semi-ouvert) en cours
+        self.lock = threading.Lock()
+
+    def acquire(self, wait_if_open=False):
+        """Autorisation d'un appel : ``(attente, essai)``.
+
+        ``(0, False)`` si le disjoncteur est fermé. Après ``reset_seconds``, un seul appelant obtient
+        ``(0, True)`` : l'appel d'essai ; les autres reçoivent une courte attente et redemandent jusqu'à
+        ``success()`` ou ``failure()``. Disjoncteur ouvert : CircuitOpenError, ou l'attente restante avec
+        ``wait_if_open`` (rejeu de fin d'exécution).
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0, False
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                if not wait_if_open:
+                    raise CircuitOpenError(f"disjoncteur ouvert encore {remaining:.1f}s")
+                return remaining, False
+            if self.trial:
+                return TRIAL_POLL_SECONDS, False
+            self.trial = True
+            return 0.0, True
+
+    def release(self):
+        """Libère l'appel d'essai sans verdict (erreur non temporaire, annulation) : un autre appelant le reprend."""
+        with self.lock:
+            self.trial = False
+
+    def success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logging.info("🟢 Disjoncteur refermé : l'API répond de nouveau")
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.trial = False
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logging.error(f"🔴 Disjoncteur ouvert après {self.failures} échecs consécutifs")
+                    print(f"🔴 API Mistral indisponible : appels suspendus pendant {self.reset_seconds:.0f}s")
+                # Un essai raté (semi-ouvert) rouvre le disjoncteur pour une nouvelle période
+                self.opened_at = time.monotonic()
+
+
+class RetryQueue:
+    """Travaux abandonnés après leurs nouvelles tentatives, rejoués une fois en fin d'exécution."""
+
+    def __init__(self):
+        self.items = {}
+        self.lost = []
+
+    def add(self, key, error):
+        self.items[key] = error
+        logging.warning(f"🔁 {key} remis en file d'attente ({error})")
+        print(f"🔁 {key} : erreur temporaire, nouvel essai en fin d'exécution")
+
+    def take(self):
+        keys = list(self.items)
+        self.items.clear()
+        return keys
+
+    def lose(self, key, error):
+        self.lost.append(key)
+        logging.error(f"❌ {key} abandonné après le rejeu de fin d'exécution : {error}")
+        print(f"🚨 {key} : échec définitif ({error})")
+
+
+class Scheduler:
+    """Planificateur commun des appels Mistral : limites par minute, nouvelles tentatives et disjoncteur."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_retries=MAX_RETRIES):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self.retry_queue = RetryQueue()
+        self.draining = False  # rejeu de fin d'exécution : on attend le disjoncteur au lieu d'échouer
+        self.calls = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    def _breaker(self):
+        """``(attente, essai)`` du disjoncteur ; pendant le rejeu, on attend sa fermeture au lieu d'échouer."""
+        return self.breaker.acquire(wait_if_open=self.draining)
+
+    def _admit(self, tokens):
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        self.calls += 1
+        self.throttled_seconds += delay
+        count("api_throttled_seconds", delay)
+        return delay
+
+    def _settle(self, tokens, used_tokens):
+        if used_tokens is not None and used_tokens < tokens:
+            self.tokens.refund(tokens - used_tokens)
+
+    def _retry_delay(self, error, attempt, label, retry=True, trial=False):
+        """Attente avant la prochaine tentative, ou None si l'erreur doit remonter.
+
+        Le disjoncteur compte les appels, pas les tentatives : un seul échec par appel abandonné. L'appel
+        d'essai rend son verdict dès son premier échec, ce qui rouvre le disjoncteur.
+        """
+        if not counts_against_breaker(error):
+            return None
+        exhausted = not retry or attempt >= self.max_retries
+        if exhausted or trial:
+            self.breaker.failure()
+        if exhausted:
+            return None
+        backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        delay = max(backoff, retry_after(error) or 0.0)
+        self.retries += 1
+        count("api_retries")
+        logging.warning(
+            f"⏳ {label} : erreur temporaire ({status_code(error) or type(error).__name__}), "
+            f"tentative {attempt + 2}/{self.max_retries + 1} dans {delay:.1f}s"
+        )
+        return delay
+
+    def call(self, func, tokens=0, label="Appel Mistral", used_tokens=None, retry=True):
+        """Exécute ``func()`` dans les limites du compte, avec nouvelles tentatives.
+
+        ``tokens`` est la réservation (entrée estimée + max_tokens) ; ``used_tokens(résultat)``
+        renvoie la consommation réelle pour rendre la différence au limiteur. ``retry=False`` : une
+        seule tentative, pour les appels non idempotents (l'appelant vérifie avant de recommencer).
+        """
+        attempt = 0
+        while True:
+            pause, trial = self._breaker()
+            if pause:
+                time.sleep(pause)
+                continue
+            time.sleep(self._admit(tokens))
+            start = time.perf_counter()
+            try:
+                result = func()
+            except Exception as e:
+                observe("api_latency_seconds", time.perf_counter() - start)
+                delay = self._retry_delay(e, attempt, label, retry, trial)
+                if delay is None:
+                    if trial and not counts_against_breaker(e):
+                        self.breaker.release()
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            observe("api_latency_seconds", time.perf_counter() - start)
+            self.breaker.success()
+            self._settle(tokens, used_tokens(result) if used_tokens is not None else None)
+            return result
+
+    async def call_async(self, func, tokens=0, label="Appel Mistral", used_tokens=None):
+        """Variante asynchrone : ``func()`` renvoie une coroutine, recréée à chaque tentative."""
+        attempt = 0
+        while True:
+            pause, trial = self._breaker()
+            if pause:
+                await asyncio.sleep(pause)
+                continue
+            try:
+                await asyncio.sleep(self._admit(tokens))
+                start = time.perf_counter()
+                result = await func()
+            except asyncio.CancelledError:
+                if trial:
+                    self.breaker.release()
+                raise
+            except Exception as e:
+                observe("api_latency_seconds", time.perf_counter() - start)
+                delay = self._retry_delay(e, attempt, label, trial=trial)
+                if delay is None:
+                    if trial and not counts_against_breaker(e):
+                        self.breaker.release()
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            observe("api_latency_seconds", time.perf_counter() - start)
+            self.breaker.success()
+            self._settle(tokens, used_tokens(result) if used_tokens is not None else None)
+            return result
+
+    def drain(self):
+        """Travaux à rejouer : à partir de là, les appels attendent la fermeture du disjoncteur."""
+        self.draining = True
+        return self.retry_queue.take()
+
+    def report(self):
+        if not self.calls:
+            return
+        message = (
+            f"🚦 Planificateur : {self.calls} appel(s), {self.retries} nouvelle(s) tentative(s), "
+            f"{self.throttled_seconds:.1f}s d'attente du limiteur, {len(self.retry_queue.lost)} échec(s) définitif(s)"
+        )
+        print(message)
+        logging.info(message)
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Planificateur partagé du processus (créé avec les limites par défaut s'il n'a pas été configuré)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+    return _scheduler
+
+
+def configure(args):
+    """Remplace le planificateur partagé par un planificateur aux limites de ``args``."""
+    global _scheduler
+    _scheduler = Scheduler(args.requests_per_minute, args.tokens_per_minute, args.max_retries)
+    return _scheduler
+
+
+def add_scheduler_arguments(parser):
+    parser.add_argument(
+        "--requests-per-minute", type=float, default=REQUESTS_PER_MINUTE,
+        help=f"Limite de requêtes par minute du compte Mistral (défaut : {REQUESTS_PER_MINUTE})."
+    )
+    parser.add_argument(
+        "--tokens-per-minute", type=float, default=TOKENS_PER_MINUTE,
+        help=f"Limite de tokens (entrée + sortie) par minute du compte Mistral (défaut : {TOKENS_PER_MINUTE:,})."
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=MAX_RETRIES,
+        help=f"Nouvelles tentatives d'un appel après une erreur 429/5xx ou réseau (défaut : {MAX_RETRIES})."
+    )
@@ -0,0 +1,161 @@
+import logging
+import os
+import time
+
+from token_estimation import estimate_tokens
+
+# 📡 Réponses en cours d'écriture (conservées si le run est interrompu)
+PARTIAL_DIR = "summaries/.partial"
+
+_CLOSING = {"}": "{", "]": "["}
+
+
+class JsonStreamValidator:
+    """Vérifie au fil de l'eau qu'une réponse a la structure d'un document JSON.
+
+    Suit les chaînes et l'imbrication des accolades/crochets : une réponse qui ne commence pas par
+    ``{`` ou ``[``, ou qui ferme un bloc qui n'a pas été ouvert, est signalée dès le morceau fautif.
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.error = None
+
+    def feed(self, text):
+        if self.error is not None:
+            return self.error
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif not self.started:
+                if char.isspace():
+                    continue
+                if char not in "{[":
+                    self.error = f"la réponse commence par {char!r} au lieu d'un objet JSON"
+                    return self.error
+                self.started = True
+                self.stack.append(char)
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.stack.append(char)
+            elif char in _CLOSING:
+                if not self.stack or self.stack.pop() != _CLOSING[char]:
+                    self.error = f"{char!r} ne ferme aucun bloc ouvert"
+                    return self.error
+            elif not self.stack and not char.isspace():
+                self.error = "contenu après la fin du document JSON"
+                return self.error
+        return None
+
+    @property
+    def complete(self):
+        return self.started and not self.stack and not self.in_string and self.error is None
+
+
+class StreamSink:
+    """Écrit une réponse en flux dans ``summaries/.partial`` et mesure TTFT et débit."""
+
+    def __init__(self, analysis_name, company, validate_json=False):
+        folder = os.path.join(PARTIAL_DIR, analysis_name)
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, f"{company.replace(' ', '_').replace('/', '_')}.part")
+        self.company = company
+        self.validate_json = validate_json
+        self.file = None
+        self.restart()
+
+    def restart(self):
+        """(Ré)ouvre un fichier partiel vide : une nouvelle tentative ne s'ajoute pas à la précédente."""
+        if self.file is not None:
+            self.file.close()
+        self.validator = JsonStreamValidator() if self.validate_json else None
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.chunks = []
+        self.output_tokens = None  # renseigné par l'usage renvoyé en fin de flux
+        return self
+
+    def write(self, text):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            logging.info(f"📡 {self.company} : premier token après {self.first_token_at - self.start:.2f}s")
+        self.chunks.append(text)
+        self.file.write(text)
+        self.file.flush()
+        if self.validator is not None and self.validator.error is None and self.validator.feed(text):
+            logging.warning(f"⚠️ {self.company} : JSON invalide en cours de flux ({self.validator.error})")
+            print(f"⚠️ {self.company} : la réponse en cours n'est pas un JSON valide ({self.validator.error})")
+
+    def text(self):
+        return "".join(self.chunks)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def discard(self):
+        """Supprime le fichier partiel une fois le résumé final enregistré."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def stats(self):
+        """(TTFT en secondes, tokens de sortie, tokens par seconde) ; TTFT vaut None sans réponse."""
+        end = time.perf_counter()
+        tokens = self.output_tokens if self.output_tokens is not None else estimate_tokens(self.text())
+        if self.first_token_at is None:
+            return None, tokens, 0.0
+        generation = max(end - self.first_token_at, 1e-9)
+        return self.first_token_at - self.start, tokens, tokens / generation
+
+
+def _consume(sink, event):
+    chunk = event.data
+    if getattr(chunk, "usage", None) is not None:
+        sink.output_tokens = chunk.usage.completion_tokens
+    if chunk.choices:
+        content = chunk.choices[0].delta.content
+        if isinstance(content, str) and content:
+            sink.write(content)
+
+
+def request_options(response_format):
+    """Arguments optionnels d'un appel de chat (``response_format`` n'est passé que s'il est défini)."""
+    return {} if response_format is None else {"response_format": response_format}
+
+
+def stream_complete(client, model, messages, max_tokens, sink, response_format=None):
+    """Appel Mistral en flux (``client.chat.stream``) ; renvoie le texte complet."""
+    try:
+        with client.chat.stream(
+            model=model, messages=messages, max_tokens=max_tokens, **request_options(response_format)
+        ) as events:
+            for event in events:
+                _consume(sink, event)
+    finally:
+        sink.close()
+    return sink.text()
+
+
+async def stream_complete_async(client, model, messages, max_tokens, sink, response_format=None):
+    """Variante asynchrone (``client.chat.stream_async``)."""
+    try:
+        events = await client.chat.stream_async(
+            model=model, messages=messages, max_tokens=max_tokens, **request_options(response_format)
+        )
+        async with events:
+            async for event in events:
+                _consume(sink, event)
+    finally:
+        sink.close()
+    return sink.text()
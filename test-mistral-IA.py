@@ -1,12 +1,11 @@
-import os
-from mistralai import Mistral
+from mistral_client import get_client
+from scheduler import get_scheduler
 
-api_key = os.environ["MISTRAL_API_KEY"]
 model = "mistral-large-latest"
 
-client = Mistral(api_key=api_key)
+client = get_client()
 
-chat_response = client.chat.complete(
+chat_response = get_scheduler().call(lambda: client.chat.complete(
     model = model,
     messages = [
         {
@@ -14,6 +13,6 @@ chat_response = client.chat.complete(
             "content": "What is the best French cheese?",
         },
     ]
-)
+))
 
 print(chat_response.choices[0].message.content)
@@ -0,0 +1,61 @@
+import random
+
+from anonymization import clean_description, clean_text, legacy_clean_text
+
+# 🧹 Cas limites du motif unique : il doit rendre exactement la sortie des quatre re.sub historiques
+SAMPLES = [
+    "",
+    "Aucune description.",
+    # E-mails
+    "Contact : jean.dupont@example.com pour le suivi",
+    "jean-dupont@mail.example.fr,autre@test.io;x@y.z",
+    "adresse 12.34@example.com et 0612345678@sms.fr",
+    "écrire à émilie_rené@société.fr",
+    # Téléphones
+    "Appeler le 06 12 34 56 78 ou le 01-23-45-67-89",
+    "Tél. 06.12.34.56.78 / +33 6 12 34 56 78 / 0612345678",
+    "numéro 06  12\n34 56 78 sur deux lignes",
+    "123 456 789 012 et 12 34 56 78 90 12",
+    "code 2024-06-12 10:30 ticket 123456",
+    # Espaces unicode et sauts de ligne
+    "ligne 1\n\n\nligne 2\r\nligne 3",
+    "insécable\u00a0\u00a0double, fine\u202fseule, tab\t\tdouble",
+    "  début et fin  \n",
+    "em\u2003\u2003space\u3000idéographique, séparateur\u2028de ligne",
+    "06\u00a012\u00a034\u00a056\u00a078",
+]
+
+# Alphabet du fuzz : chiffres, séparateurs, espaces (dont unicode), fragments d'e-mails
+_ALPHABET = list("0123456789-. @_ab") + ["\n", "\t", "\u00a0", "\u2003", "x@y.fr", ".com", "06 ", "é"]
+
+
+def test_samples_match_legacy():
+    for text in SAMPLES:
+        assert clean_text(text) == legacy_clean_text(text), repr(text)
+
+
+def test_fuzz_matches_legacy():
+    rng = random.Random(7)
+    for _ in range(20000):
+        text = "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(0, 30)))
+        assert clean_text(text) == legacy_clean_text(text), repr(text)
+
+
+def test_none_description():
+    for clean in (clean_text, legacy_clean_text):
+        try:
+            clean(None)
+        except TypeError:
+            pass
+        else:
+            raise AssertionError(f"{clean.__name__}(None) aurait dû échouer")
+    # Les scripts passent toujours par clean_description, qui remplace une description absente
+    assert clean_description({"description": None}) == legacy_clean_text("Aucune description.")
+    assert clean_description({"description": ""}) == "Aucune description."
+
+
+if __name__ == "__main__":
+    test_samples_match_legacy()
+    test_fuzz_matches_legacy()
+    test_none_description()
+    print("✅ Tests de l'anonymisation réussis")
@@ -1,12 +1,10 @@
 import json
-import os
-import time
-from mistralai import Mistral
+from batch_registry import BatchRegistry, download_results, poll_jobs, submit_run
+from mistral_client import shared_client
 
 # 🔑 Initialisation du client
-api_key = os.environ.get("MISTRAL_API_KEY")
 model = "mistral-large-latest"  # Modèle plus rapide pour le test
-client = Mistral(api_key=api_key)
+client = shared_client()  # mistralai n'est importé qu'au premier appel à l'API
 
 # 📂 Création du fichier batch test
 batch_file = "test_batch.jsonl"
@@ -25,50 +23,25 @@ with open(batch_file, "w", encoding="utf-8") as f:
 
 print(f"✅ Fichier batch généré : {batch_file}")
 
-# 📤 Envoi du fichier batch à Mistral
-with open(batch_file, "rb") as f:
-    batch_data = client.files.upload(
-        file={"file_name": batch_file, "content": f.read()},
-        purpose="batch"
-    )
+# 📤 Envoi du fichier batch et création du job (enregistrés dans le registre des batchs)
+registry = BatchRegistry()
+run_id = registry.start_run("test", model)
+registry.add_requests(run_id, [(request["custom_id"], "test", "question") for request in batch_requests])
+registry.add_file(run_id, batch_file)
+registry.mark_ready(run_id)
+submit_run(client, registry, run_id, model, {"job_type": "test"})
 
-print(f"🚀 Fichier batch uploadé. ID du fichier : {batch_data.id}")
-
-# 🏁 Création du job batch
-batch_job = client.batch.jobs.create(
-    input_files=[batch_data.id],
-    model=model,
-    endpoint="/v1/chat/completions",
-    metadata={"job_type": "test"}
-)
-
-print(f"🚀 Batch soumis ! ID du job : {batch_job.id}")
+print(f"🚀 Batch soumis ! Run : {run_id}")
 
 # ⏳ Attente des résultats
 timeout = 300  # 5 minutes max
-start_time = time.time()
-
-while True:
-    batch_status = client.batch.jobs.get(job_id=batch_job.id)
-    print(f"⏳ En attente... Statut actuel : {batch_status.status}")
-
-    if batch_status.status == "SUCCESS":
-        print("✅ Batch terminé avec succès !")
-        break
-
-    if time.time() - start_time > timeout:
-        print("⏰ Temps d'attente dépassé ! Le batch prend trop de temps.")
-        break
-
-    time.sleep(5)
+if poll_jobs(client, registry, run_id, timeout=timeout):
+    print("✅ Batch terminé !")
+else:
+    print("⏰ Temps d'attente dépassé ! Le batch prend trop de temps.")
 
 # 📥 Téléchargement des résultats
-if batch_status.status == "SUCCESS":
-    output_file = client.files.download(file_id=batch_status.output_file)
-    output_path = "test_batch_results.jsonl"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        for chunk in output_file.stream:
-            f.write(chunk.decode("utf-8"))
-    
+for output_path in download_results(client, registry, run_id, "."):
     print(f"📥 Résultats téléchargés : {output_path}")
+
+registry.set_run_state(run_id, "done")
@@ -0,0 +1,52 @@
+from dedup import cluster_tickets
+
+DESCRIPTION = "Impossible de se connecter au VPN depuis le poste du service comptabilité, erreur 809 au démarrage"
+
+
+def _ticket(number, title, description, hours=1):
+    return {
+        "id": number, "title": title, "description": description, "trackedHours": hours,
+        "dateCreation": f"2025-03-{number:02d}",
+    }
+
+
+def test_near_duplicates_are_grouped():
+    tickets = [
+        _ticket(1, "VPN inaccessible", DESCRIPTION),
+        _ticket(2, "VPN inaccessible", "Bonjour, " + DESCRIPTION),
+        _ticket(3, "VPN inaccessible", DESCRIPTION + "."),
+    ]
+    clusters = cluster_tickets(tickets)
+    assert [cluster.count for cluster in clusters] == [3]
+    assert clusters[0].representative["id"] == 2  # description la plus longue
+    assert clusters[0].tracked_hours == 3
+    assert "du 2025-03-01 au 2025-03-03" in clusters[0].summary()
+
+
+def test_distinct_tickets_stay_apart():
+    tickets = [
+        _ticket(1, "VPN inaccessible", DESCRIPTION),
+        _ticket(2, "Imprimante bloquée", "Le bac papier du deuxième étage affiche un bourrage permanent"),
+        _ticket(3, "Licence expirée", "Renouvellement de la licence du logiciel de paie avant la clôture"),
+    ]
+    assert [cluster.count for cluster in cluster_tickets(tickets)] == [1, 1, 1]
+
+
+def test_empty_tickets_are_never_grouped():
+    tickets = [
+        _ticket(1, "", ""),
+        _ticket(2, None, None),
+        _ticket(3, " ", "  "),
+        _ticket(4, "VPN inaccessible", DESCRIPTION),
+        _ticket(5, "", "---"),
+    ]
+    clusters = cluster_tickets(tickets)
+    assert [cluster.count for cluster in clusters] == [1, 1, 1, 1, 1]
+    assert [cluster.representative["id"] for cluster in clusters] == [1, 2, 3, 4, 5]
+
+
+if __name__ == "__main__":
+    test_near_duplicates_are_grouped()
+    test_distinct_tickets_stay_apart()
+    test_empty_tickets_are_never_grouped()
+    print("✅ Tests du regroupement réussis")
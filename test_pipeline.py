@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from build_graph import BuildGraph, BuildState
+from pipeline import ticket_stage
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 📂 Petit export de test : deux entreprises, les deux formats de date
+TICKETS = [
+    {
+        "id": number, "company": company, "title": f"Incident {number}", "description": f"Poste {number} bloqué",
+        "priority": "Haute", "Themes": "Accès", "project": "Support", "trackedHours": 1.5,
+        "dateCreation": "12/03/2025 09:30" if number % 2 else "2025-03-12",
+    }
+    for number, company in enumerate(["ALK", "ALK", "ACME corp", "ACME corp"], start=1)
+]
+
+
+def _workdir():
+    folder = tempfile.mkdtemp(prefix="test_pipeline_")
+    with open(os.path.join(folder, "data.json"), "w", encoding="utf-8") as f:
+        json.dump(TICKETS, f)
+    return folder
+
+
+def _build(folder, *options):
+    command = [sys.executable, os.path.join(ROOT, "pipeline.py"), "--data", "data.json", "--until", "prompt", *options]
+    return subprocess.run(command, cwd=folder, capture_output=True, text=True, encoding="utf-8")
+
+
+def test_build_with_store():
+    """Les valeurs pré-calculées du store (`_created`, `_words`) ne cassent pas l'empreinte des tickets."""
+    folder = _workdir()
+    try:
+        first = _build(folder, "--store")
+        assert first.returncode == 0, first.stderr
+        assert "tickets : 2/2 reconstruits" in first.stdout, first.stdout
+        assert "prompt : 2/2 reconstruits" in first.stdout, first.stdout
+
+        second = _build(folder, "--store")
+        assert "tickets : 0/2 reconstruits" in second.stdout, second.stdout
+        assert "prompt : 0/2 reconstruits" in second.stdout, second.stdout
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_failed_tickets_are_rebuilt():
+    """Un export dont une entreprise a échoué est relu au build suivant."""
+    folder = _workdir()
+    data = os.path.join(folder, "data.json")
+    companies = {"ALK": [TICKETS[0]], "ACME corp": [TICKETS[2]]}
+    args = SimpleNamespace(data=data, workers=1)
+
+    class Failing(dict):
+        def __getitem__(self, company):
+            if company == "ALK":
+                raise OSError("partition illisible")
+            return super().__getitem__(company)
+
+    try:
+        graph = BuildGraph(BuildState(os.path.join(folder, "graph.sqlite")))
+        assert list(ticket_stage(graph, args, lambda: Failing(companies))) == ["ACME corp"]
+        assert list(ticket_stage(graph, args, lambda: companies)) == ["ALK", "ACME corp"]
+        assert graph.report[-1][1] == 1  # seule l'entreprise en échec est reconstruite
+        graph.state.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_build_with_store()
+    test_failed_tickets_are_rebuilt()
+    print("✅ Tests du pipeline réussis")
@@ -0,0 +1,126 @@
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from scheduler import CircuitOpenError, Scheduler
+
+
+class Unavailable(Exception):
+    """Réponse 503 de l'API."""
+    status_code = 503
+
+
+class FakeClock:
+    """Horloge factice : ``sleep`` avance le temps sans attendre."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+@contextmanager
+def fake_clock():
+    clock = FakeClock()
+    with mock.patch.object(time, "monotonic", clock.monotonic), mock.patch.object(time, "sleep", clock.sleep):
+        yield clock
+
+
+def _scheduler(threshold=2, max_retries=3):
+    scheduler = Scheduler(requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000, max_retries=max_retries)
+    scheduler.breaker.threshold = threshold
+    scheduler.breaker.reset_seconds = 60.0
+    return scheduler
+
+
+def _flaky(failures):
+    """Fonction qui échoue ``failures`` fois (503) puis répond ; ``calls`` compte les appels reçus."""
+    state = {"calls": 0}
+
+    def func():
+        state["calls"] += 1
+        if state["calls"] <= failures:
+            raise Unavailable("503")
+        return "ok"
+
+    return func, state
+
+
+def _fails(scheduler, func):
+    try:
+        scheduler.call(func)
+    except (Unavailable, CircuitOpenError) as error:
+        return error
+    raise AssertionError("l'appel aurait dû échouer")
+
+
+def test_retries_do_not_open_breaker():
+    """Les nouvelles tentatives d'un même appel ne comptent que pour un échec du disjoncteur."""
+    with fake_clock() as clock:
+        scheduler = _scheduler(threshold=2, max_retries=3)
+        func, state = _flaky(3)
+        assert scheduler.call(func) == "ok"
+        assert state["calls"] == 4
+        assert scheduler.breaker.opened_at is None and scheduler.breaker.failures == 0
+        assert clock.slept > 0  # backoff entre les tentatives
+
+        # Retries épuisés : un seul échec compté, le disjoncteur reste fermé sous le seuil
+        func, state = _flaky(10)
+        assert isinstance(_fails(scheduler, func), Unavailable)
+        assert state["calls"] == 4
+        assert scheduler.breaker.failures == 1 and scheduler.breaker.opened_at is None
+
+
+def test_breaker_opens_after_failed_calls_and_closes_after_trial():
+    with fake_clock() as clock:
+        scheduler = _scheduler(threshold=2, max_retries=1)
+        for _ in range(2):
+            func, state = _flaky(10)
+            assert isinstance(_fails(scheduler, func), Unavailable)
+        assert scheduler.breaker.opened_at is not None
+
+        # Disjoncteur ouvert : refus immédiat, sans appel
+        func, state = _flaky(0)
+        assert isinstance(_fails(scheduler, func), CircuitOpenError)
+        assert state["calls"] == 0
+
+        # Essai raté : un seul appel envoyé, et le disjoncteur se rouvre pour une nouvelle période
+        clock.sleep(61)
+        trial_at = clock.now
+        func, state = _flaky(10)
+        assert isinstance(_fails(scheduler, func), CircuitOpenError)
+        assert state["calls"] == 1
+        assert scheduler.breaker.opened_at == trial_at
+        assert isinstance(_fails(scheduler, _flaky(0)[0]), CircuitOpenError)
+
+        # Essai réussi : le disjoncteur se referme
+        clock.sleep(61)
+        func, state = _flaky(0)
+        assert scheduler.call(func) == "ok"
+        assert scheduler.breaker.opened_at is None and scheduler.breaker.failures == 0
+
+
+def test_single_attempt_call():
+    """``retry=False`` : une seule tentative, comptée comme un échec d'appel."""
+    with fake_clock():
+        scheduler = _scheduler(threshold=5, max_retries=3)
+        func, state = _flaky(1)
+        try:
+            scheduler.call(func, retry=False)
+        except Unavailable:
+            pass
+        assert state["calls"] == 1
+        assert scheduler.breaker.failures == 1
+
+
+if __name__ == "__main__":
+    test_retries_do_not_open_breaker()
+    test_breaker_opens_after_failed_calls_and_closes_after_trial()
+    test_single_attempt_call()
+    print("✅ Tests du planificateur réussis")
@@ -0,0 +1,254 @@
+import argparse
+import logging
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from ticket_dates import description_word_count, ticket_date
+
+# 📐 Analyses calculées localement (déterministes) plutôt que demandées au modèle
+PARETO_THRESHOLD = 0.8  # part cumulée couverte par les « causes vitales »
+SIGMA = 3  # limites de contrôle à ± 3 sigma
+RUN_LENGTH = 8  # points consécutifs du même côté de la moyenne : dérive du processus
+ROLLING_WINDOW = 3  # moyenne glissante des séries mensuelles
+
+WEEKDAYS = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
+MONTHS = ("janv.", "févr.", "mars", "avr.", "mai", "juin", "juil.", "août", "sept.", "oct.", "nov.", "déc.")
+
+
+# 📊 Comptages utilisés par les statistiques générales des prompts
+def top_counts(tickets_list, field, default, limit):
+    """Valeurs les plus fréquentes d'un champ, au format « valeur (nombre) » des prompts."""
+    counts = Counter(ticket.get(field, default) for ticket in tickets_list)
+    return ', '.join([f"{value} ({count})" for value, count in counts.most_common(limit)])
+
+
+def recent_activity(tickets_list, days=180, today=None):
+    """Tickets vides ou très courts, et comptages par mois, semaine et jour sur les ``days`` derniers jours."""
+    since = (today or datetime.now()) - timedelta(days=days)
+    recent_days = Counter()
+    empty_tickets = 0
+    for ticket in tickets_list:
+        date_obj = ticket_date(ticket)
+        if date_obj is None:
+            logging.warning(f"⚠️ Format de date inconnu : {ticket['dateCreation']}")
+            continue
+
+        if description_word_count(ticket) < 5:
+            empty_tickets += 1
+
+        if date_obj >= since:
+            recent_days[date_obj.date()] += 1
+
+    # Clés de période formatées une fois par jour distinct, et non pour chaque ticket
+    monthly, weekly, daily = defaultdict(int), defaultdict(int), defaultdict(int)
+    for day, count in recent_days.items():
+        monthly[day.strftime('%Y-%m')] += count
+        weekly[day.strftime('%Y-%U')] += count
+        daily[day.strftime('%A')] += count
+    return empty_tickets, monthly, weekly, daily
+
+
+def format_counts(counts):
+    return ', '.join([f"{key}: {count}" for key, count in sorted(counts.items())])
+
+
+# 📈 Pareto
+def pareto(tickets_list, field, default="Non spécifié"):
+    """Lignes (valeur, nombre, part, part cumulée, cause vitale) triées par fréquence décroissante."""
+    counts = Counter(ticket.get(field) or default for ticket in tickets_list)
+    total = sum(counts.values()) or 1
+    rows, cumulative = [], 0
+    for value, count in counts.most_common():
+        vital = cumulative / total < PARETO_THRESHOLD
+        cumulative += count
+        rows.append((value, count, count / total, cumulative / total, vital))
+    return rows
+
+
+# 📆 Séries temporelles
+def period_series(dates, granularity="month"):
+    """Comptages consécutifs (périodes vides comprises) par mois ou par semaine (commençant le lundi)."""
+    if not dates:
+        return []
+    counts = Counter()
+    for date_obj in dates:
+        if granularity == "month":
+            counts[(date_obj.year, date_obj.month)] += 1
+        else:
+            counts[(date_obj - timedelta(days=date_obj.weekday())).date()] += 1
+
+    series = []
+    if granularity == "month":
+        year, month = min(counts)
+        while (year, month) <= max(counts):
+            series.append((f"{year}-{month:02d}", counts[(year, month)]))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    else:
+        week = min(counts)
+        while week <= max(counts):
+            series.append((week.isoformat(), counts[week]))
+            week += timedelta(days=7)
+    return series
+
+
+def control_chart(series):
+    """Carte de contrôle c (nombre de tickets par période, loi de Poisson).
+
+    Renvoie la moyenne, les limites et les points hors contrôle : au-delà des limites, ou fin d'une
+    série de ``RUN_LENGTH`` points consécutifs du même côté de la moyenne.
+    """
+    values = [count for _, count in series]
+    center = sum(values) / len(values) if values else 0.0
+    upper = center + SIGMA * math.sqrt(center)
+    lower = max(0.0, center - SIGMA * math.sqrt(center))
+
+    signals, run_side, run_length = [], 0, 0
+    for label, count in series:
+        if count > upper:
+            signals.append((label, count, "au-dessus de la limite haute"))
+        elif count < lower:
+            signals.append((label, count, "sous la limite basse"))
+
+        side = (count > center) - (count < center)
+        run_length = run_length + 1 if side and side == run_side else (1 if side else 0)
+        run_side = side
+        if run_length == RUN_LENGTH:
+            position = "au-dessus" if side > 0 else "en dessous"
+            signals.append((label, count, f"{RUN_LENGTH} périodes consécutives {position} de la moyenne"))
+    return center, lower, upper, signals
+
+
+def linear_trend(values):
+    """Pente des moindres carrés (tickets par période)."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x, mean_y = (n - 1) / 2, sum(values) / n
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    variance = sum((x - mean_x) ** 2 for x in range(n))
+    return covariance / variance
+
+
+def rolling_mean(values, window=ROLLING_WINDOW):
+    return [sum(values[max(0, i - window + 1):i + 1]) / len(values[max(0, i - window + 1):i + 1])
+            for i in range(len(values))]
+
+
+def _covered(dates):
+    """Nombre de fois où chaque jour de la semaine et chaque mois de l'année figurent dans la période des ``dates``."""
+    first, last = min(dates), max(dates)
+    days = (last.date() - first.date()).days + 1
+    weekdays = Counter({day: days // 7 for day in range(7)})
+    weekdays.update((first.weekday() + offset) % 7 for offset in range(days % 7))
+    months = Counter()
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months[month] += 1
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return weekdays, months
+
+
+def seasonality(dates):
+    """Indices saisonniers (1 = moyenne) par jour de la semaine et par mois de l'année.
+
+    Chaque jour (ou mois) est rapporté au nombre de fois où il figure dans la période couverte : six mois
+    de données donnent des indices autour de 1, et les mois hors de la période ne sont pas listés.
+    """
+    if not dates:
+        return [], []
+    weekdays, months = _covered(dates)
+    by_weekday = Counter(date_obj.weekday() for date_obj in dates)
+    by_month = Counter(date_obj.month for date_obj in dates)
+    weekday_mean = len(dates) / sum(weekdays.values())
+    month_mean = len(dates) / sum(months.values())
+    return (
+        [(WEEKDAYS[day], by_weekday[day] / weekdays[day] / weekday_mean) for day in range(7) if weekdays[day]],
+        [
+            (MONTHS[month - 1], by_month[month] / months[month] / month_mean)
+            for month in range(1, 13) if months[month]
+        ],
+    )
+
+
+# 🧾 Rendu Markdown (utilisé dans les prompts ou directement dans les rapports)
+def render_pareto(tickets_list):
+    lines = []
+    for field, title, default in (("Themes", "thème", "Non spécifié"), ("project", "projet", "Inconnu")):
+        rows = pareto(tickets_list, field, default)
+        lines.append(f"### Pareto par {title}\n\n| {title.capitalize()} | Tickets | Part | Part cumulée |\n|---|---|---|---|")
+        for value, count, share, cumulative, vital in rows:
+            marker = " ⭐" if vital else ""
+            lines.append(f"| {value}{marker} | {count} | {share:.1%} | {cumulative:.1%} |")
+        vital_count = sum(1 for row in rows if row[4])
+        lines.append(
+            f"\n⭐ {vital_count} {title}(s) sur {len(rows)} suffisent pour couvrir {PARETO_THRESHOLD:.0%} des tickets.\n"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def render_control_charts(tickets_list):
+    dates = [date_obj for date_obj in map(ticket_date, tickets_list) if date_obj is not None]
+    lines = []
+    for granularity, title in (("month", "mensuelle"), ("week", "hebdomadaire")):
+        series = period_series(dates, granularity)
+        center, lower, upper, signals = control_chart(series)
+        lines.append(
+            f"### Carte de contrôle {title}\n\n"
+            f"- Périodes : {len(series)}, moyenne : {center:.1f} tickets, "
+            f"limites : [{lower:.1f} ; {upper:.1f}]"
+        )
+        if signals:
+            lines.extend(f"- ⚠️ {label} : {count} tickets ({reason})" for label, count, reason in signals)
+        else:
+            lines.append("- Aucun point hors contrôle.")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def render_time_series(tickets_list):
+    dates = [date_obj for date_obj in map(ticket_date, tickets_list) if date_obj is not None]
+    series = period_series(dates, "month")
+    values = [count for _, count in series]
+    lines = ["### Série mensuelle\n\n| Mois | Tickets | Moyenne glissante (3 mois) |\n|---|---|---|"]
+    lines.extend(
+        f"| {label} | {count} | {average:.1f} |" for (label, count), average in zip(series, rolling_mean(values))
+    )
+    lines.append(f"\n- Tendance : {linear_trend(values):+.2f} tickets par mois\n")
+
+    weekdays, months = seasonality(dates)
+    lines.append("### Saisonnalité (indice 1 = moyenne)\n")
+    lines.append("- Jours : " + ", ".join(f"{name} {index:.2f}" for name, index in weekdays))
+    lines.append("- Mois : " + ", ".join(f"{name} {index:.2f}" for name, index in months))
+    return "\n".join(lines) + "\n\n"
+
+
+# Sections calculées localement, par clé de méthode d'analyse
+LOCAL_SECTIONS = {
+    "pareto": render_pareto,
+    "spc": render_control_charts,
+    "series_temporelles": render_time_series,
+}
+
+
+def render_analytics(company, tickets_list):
+    """Tableaux Pareto, cartes de contrôle et séries temporelles d'une entreprise."""
+    return (
+        f"## 📐 Analyses calculées ({company})\n\n"
+        "Ces tableaux sont calculés de façon exacte à partir de tous les tickets : appuie-toi dessus pour les "
+        "analyses de Pareto, de cartes de contrôle et de séries temporelles, sans les recalculer.\n\n"
+        + render_pareto(tickets_list) + render_control_charts(tickets_list) + render_time_series(tickets_list)
+    )
+
+
+if __name__ == "__main__":
+    from ticket_loader import load_company_tickets
+
+    parser = argparse.ArgumentParser(description="Pareto, cartes de contrôle et séries temporelles des tickets.")
+    parser.add_argument("--data", default="data.json", help="Export des tickets (JSON ou JSONL).")
+    parser.add_argument("--company", action="append", help="Entreprise à analyser (option répétable ; défaut : toutes).")
+    args = parser.parse_args()
+
+    company_tickets = load_company_tickets(args.data)
+    for company in args.company or list(company_tickets):
+        print(render_analytics(company, company_tickets[company]))
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+# 📆 Formats de `dateCreation` présents dans les exports
+DATE_FORMATS = ('%d/%m/%Y %H:%M', '%Y-%m-%d')
+
+# Origine des timestamps pré-calculés (dates naïves, sans fuseau horaire)
+EPOCH = datetime(1970, 1, 1)
+
+
+def parse_ticket_date(value):
+    """Convertit une `dateCreation` en datetime, ou None si le format est inconnu."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def ticket_date(ticket):
+    """Date de création d'un ticket, pré-calculée lorsqu'il provient du store (`_created`)."""
+    if "_created" in ticket:
+        return ticket["_created"]
+    return parse_ticket_date(ticket.get('dateCreation'))
+
+
+def description_word_count(ticket):
+    """Nombre de mots de la description, pré-calculé lorsqu'il provient du store (`_words`)."""
+    if "_words" in ticket:
+        return ticket["_words"]
+    return len((ticket.get('description') or "").split())
@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import weakref
+
+from instrumentation import count as count_metric, measure
+
+# 📖 Taille des blocs lus dans l'export
+READ_SIZE = 1024 * 1024
+
+# Facteur approximatif entre la taille JSON d'un ticket et son coût mémoire en dict Python
+PYTHON_OVERHEAD = 4
+
+_decoder = json.JSONDecoder()
+
+
+def add_loader_arguments(parser):
+    """Ajoute les options de chargement de l'export des tickets."""
+    parser.add_argument(
+        "--data", default="data.json",
+        help="Export des tickets : tableau JSON ou JSONL, un ticket par ligne (défaut : data.json)."
+    )
+    parser.add_argument(
+        "--spill-mb", type=float, default=None,
+        help="Mémoire estimée (Mo) au-delà de laquelle les tickets sont déversés sur disque par entreprise."
+    )
+    parser.add_argument(
+        "--store", action="store_true",
+        help="Lit les tickets depuis le store colonne <data>.store, reconstruit seulement si l'export change."
+    )
+
+
+def _iter_json_array(f, buffer):
+    """Décode un tableau JSON élément par élément sans charger tout le fichier."""
+    pos = buffer.index("[") + 1
+    eof = False
+    while True:
+        # Avancer jusqu'au prochain élément
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        if pos >= len(buffer):
+            raise ValueError("Tableau JSON incomplet : ']' final manquant")
+        if buffer[pos] == "]":
+            return
+
+        try:
+            ticket, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Ticket coupé entre deux blocs : on lit la suite et on réessaie
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield ticket, end - pos
+        pos = end
+        if pos > READ_SIZE:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_tickets(path):
+    """Parcourt les tickets d'un export JSON (tableau) ou JSONL, avec la taille JSON de chacun."""
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        while not buffer.strip():
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+
+        if buffer.lstrip().startswith("["):
+            yield from _iter_json_array(f, buffer)
+            return
+
+        # JSONL : un ticket par ligne
+        f.seek(0)
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    yield json.loads(line), len(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Ligne {line_number} invalide dans {path} : {e}") from e
+
+
+class CompanyTickets:
+    """Tickets regroupés par entreprise, éventuellement déversés sur disque.
+
+    S'utilise comme le ``defaultdict(list)`` des scripts (``items()``, ``len()``, ``[company]``) ;
+    les partitions déversées sont relues entreprise par entreprise lors du parcours.
+    """
+
+    def __init__(self, spill_bytes=None):
+        self.spill_bytes = spill_bytes
+        self.in_memory = {}
+        self.partition_ids = {}
+        self.spilled = set()
+        self.held_bytes = 0
+        self.spill_dir = None
+
+    def add(self, ticket, size):
+        company = ticket.get("company", "Inconnue")
+        if company not in self.in_memory:
+            self.in_memory[company] = []
+            self.partition_ids[company] = len(self.partition_ids)
+        self.in_memory[company].append(ticket)
+        self.held_bytes += size * PYTHON_OVERHEAD
+        if self.spill_bytes is not None and self.held_bytes > self.spill_bytes:
+            self._spill()
+
+    def _spill(self):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="tickets_")
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+        for company, tickets_list in self.in_memory.items():
+            if not tickets_list:
+                continue
+            with open(self._partition_path(company), "a", encoding="utf-8") as f:
+                for ticket in tickets_list:
+                    f.write(json.dumps(ticket, ensure_ascii=False) + "\n")
+            self.spilled.add(company)
+            tickets_list.clear()
+
+        logging.info(f"💽 {self.held_bytes / 1e6:.0f} Mo de tickets déversés sur disque ({self.spill_dir})")
+        self.held_bytes = 0
+
+    def _partition_path(self, company):
+        # L'ordre d'apparition sert de nom de fichier (les noms d'entreprise peuvent contenir '/')
+        return os.path.join(self.spill_dir, f"{self.partition_ids[company]}.jsonl")
+
+    def __len__(self):
+        return len(self.in_memory)
+
+    def __iter__(self):
+        return iter(self.in_memory)
+
+    def __getitem__(self, company):
+        if company not in self.in_memory:
+            raise KeyError(company)
+        if company not in self.spilled:
+            return self.in_memory[company]
+
+        with open(self._partition_path(company), "r", encoding="utf-8") as f:
+            tickets_list = [json.loads(line) for line in f]
+        return tickets_list + self.in_memory[company]
+
+    def items(self):
+        for company in self.in_memory:
+            yield company, self[company]
+
+
+def load_company_tickets(path="data.json", spill_mb=None, use_store=False):
+    """Charge l'export en un seul passage et regroupe les tickets par entreprise.
+
+    Avec ``use_store``, les tickets sont lus depuis le store colonne (voir ``ticket_store``).
+    """
+    with measure("load"):
+        if use_store:
+            from ticket_store import open_ticket_store
+            return open_ticket_store(path).company_tickets()
+
+        company_tickets = CompanyTickets(spill_bytes=None if spill_mb is None else int(spill_mb * 1024 * 1024))
+        count = 0
+        for ticket, size in iter_tickets(path):
+            company_tickets.add(ticket, size)
+            count += 1
+    count_metric("tickets_loaded", count)
+    logging.info(f"🚀 {count} tickets chargés depuis {path} ({len(company_tickets)} entreprises)")
+    return company_tickets
@@ -0,0 +1,218 @@
+import json
+import logging
+import math
+import mmap
+import os
+import time
+from array import array
+from datetime import timedelta
+
+from ticket_dates import EPOCH, parse_ticket_date
+from ticket_loader import iter_tickets
+
+# 🗄️ Version du format : toute évolution force une reconstruction du store
+STORE_VERSION = 1
+
+MISSING = 0xFFFFFFFF  # code d'un champ absent du ticket (différent d'un champ à null)
+
+# Champs internés (une table de valeurs distinctes + un code par ticket)
+CODED_FIELDS = ("company", "Themes", "project", "priority")
+# Champs texte conservés tels quels (JSON) dans le fichier mappé en mémoire
+TEXT_FIELDS = ("id", "title", "description", "dateCreation", "trackedHours")
+
+COLUMNS = {
+    "company": "I",
+    "Themes": "I",
+    "project": "I",
+    "priority": "I",
+    "created": "d",  # epoch en secondes, NaN si `dateCreation` est illisible
+    "desc_len": "I",
+    "desc_words": "I",
+    "record_offsets": "Q",  # début de chaque ticket dans records.bin (n + 1 valeurs)
+    "order": "I",  # lignes triées par entreprise
+    "company_starts": "I",  # début de chaque entreprise dans `order` (nb entreprises + 1 valeurs)
+}
+
+
+def default_store_dir(data_path):
+    return f"{data_path}.store"
+
+
+def _source_fingerprint(data_path):
+    stat = os.stat(data_path)
+    return {"path": os.path.abspath(data_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_store(data_path, store_dir):
+    """Ingestion unique de l'export vers un store colonne (codes internés, dates pré-calculées)."""
+    start = time.perf_counter()
+    os.makedirs(store_dir, exist_ok=True)
+    columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+    tables = {field: [] for field in CODED_FIELDS}
+    codes = {field: {} for field in CODED_FIELDS}
+
+    offset = 0
+    columns["record_offsets"].append(0)
+    with open(os.path.join(store_dir, "records.bin"), "wb") as records:
+        for ticket, _ in iter_tickets(data_path):
+            for field in CODED_FIELDS:
+                if field not in ticket:
+                    columns[field].append(MISSING)
+                    continue
+                # Les valeurs sont internées via leur forme JSON (None, nombres et textes distincts)
+                key = json.dumps(ticket[field], ensure_ascii=False)
+                code = codes[field].get(key)
+                if code is None:
+                    code = codes[field][key] = len(tables[field])
+                    tables[field].append(ticket[field])
+                columns[field].append(code)
+
+            date_obj = parse_ticket_date(ticket.get("dateCreation"))
+            columns["created"].append(math.nan if date_obj is None else (date_obj - EPOCH).total_seconds())
+
+            description = ticket.get("description") or ""
+            columns["desc_len"].append(len(description))
+            columns["desc_words"].append(len(description.split()))
+
+            record = json.dumps([ticket.get(field) for field in TEXT_FIELDS], ensure_ascii=False).encode("utf-8")
+            records.write(record)
+            offset += len(record)
+            columns["record_offsets"].append(offset)
+
+    # 🏢 Index par entreprise (tri stable : l'ordre des tickets de l'export est conservé)
+    company_column = columns["company"]
+    company_count = len(tables["company"]) + 1  # + une entrée pour les tickets sans `company`
+    rows_by_company = [array("I") for _ in range(company_count)]
+    for row, code in enumerate(company_column):
+        rows_by_company[-1 if code == MISSING else code].append(row)
+    columns["company_starts"].append(0)
+    for rows in rows_by_company:
+        columns["order"].extend(rows)
+        columns["company_starts"].append(len(columns["order"]))
+
+    for name, column in columns.items():
+        with open(os.path.join(store_dir, f"{name}.bin"), "wb") as f:
+            column.tofile(f)
+
+    meta = {
+        "version": STORE_VERSION,
+        "source": _source_fingerprint(data_path),
+        "count": len(company_column),
+        "tables": tables,
+    }
+    with open(os.path.join(store_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    logging.info(
+        f"🗄️ Store construit pour {data_path} : {meta['count']} tickets en {time.perf_counter() - start:.1f}s"
+    )
+
+
+class TicketStore:
+    """Store colonne ouvert en lecture : les colonnes et les textes sont mappés en mémoire."""
+
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.count = self.meta["count"]
+        self.tables = self.meta["tables"]
+        self._maps = []
+        self.columns = {name: self._map_column(store_dir, name, typecode) for name, typecode in COLUMNS.items()}
+        self.records = self._map_file(os.path.join(store_dir, "records.bin"))
+
+    def _map_file(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def _map_column(self, store_dir, name, typecode):
+        mapped = self._map_file(os.path.join(store_dir, f"{name}.bin"))
+        if not mapped:
+            return array(typecode)
+        return memoryview(mapped).cast(typecode)
+
+    def _value(self, field, row):
+        code = self.columns[field][row]
+        return None if code == MISSING else self.tables[field][code]
+
+    def ticket(self, row):
+        """Reconstruit le dict d'un ticket, enrichi des valeurs pré-calculées (`_created`, `_words`)."""
+        offsets = self.columns["record_offsets"]
+        values = json.loads(self.records[offsets[row]:offsets[row + 1]])
+        ticket = dict(zip(TEXT_FIELDS, values))
+        for field in CODED_FIELDS:
+            if self.columns[field][row] != MISSING:
+                ticket[field] = self._value(field, row)
+
+        created = self.columns["created"][row]
+        ticket["_created"] = None if math.isnan(created) else EPOCH + timedelta(seconds=created)
+        ticket["_words"] = self.columns["desc_words"][row]
+        return ticket
+
+    def company_tickets(self):
+        """Tickets par entreprise, reconstruits à la demande (une entreprise à la fois)."""
+        return StoreCompanyTickets(self)
+
+    def close(self):
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        for mapped in self._maps:
+            mapped.close()
+
+
+class StoreCompanyTickets:
+    """Vue ``{entreprise: [tickets]}`` sur un TicketStore, comme ``ticket_loader.CompanyTickets``."""
+
+    def __init__(self, store):
+        self.store = store
+        starts = store.columns["company_starts"]
+        names = store.tables["company"] + ["Inconnue"]
+        self.ranges = {}
+        for index, name in enumerate(names):
+            if starts[index + 1] > starts[index]:
+                # Tickets sans `company` regroupés avec ceux de la valeur "Inconnue" le cas échéant
+                previous = self.ranges.get(name, [])
+                self.ranges[name] = previous + [(starts[index], starts[index + 1])]
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __iter__(self):
+        return iter(self.ranges)
+
+    def __getitem__(self, company):
+        order = self.store.columns["order"]
+        return [
+            self.store.ticket(order[position])
+            for start, end in self.ranges[company]
+            for position in range(start, end)
+        ]
+
+    def items(self):
+        for company in self.ranges:
+            yield company, self[company]
+
+
+def open_ticket_store(data_path="data.json", store_dir=None):
+    """Ouvre le store de ``data_path``, reconstruit seulement si l'export a changé."""
+    store_dir = store_dir or default_store_dir(data_path)
+    meta_path = os.path.join(store_dir, "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        fresh = meta.get("version") == STORE_VERSION and meta.get("source") == _source_fingerprint(data_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        fresh = False
+
+    if not fresh:
+        logging.info(f"🗄️ Export modifié ou store absent : reconstruction de {store_dir}")
+        build_store(data_path, store_dir)
+
+    start = time.perf_counter()
+    store = TicketStore(store_dir)
+    logging.info(f"🗄️ Store ouvert : {store.count} tickets en {(time.perf_counter() - start) * 1000:.0f} ms")
+    return store
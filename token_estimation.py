@@ -0,0 +1,9 @@
+import math
+
+# 🔢 Ratio moyen caractères / token observé sur les tickets (texte français)
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text):
+    """Estimation rapide (et volontairement prudente) du nombre de tokens d'un texte."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)